@@ -0,0 +1,59 @@
+import json
+import os
+
+# -----------------------------
+# Saved ISA accounts
+# -----------------------------
+# One JSON file per account, in the same shape as a POST to the sizing
+# service's /shares endpoint, so the GUI, the service and the monthly
+# runner (dca.py) all read the same thing:
+#
+#     {"account": "jane-isa", "cash": "12.50", "monthly": "200",
+#      "plan": "fewest_trades", "drift_tolerance_pct": "2", "fee_per_trade": "0",
+#      "holdings": [{"name": "S&P 500 ETF", "price": "512.30", "shares": 10,
+#                    "weight_pct": "42", "currency": "USD"}, ...],
+#      "last_run": "2026-09"}
+#
+# "last_run" is the month of the last buy plan applied by dca.py --update.
+
+ACCOUNT_SUFFIX = ".json"
+
+
+def load_account(path):
+    with open(path, encoding="utf-8") as f:
+        account = json.load(f)
+    if not isinstance(account, dict) or not isinstance(account.get("holdings"), list):
+        raise ValueError("not a saved account (no holdings list)")
+    account.setdefault("account", os.path.splitext(os.path.basename(path))[0])
+    return account
+
+
+def save_account(path, account):
+    # Atomic replace so a crash never leaves a half-written account.
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(account, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def list_accounts(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(ACCOUNT_SUFFIX)
+    )
+
+
+def apply_buys(account, response, month):
+    # Account after the buys in a /shares response were placed: shares
+    # added, leftover cash carried forward, stamped with the month.
+    bought = {b["name"]: b["qty"] for b in response["buys"]}
+    holdings = [
+        {**h, "shares": int(h.get("shares") or 0) + bought.get(h.get("name"), 0)}
+        for h in account["holdings"]
+    ]
+    return {
+        **account,
+        "cash": f"{response['cash_remaining']:.2f}",
+        "holdings": holdings,
+        "last_run": month,
+    }
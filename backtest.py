@@ -0,0 +1,295 @@
+"""Rebalancing-policy backtester for the ISA allocator.
+
+    python backtest.py prices.csv --weights "S&P 500 ETF=42,World ex-US ETF=28,Bond ETF=30"
+                       [--monthly 200] [--cash 0] [--fee 0] [--cost-bp 10] [--workers N]
+
+prices.csv has a date column (YYYY-MM-DD) then one column per instrument;
+a blank cell carries the last price forward.
+The first row of each month is the contribution day. Every policy variant
+is replayed through the same buy-plan engines as shares.py, one variant
+per worker process, and compared on:
+
+    tracking error  annualised std of monthly return minus the return of
+                    the target weights rebalanced every month
+    drift           average over months of half the sum of |weight - target|
+    turnover        traded value per year / average portfolio value
+    cost            per-order fees plus cost_bp of traded value
+
+Policies: cashflow (new cash closes gaps, never sells), fewest (fewest
+orders within a drift tolerance), calendar:N (full rebalance every N
+months, cash-flow otherwise) and threshold:X (full rebalance when any
+holding drifts more than X% from target).
+"""
+import argparse
+import csv
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from money import BP, from_pence, pct_to_bp, to_pence, to_price_units
+from shares_engine import UNITS_PER_PENNY, make_holding, plan_dca_buys, plan_fewest_trades, plan_initial_build
+
+DEFAULT_VARIANTS = [
+    ("cashflow", None),
+    ("fewest", 1), ("fewest", 2), ("fewest", 5),
+    ("calendar", 1), ("calendar", 3), ("calendar", 6), ("calendar", 12),
+    ("threshold", 1), ("threshold", 2), ("threshold", 5), ("threshold", 10),
+]
+
+
+def read_monthly_prices(path, names):
+    # One pass; keeps only the first row of each month, in exact price
+    # units. A blank cell carries the last price forward; a fund with no
+    # price yet is 0 (held at nothing and never bought) until it has one.
+    months = []
+    prices = []
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        try:
+            header = [h.strip() for h in next(reader)]
+        except StopIteration:
+            raise ValueError("Price file is empty.") from None
+        index = {h: i for i, h in enumerate(header)}
+        missing = [n for n in names if n not in index]
+        if missing:
+            raise ValueError(f"No price history for: {', '.join(missing)}")
+        cols = [index[n] for n in names]
+        last = [0] * len(cols)
+        for line, row in enumerate(reader, start=2):
+            if not row or row[0][:7] in months[-1:]:
+                continue
+            try:
+                last = [
+                    to_price_units(row[c]) if c < len(row) and row[c].strip() else p
+                    for c, p in zip(cols, last)
+                ]
+            except ValueError as e:
+                raise ValueError(f"line {line}: {e}") from None
+            months.append(row[0][:7])
+            prices.append(last)
+    if not months:
+        raise ValueError("Price file has no data rows.")
+    return months, prices
+
+
+def _full_rebalance(holdings, cash_u, fee_u, cost_bp):
+    # Whole-share positions at target weights; fees and costs come out of
+    # the cash first, then the largest overweight is trimmed until it fits.
+    # All in price units. No trades if even selling everything cannot pay
+    # the fees.
+    total_u = sum(h["shares"] * h["price_u"] for h in holdings) + cash_u
+    budget_u = total_u - len(holdings) * fee_u - total_u * cost_bp // BP
+    target = [
+        max(0, budget_u * h["weight_bp"] // BP // h["price_u"]) if h["price_u"] > 0 else h["shares"]
+        for h in holdings
+    ]
+
+    def cash_after():
+        traded = sum(abs(t - h["shares"]) * h["price_u"] for t, h in zip(target, holdings))
+        orders = sum(1 for t, h in zip(target, holdings) if t != h["shares"])
+        return total_u - sum(t * h["price_u"] for t, h in zip(target, holdings)) \
+            - orders * fee_u - traded * cost_bp // BP
+
+    while cash_after() < 0:
+        cuttable = [i for i, t in enumerate(target) if t > 0 and holdings[i]["price_u"] > 0]
+        if not cuttable:
+            return [0] * len(holdings)
+        i = max(
+            cuttable,
+            key=lambda i: target[i] * holdings[i]["price_u"] - total_u * holdings[i]["weight_bp"] // BP,
+        )
+        target[i] -= 1
+
+    return [t - h["shares"] for t, h in zip(target, holdings)]
+
+
+def _cashflow_buys(holdings, cash_p, policy, param, fee_p):
+    invested_p = sum(h["value_p"] for h in holdings)
+    if policy == "fewest" and invested_p > 0:
+        plan, _, _ = plan_fewest_trades(holdings, invested_p, cash_p, pct_to_bp(param), fee_p)
+        if plan is not None:
+            return [plan[h["name"]] for h in holdings]
+
+    # The other planners do not know about fees: hold back one per holding.
+    cash_p = max(0, cash_p - len(holdings) * fee_p)
+    if invested_p == 0:
+        planned, _ = plan_initial_build(holdings, cash_p)
+        qty = {h["name"]: q for h, q, _ in planned}
+        return [qty.get(h["name"], 0) for h in holdings]
+    plan, _ = plan_dca_buys(holdings, invested_p, cash_p)
+    return [plan[h["name"]] for h in holdings]
+
+
+def run_policy(prices, names, weights_bp, monthly_p, cash_p, policy, param=None, fee_p=0, cost_bp=0):
+    # Prices are price units; cash, trades and costs are kept in price
+    # units too, so sub-penny fund prices are never rounded away.
+    n = len(names)
+    shares = [0] * n
+    cash_u = cash_p * UNITS_PER_PENNY
+    monthly_u = monthly_p * UNITS_PER_PENNY
+    fee_u = fee_p * UNITS_PER_PENNY
+    stats = {"traded_u": 0, "cost_u": 0, "orders": 0}
+    active = []         # monthly portfolio return minus target-weight return
+    drifts = []
+    values = []
+    prev_prices = None
+    prev_value_u = None
+    since_rebalance = 0
+
+    for row in prices:
+        holdings = [make_holding(names[i], row[i], shares[i], weights_bp[i]) for i in range(n)]
+        value_u = sum(s * p for s, p in zip(shares, row)) + cash_u
+
+        if prev_prices is not None and prev_value_u > 0:
+            port = value_u / prev_value_u - 1
+            bench = sum(
+                w / BP * (p / q - 1) for w, p, q in zip(weights_bp, row, prev_prices) if q > 0
+            )
+            active.append(port - bench)
+
+        cash_u += monthly_u
+        invested_u = value_u - cash_u + monthly_u
+
+        if policy == "calendar":
+            rebalance = invested_u > 0 and since_rebalance + 1 >= param
+        elif policy == "threshold":
+            total_u = invested_u + cash_u
+            rebalance = invested_u > 0 and any(
+                abs(h["shares"] * h["price_u"] * BP - total_u * h["weight_bp"]) > pct_to_bp(param) * total_u
+                for h in holdings
+            )
+        else:
+            rebalance = False
+
+        if rebalance:
+            trades = _full_rebalance(holdings, cash_u, fee_u, cost_bp)
+            since_rebalance = 0
+        else:
+            trades = _cashflow_buys(holdings, cash_u // UNITS_PER_PENNY, policy, param, fee_p)
+            since_rebalance += 1
+
+        for i, q in enumerate(trades):
+            if q:
+                traded_u = abs(q) * row[i]
+                cost_u = fee_u + traded_u * cost_bp // BP
+                shares[i] += q
+                cash_u -= q * row[i] + cost_u
+                stats["traded_u"] += traded_u
+                stats["cost_u"] += cost_u
+                stats["orders"] += 1
+
+        value_u = sum(s * p for s, p in zip(shares, row)) + cash_u
+        values.append(value_u)
+        if value_u > 0:
+            drifts.append(sum(
+                abs(s * p * BP - value_u * w) for s, p, w in zip(shares, row, weights_bp)
+            ) / (2 * value_u * BP))
+        prev_prices = row
+        prev_value_u = value_u
+
+    years = max(len(prices) / 12, 1 / 12)
+    mean = sum(active) / len(active) if active else 0.0
+    te = math.sqrt(sum((a - mean) ** 2 for a in active) / max(len(active) - 1, 1) * 12)
+    avg_value = sum(values) / len(values) if values else 0
+
+    return {
+        "policy": policy if param is None else f"{policy}:{param:g}",
+        "tracking_error_pct": te * 100,
+        "drift_pct": sum(drifts) / len(drifts) * 100 if drifts else 0.0,
+        "turnover_pct": stats["traded_u"] / years / avg_value * 100 if avg_value else 0.0,
+        "orders": stats["orders"],
+        "cost": from_pence(stats["cost_u"] // UNITS_PER_PENNY),
+        "final_value": from_pence(values[-1] // UNITS_PER_PENNY) if values else 0.0,
+    }
+
+
+# Worker processes get the price table once, not per variant
+_SHARED = {}
+
+
+def _init_worker(shared):
+    _SHARED.update(shared)
+
+
+def _run_variant(variant):
+    policy, param = variant
+    s = _SHARED
+    return run_policy(
+        s["prices"], s["names"], s["weights_bp"], s["monthly_p"], s["cash_p"],
+        policy, param, s["fee_p"], s["cost_bp"],
+    )
+
+
+def run_variants(prices, names, weights_bp, monthly_p, cash_p=0, fee_p=0, cost_bp=0,
+                 variants=DEFAULT_VARIANTS, workers=None):
+    shared = {
+        "prices": prices, "names": names, "weights_bp": weights_bp,
+        "monthly_p": monthly_p, "cash_p": cash_p, "fee_p": fee_p, "cost_bp": cost_bp,
+    }
+    workers = min(workers or os.cpu_count() or 1, len(variants))
+    if workers <= 1:
+        _init_worker(shared)
+        return [_run_variant(v) for v in variants]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(shared,)) as pool:
+        return list(pool.map(_run_variant, variants))
+
+
+def parse_weights(text):
+    # "A=42,B=28,C=30" -> (names, weights_bp)
+    names, weights = [], []
+    for part in text.split(","):
+        name, sep, pct = part.rpartition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"weight {part!r} is not 'name=percent'")
+        names.append(name.strip())
+        weights.append(pct_to_bp(pct))
+    if sum(weights) != BP:
+        raise ValueError(f"weights sum to {sum(weights) / 100:g}%, not 100%")
+    return names, weights
+
+
+def parse_variant(text):
+    policy, _, param = text.partition(":")
+    if policy not in ("cashflow", "fewest", "calendar", "threshold"):
+        raise ValueError(f"unknown policy {policy!r}")
+    if policy == "cashflow":
+        return policy, None
+    if not param:
+        raise ValueError(f"policy {policy!r} needs a parameter, e.g. {policy}:3")
+    return policy, (int(param) if policy == "calendar" else float(param))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("prices")
+    parser.add_argument("--weights", required=True, help="name=percent,... summing to 100")
+    parser.add_argument("--monthly", default="200", help="monthly contribution (£)")
+    parser.add_argument("--cash", default="0", help="starting cash (£)")
+    parser.add_argument("--fee", default="0", help="fee per order (£)")
+    parser.add_argument("--cost-bp", type=int, default=10, help="spread/slippage in bp of traded value")
+    parser.add_argument("--policy", action="append", help="e.g. cashflow, calendar:3 (repeatable)")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        names, weights_bp = parse_weights(args.weights)
+        variants = [parse_variant(v) for v in args.policy] if args.policy else DEFAULT_VARIANTS
+        months, prices = read_monthly_prices(args.prices, names)
+        monthly_p, cash_p, fee_p = to_pence(args.monthly), to_pence(args.cash), to_pence(args.fee)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    results = run_variants(prices, names, weights_bp, monthly_p, cash_p, fee_p, args.cost_bp,
+                           variants, args.workers)
+
+    print(f"{len(months)} months ({months[0]} to {months[-1]}), {len(names)} holdings\n")
+    print(f"{'Policy':16s} {'TE %/yr':>8s} {'Drift %':>8s} {'Turnover %/yr':>14s} {'Orders':>7s} "
+          f"{'Cost £':>10s} {'Final £':>12s}")
+    print("-" * 80)
+    for r in sorted(results, key=lambda r: r["tracking_error_pct"]):
+        print(f"{r['policy']:16s} {r['tracking_error_pct']:8.2f} {r['drift_pct']:8.2f} "
+              f"{r['turnover_pct']:14.2f} {r['orders']:7d} {r['cost']:10.2f} {r['final_value']:12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Throughput of the deposit-allocator solver: float vs Decimal vs integer pence.
+
+    python bench_money.py [--legs 3] [--seconds 1.0]
+"""
+import argparse
+import math
+import random
+import time
+from decimal import Decimal, ROUND_FLOOR
+
+from spreadbet_engine import build_instrument, size_deposit_allocation
+
+
+# ---- Float path (the pre-fixed-point solver, kept verbatim for comparison) ----
+
+def solve_float(instruments, target_total_margin):
+    total_weight = sum(i["weight_pct"] for i in instruments)
+
+    def round_down(x, step):
+        return math.floor(x / step) * step
+
+    def stakes_for(k):
+        out = []
+        for inst in instruments:
+            raw = k * (inst["weight_pct"] / total_weight) / inst["notional_per_unit"]
+            out.append(max(round_down(raw, inst["min_stake"]), inst["min_stake"]))
+        return out
+
+    def margin_for(stakes):
+        return sum(s * inst["margin_per_unit"] for s, inst in zip(stakes, instruments))
+
+    k_lo, k_hi = 0.0, 1.0
+    for _ in range(60):
+        if margin_for(stakes_for(k_hi)) >= target_total_margin:
+            break
+        k_hi *= 2.0
+
+    best = None
+    for _ in range(80):
+        k_mid = (k_lo + k_hi) / 2.0
+        stakes = stakes_for(k_mid)
+        if margin_for(stakes) <= target_total_margin:
+            best = stakes
+            k_lo = k_mid
+        else:
+            k_hi = k_mid
+    return best
+
+
+# ---- Decimal path (same bisection, exact but slow) ----
+
+def solve_decimal(instruments, target_total_margin):
+    cap = Decimal(str(target_total_margin))
+    legs = [
+        (Decimal(str(i["weight_pct"])), Decimal(str(i["min_stake"])),
+         Decimal(i["margin_min_p"]) / 100, Decimal(i["notional_min_p"]) / 100)
+        for i in instruments
+    ]
+    total_weight = sum(w for w, _, _, _ in legs)
+
+    def lots_for(k):
+        return [max((k * w / total_weight / n).to_integral_value(rounding=ROUND_FLOOR), 1)
+                for w, _, _, n in legs]
+
+    def margin_for(lots):
+        return sum(q * m for q, (_, _, m, _) in zip(lots, legs))
+
+    k_lo, k_hi = Decimal(0), Decimal(1)
+    while margin_for(lots_for(k_hi)) <= cap:
+        k_lo, k_hi = k_hi, k_hi * 2
+    while k_hi - k_lo > Decimal("0.01"):
+        k_mid = (k_lo + k_hi) / 2
+        if margin_for(lots_for(k_mid)) <= cap:
+            k_lo = k_mid
+        else:
+            k_hi = k_mid
+    return [q * s for q, (_, s, _, _) in zip(lots_for(k_lo), legs)]
+
+
+def random_book(rng, legs):
+    insts = []
+    for n in range(legs):
+        min_stake = rng.choice(["0.01", "0.1", "0.3", "0.5", "1"])
+        margin = f"{rng.uniform(5, 200):.2f}"
+        notional = f"{rng.uniform(100, 5000):.2f}"
+        weight = f"{rng.uniform(1, 60):.1f}"
+        inst = build_instrument(f"Leg{n}", "x", "100", min_stake, margin, notional, weight)
+        inst["margin_per_unit"] = inst["margin_min_p"] / 100 / inst["min_stake"]
+        inst["notional_per_unit"] = inst["notional_min_p"] / 100 / inst["min_stake"]
+        insts.append(inst)
+    return insts
+
+
+def run(label, fn, cases, seconds):
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        books, cap = cases[done % len(cases)]
+        fn(books, cap)
+        done += 1
+    elapsed = time.perf_counter() - start
+    print(f"{label:10s} {done / elapsed:12,.0f} solves/s")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--legs", type=int, default=3)
+    ap.add_argument("--seconds", type=float, default=1.0)
+    args = ap.parse_args()
+
+    rng = random.Random(7)
+    cases = []
+    for _ in range(200):
+        book = random_book(rng, args.legs)
+        min_margin = sum(i["margin_min_p"] for i in book) / 100
+        cases.append((book, round(min_margin * rng.uniform(1.5, 40), 2)))
+
+    # Representation error in the float path: count books where it lands on a
+    # different stake vector than the exact integer engine.
+    mismatches = 0
+    for book, cap in cases:
+        exact = [t / 10_000 for t in size_deposit_allocation(book, cap)["stake_ticks"]]
+        approx = solve_float(book, cap)
+        if any(abs(a - e) > 1e-9 for a, e in zip(approx, exact)):
+            mismatches += 1
+    print(f"float path disagrees with exact engine on {mismatches}/{len(cases)} books\n")
+
+    run("float", solve_float, cases, args.seconds)
+    run("decimal", solve_decimal, cases, args.seconds)
+    run("int pence", size_deposit_allocation, cases, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
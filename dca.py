@@ -0,0 +1,207 @@
+"""Headless monthly DCA run over saved ISA accounts.
+
+    python dca.py accounts/ --prices prices.csv [--out runs/] [--month 2026-10]
+                  [--workers N] [--update] [--force]
+
+accounts/ holds one JSON file per account, as written by "Save Account…"
+in the ISA tool (see accounts.py). The price file (CSV or Parquet, long or
+wide, as for "Import Prices…") is read once, up front; each account's
+holdings are repriced from it, the month's contribution is added to its
+cash and the buy plan comes from the same rules as the GUI and the sizing
+service. Accounts are spread over worker processes in chunks.
+
+Appends to --out (the header is written when a file is new):
+
+    orders-YYYY-MM.csv   one line per buy: account, instrument, qty, price, cost (£)
+    report-YYYY-MM.csv   one line per account: status, plan mode, cash, spend,
+                         fees, cash carried forward, orders and any holdings
+                         missing from the price file
+
+With --update each account file is rewritten with its new shares, prices
+and leftover cash and stamped with the month, so a scheduled re-run in the
+same month skips it unless --force is given. Accounts are only rewritten
+after their orders are flushed to disk, so an aborted run never marks an
+account done without its orders. Exits with status 1 if any account could
+not be planned or saved.
+"""
+import argparse
+import csv
+import datetime
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from accounts import apply_buys, list_accounts, load_account, save_account
+from importer import read_latest_prices
+from service import RequestError, solve_shares
+
+REPORT_HEADER = [
+    "account", "status", "mode", "cash_this_cycle", "total_spend", "fees", "cash_remaining",
+    "orders", "missing_prices", "message",
+]
+ORDER_HEADER = ["account", "instrument", "qty", "price", "cost"]
+
+# Accounts per task handed to a worker
+CHUNK_ACCOUNTS = 64
+
+
+def run_account(path, prices, month, update=False, force=False):
+    # Returns (report row, order rows, updated account or None) for one
+    # saved account; the caller saves the update once the orders are out.
+    name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        return _run_account(path, name, prices, month, update, force)
+    except Exception as e:
+        return {"account": name, "status": "error", "message": f"{type(e).__name__}: {e}"}, [], None
+
+
+def _run_account(path, name, prices, month, update, force):
+    try:
+        account = load_account(path)
+    except (OSError, ValueError) as e:
+        return {"account": name, "status": "error", "message": str(e)}, [], None
+    name = account["account"]
+
+    if account.get("last_run") == month and not force:
+        return {"account": name, "status": "skipped", "message": f"already run for {month}"}, [], None
+
+    missing = []
+    holdings = []
+    for h in account["holdings"]:
+        if isinstance(h, dict) and h.get("name") in prices:
+            h = {**h, "price": prices[h["name"]]}
+        elif isinstance(h, dict):
+            missing.append(str(h.get("name")))
+        holdings.append(h)
+    account = {**account, "holdings": holdings}
+
+    try:
+        response = solve_shares(account)
+    except RequestError as e:
+        details = "; ".join(f"row {x['row'] + 1} {x['field']}: {x['message']}" for x in e.errors or ())
+        return {"account": name, "status": "error", "message": f"{e} {details}".strip()}, [], None
+
+    orders = [[name, b["name"], b["qty"], b["price"], f"{b['cost']:.2f}"] for b in response["buys"]]
+    report = {
+        "account": name,
+        "status": "ok",
+        "mode": response["mode"],
+        "cash_this_cycle": f"{response['cash_this_cycle']:.2f}",
+        "total_spend": f"{response['total_spend']:.2f}",
+        "fees": f"{response.get('fees', 0):.2f}",
+        "cash_remaining": f"{response['cash_remaining']:.2f}",
+        "orders": len(orders),
+        "missing_prices": ";".join(missing),
+    }
+    return report, orders, apply_buys(account, response, month) if update else None
+
+
+# Worker processes get the price table once, not per chunk
+_SHARED = {}
+
+
+def _init_worker(shared):
+    _SHARED.update(shared)
+
+
+def _run_chunk(paths):
+    s = _SHARED
+    return [run_account(p, s["prices"], s["month"], s["update"], s["force"]) for p in paths]
+
+
+def run_accounts(paths, prices, month, update=False, force=False, workers=None):
+    # Yields run_account's result per account, in the order of paths.
+    shared = {"prices": prices, "month": month, "update": update, "force": force}
+    chunks = [paths[i:i + CHUNK_ACCOUNTS] for i in range(0, len(paths), CHUNK_ACCOUNTS)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        _init_worker(shared)
+        for chunk in chunks:
+            yield from _run_chunk(chunk)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(shared,)) as pool:
+        for results in pool.map(_run_chunk, chunks):
+            yield from results
+
+
+def _is_new(path):
+    try:
+        return os.path.getsize(path) == 0
+    except OSError:
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("accounts", help="directory of saved account .json files")
+    parser.add_argument("--prices", required=True, help="price file (CSV or Parquet)")
+    parser.add_argument("--out", default=".", help="directory for the order file and report")
+    parser.add_argument("--month", default=datetime.date.today().strftime("%Y-%m"), help="YYYY-MM")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--update", action="store_true", help="write the new positions back to each account")
+    parser.add_argument("--force", action="store_true", help="re-run accounts already run this month")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        datetime.datetime.strptime(args.month, "%Y-%m")
+        paths = list_accounts(args.accounts)
+        prices = read_latest_prices(args.prices)
+        os.makedirs(args.out, exist_ok=True)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    counts = {"ok": 0, "skipped": 0, "error": 0}
+    n_orders = 0
+    spend = 0.0
+    orders_path = os.path.join(args.out, f"orders-{args.month}.csv")
+    report_path = os.path.join(args.out, f"report-{args.month}.csv")
+    # Re-runs in the same month append: orders already placed are never
+    # truncated, and accounts done earlier are skipped, not repeated.
+    new_orders = _is_new(orders_path)
+    new_report = _is_new(report_path)
+    with open(orders_path, "a", newline="", encoding="utf-8") as of, \
+            open(report_path, "a", newline="", encoding="utf-8") as rf:
+        orders_out = csv.writer(of)
+        if new_orders:
+            orders_out.writerow(ORDER_HEADER)
+        report_out = csv.DictWriter(rf, REPORT_HEADER)
+        if new_report:
+            report_out.writeheader()
+        pending = []        # (path, report row, updated account) waiting on the order file
+
+        def settle():
+            # Orders hit the disk before any account is marked done.
+            nonlocal spend
+            of.flush()
+            os.fsync(of.fileno())
+            for path, report, account in pending:
+                if account is not None:
+                    try:
+                        save_account(path, account)
+                    except OSError as e:
+                        report.update(status="error", message=f"orders written but cannot save: {e}")
+                counts[report["status"]] += 1
+                spend += float(report.get("total_spend", 0))
+                report_out.writerow(report)
+            pending.clear()
+
+        results = run_accounts(paths, prices, args.month, args.update, args.force, args.workers)
+        for path, (report, orders, account) in zip(paths, results):
+            n_orders += len(orders)
+            orders_out.writerows(orders)
+            pending.append((path, report, account))
+            if len(pending) >= CHUNK_ACCOUNTS:
+                settle()
+        settle()
+
+    print(f"{len(paths)} accounts for {args.month}: {counts['ok']} planned, {counts['skipped']} skipped, "
+          f"{counts['error']} failed; {n_orders} orders, £{spend:,.2f} to invest "
+          f"({time.perf_counter() - start:.1f}s, {len(prices)} prices)")
+    print(f"Orders: {orders_path}\nReport: {report_path}")
+    sys.exit(1 if counts["error"] else 0)
+
+
+if __name__ == "__main__":
+    main()
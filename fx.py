@@ -0,0 +1,114 @@
+import csv
+import os
+
+import metrics
+from money import mul_div_round, to_scaled
+from validation import CellError
+
+BASE = "GBP"
+
+# Rates are GBP per unit of currency, held as integers at this scale
+RATE_SCALE = 10 ** 8
+
+DEFAULT_PATH = os.environ.get("REBAL_FX", "fx_rates.csv")
+
+
+# -----------------------------
+# FX rate table and conversion to GBP
+# -----------------------------
+# Tables are validated in the listed currency, then every money column is
+# converted to GBP pence in one columnar pass before any engine runs, so the
+# solvers never see a currency. Converted amounts are memoised per
+# (currency, amount) until the rates change (file rewritten or set_rates),
+# which makes re-sizing an unchanged book a dictionary lookup per cell.
+
+class FxTable:
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.rates = {BASE: RATE_SCALE}
+        self.version = 0
+        self._mtime = None
+        self.error = None       # why the rate file could not be used, if it could not
+        self._memo = {}
+        self.hits = 0
+        self.misses = 0
+
+    def set_rates(self, rates):
+        # rates: {"USD": "0.79", ...} GBP per unit
+        scaled = {BASE: RATE_SCALE}
+        for ccy, rate in rates.items():
+            try:
+                value = to_scaled(rate, RATE_SCALE)
+            except (TypeError, ValueError):
+                raise ValueError(f"bad FX rate for {ccy}: {rate!r}") from None
+            if value <= 0:
+                raise ValueError(f"bad FX rate for {ccy}: {rate!r}")
+            scaled[ccy.strip().upper()] = value
+        if scaled != self.rates:
+            self.rates = scaled
+            self.version += 1
+            self._memo.clear()
+
+    def refresh(self):
+        # Re-read the rate file only if it changed; a missing file means GBP only.
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        # A bad file is reported against every non-GBP row until it is fixed.
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        rates = {}
+        try:
+            if mtime is not None:
+                with open(self.path, newline="", encoding="utf-8") as f:
+                    for row in csv.reader(f):
+                        if len(row) < 2 or not row[0].strip() or row[0].strip().lower() == "currency":
+                            continue
+                        rates[row[0]] = row[1].strip()
+            self.set_rates(rates)
+        except (OSError, ValueError, csv.Error) as e:
+            self.error = f"FX rates file invalid: {e}"
+        else:
+            self.error = None
+
+    def to_base(self, columns, currency_col, money_cols):
+        # Converts columns[c] for c in money_cols in place to GBP pence.
+        # Returns a CellError for every row whose currency has no rate.
+        self.refresh()
+        ccys = columns[currency_col]
+        if self.error:
+            return [
+                CellError(r, currency_col, self.error)
+                for r, ccy in enumerate(ccys) if ccy not in (BASE, None)
+            ]
+        errors = [
+            CellError(r, currency_col, f"no FX rate for {ccy}")
+            for r, ccy in enumerate(ccys) if ccy is not None and ccy not in self.rates
+        ]
+        if all(ccy in (BASE, None) for ccy in ccys):
+            return errors
+
+        memo = self._memo
+        rates = self.rates
+        hits, misses = self.hits, self.misses
+        for c in money_cols:
+            out = []
+            for ccy, amount in zip(ccys, columns[c]):
+                if amount is None or ccy in (BASE, None) or ccy not in rates:
+                    out.append(amount)
+                    continue
+                key = (ccy, amount)
+                value = memo.get(key)
+                if value is None:
+                    value = memo[key] = mul_div_round(amount, rates[ccy], RATE_SCALE)
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                out.append(value)
+            columns[c] = out
+        metrics.cache_lookups("fx", self.hits - hits, self.misses - misses)
+        return errors
+
@@ -0,0 +1,179 @@
+import csv
+import datetime
+from decimal import Decimal, InvalidOperation
+
+# -----------------------------
+# Streaming import of broker exports and price files
+# -----------------------------
+# Files are read row by row (CSV) or batch by batch (Parquet, needs
+# pyarrow), and only one value per instrument is kept, so memory is
+# bounded by the number of instruments, not the number of lines.
+
+# Accepted header names per field, compared case-insensitively
+HOLDING_COLUMNS = {
+    "instrument": ["instrument", "name", "security", "stock", "fund", "ticker", "symbol"],
+    "price": ["live price", "live price (£)", "price", "last price", "last", "close", "market price"],
+    "shares": ["shares held", "shares", "quantity", "qty", "units", "holding"],
+    "weight": ["target weight", "target weight (%)", "weight", "weight (%)", "target"],
+    "currency": ["currency", "ccy", "trading currency"],
+}
+
+# Price histories: the date column, when there is one
+DATE_COLUMNS = {"date": ["date", "as of", "as of date", "price date", "timestamp"]}
+
+PARQUET_BATCH_ROWS = 65_536
+
+
+def map_columns(header, columns=HOLDING_COLUMNS):
+    # field -> column index for every field found in the header
+    index = {h.strip().lower(): i for i, h in enumerate(header)}
+    found = {}
+    for field, names in columns.items():
+        for name in names:
+            if name in index:
+                found[field] = index[name]
+                break
+    return found
+
+
+def _parquet_rows(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Reading Parquet files needs pyarrow installed.") from None
+
+    pf = pq.ParquetFile(path)
+    yield [f.name for f in pf.schema_arrow]
+    for batch in pf.iter_batches(batch_size=PARQUET_BATCH_ROWS):
+        cols = [["" if v is None else str(v) for v in col.to_pylist()] for col in batch.columns]
+        yield from zip(*cols)
+
+
+def _csv_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.reader(f)
+
+
+def iter_rows(path):
+    # Header first, then one sequence of cell strings per line.
+    if str(path).lower().endswith((".parquet", ".pq")):
+        return _parquet_rows(path)
+    return _csv_rows(path)
+
+
+def _number(s):
+    try:
+        return Decimal(s.replace(",", "").replace("£", "").strip())
+    except InvalidOperation:
+        raise ValueError(f"not a number: {s!r}") from None
+
+
+def _date(s):
+    # "2026-10-01", "2026-10-01 00:00:00" (Parquet timestamps), "2026-10"
+    # (monthly series) or "01/10/2026"
+    s = s.strip()
+    try:
+        return datetime.date.fromisoformat(s[:10] if len(s) != 7 else f"{s}-01")
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.strptime(s, "%d/%m/%Y").date()
+    except ValueError:
+        raise ValueError(f"not a date (YYYY-MM-DD or DD/MM/YYYY): {s!r}") from None
+
+
+def _plain(d):
+    # Decimal -> shortest plain string ("12", "0.5")
+    return format(d.normalize(), "f")
+
+
+def read_holdings(path):
+    # Broker export -> {instrument: {"price", "shares", "weight", "currency"}} as cell
+    # strings. Lines for the same instrument (e.g. several lots) have their
+    # shares summed; the last price and weight seen win.
+    rows = iter_rows(path)
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise ValueError("File is empty.") from None
+    cols = map_columns(header)
+    if "instrument" not in cols:
+        raise ValueError("No instrument / name column found.")
+
+    out = {}
+    for line, row in enumerate(rows, start=2):
+        if not row or not any(row):
+            continue
+        name = row[cols["instrument"]].strip()
+        if not name:
+            continue
+        rec = out.setdefault(name, {"shares": Decimal(0)})
+        try:
+            if "shares" in cols and row[cols["shares"]].strip():
+                rec["shares"] += _number(row[cols["shares"]])
+            if "price" in cols and row[cols["price"]].strip():
+                rec["price"] = _number(row[cols["price"]])
+            if "weight" in cols and row[cols["weight"]].strip():
+                rec["weight"] = _number(row[cols["weight"]].rstrip("%"))
+            if "currency" in cols and row[cols["currency"]].strip():
+                rec["currency"] = row[cols["currency"]].strip().upper()
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"line {line}: {e}") from None
+
+    return {
+        name: {k: _plain(v) if isinstance(v, Decimal) else v for k, v in rec.items()}
+        for name, rec in out.items()
+    }
+
+
+def read_latest_prices(path, names=None):
+    # Latest price per instrument from a price history, either long
+    # (instrument, price[, date] per line) or wide (date, then one column
+    # per instrument). With a date column the latest date wins whatever
+    # the line order (the later line on a tie); without one, the last line.
+    # Only instruments in names are kept if given.
+    rows = iter_rows(path)
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise ValueError("File is empty.") from None
+    cols = map_columns(header)
+    wanted = set(names) if names is not None else None
+    latest = {}         # name -> (date or None, price cell)
+
+    def keep(name, when, value):
+        prev = latest.get(name)
+        if prev is None or when is None or prev[0] is None or when >= prev[0]:
+            latest[name] = (when, value)
+
+    dc = map_columns(header, DATE_COLUMNS).get("date")
+    if "instrument" in cols and "price" in cols:
+        ic, pc = cols["instrument"], cols["price"]
+        for line, row in enumerate(rows, start=2):
+            if len(row) > max(ic, pc):
+                name = row[ic].strip()
+                if (wanted is None or name in wanted) and row[pc].strip():
+                    try:
+                        when = _date(row[dc]) if dc is not None and dc < len(row) else None
+                    except ValueError as e:
+                        raise ValueError(f"line {line}: {e}") from None
+                    keep(name, when, row[pc].strip())
+    else:
+        index = [
+            (i, h.strip()) for i, h in enumerate(header)
+            if i > 0 and (wanted is None or h.strip() in wanted)
+        ]
+        if not index:
+            raise ValueError("No matching instrument columns found.")
+        for line, row in enumerate(rows, start=2):
+            if not row or not any(row):
+                continue
+            try:
+                when = _date(row[0]) if dc == 0 else None
+            except ValueError as e:
+                raise ValueError(f"line {line}: {e}") from None
+            for i, name in index:
+                if i < len(row) and row[i].strip():
+                    keep(name, when, row[i].strip())
+
+    return {name: _plain(_number(value)) for name, (_, value) in latest.items()}
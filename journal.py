@@ -0,0 +1,158 @@
+import mmap
+import os
+import struct
+import time
+
+from money import PRICE_UNITS
+
+# Queries need NumPy; appending does not. It is imported on the first
+# query so the apps do not pay for it at start-up.
+np = None
+RECORD_DTYPE = None
+
+# -----------------------------
+# Record layout (48 bytes, little-endian, fixed width)
+# -----------------------------
+#   ts          int64   unix seconds
+#   account     uint32  id into the names table
+#   instrument  uint32  id into the names table
+#   kind        uint8   KIND_SHARES (qty = shares) or KIND_SPREADBET (qty = stake ticks)
+#   price_sub_u uint16  price units below the penny (0 in journals written
+#                       before prices were kept below a penny)
+#   qty         int64
+#   price_p     int64   whole pence of the price
+#   margin_p    int64   pence (0 for share purchases)
+RECORD = struct.Struct("<qIIBxH4xqqq")
+RECORD_SIZE = RECORD.size
+
+UNITS_PER_PENNY = PRICE_UNITS // 100
+
+KIND_SHARES = 0
+KIND_SPREADBET = 1
+
+DEFAULT_PATH = os.environ.get("REBAL_JOURNAL", "trade_journal.bin")
+
+
+def _load_numpy():
+    global np, RECORD_DTYPE
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("NumPy is required to query the trade journal.") from None
+        RECORD_DTYPE = numpy.dtype({
+            "names": ["ts", "account", "instrument", "kind", "price_sub_u", "qty", "price_p", "margin_p"],
+            "formats": ["<i8", "<u4", "<u4", "u1", "<u2", "<i8", "<i8", "<i8"],
+            "offsets": [0, 8, 12, 16, 18, 24, 32, 40],
+            "itemsize": RECORD_SIZE,
+        })
+        np = numpy
+
+
+class TradeJournal:
+    # Append-only journal of accepted plans. Accounts and instruments are
+    # stored as small integer ids; their names live one-per-line in a
+    # sidecar "<path>.names" file (line number = id).
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.names_path = path + ".names"
+        self.names = []
+        self.ids = {}
+
+        if os.path.exists(self.names_path):
+            with open(self.names_path, encoding="utf-8") as f:
+                for line in f:
+                    self._register(line.rstrip("\n"))
+
+    def _register(self, name):
+        self.ids[name] = len(self.names)
+        self.names.append(name)
+
+    def _id(self, name, new_names):
+        if name not in self.ids:
+            self._register(name)
+            new_names.append(name)
+        return self.ids[name]
+
+    # ---------------- Writing ----------------
+
+    def append(self, account, kind, legs, ts=None):
+        # legs: iterable of (instrument, qty, price_u, margin_p), the price
+        # in money.PRICE_UNITS so sub-penny fund prices are kept exactly
+        ts = int(time.time()) if ts is None else int(ts)
+        new_names = []
+        acct_id = self._id(account, new_names)
+
+        buf = bytearray()
+        for instrument, qty, price_u, margin_p in legs:
+            price_p, price_sub_u = divmod(int(price_u), UNITS_PER_PENNY)
+            buf += RECORD.pack(ts, acct_id, self._id(instrument, new_names), kind, price_sub_u,
+                               int(qty), price_p, int(margin_p))
+
+        # Names first, so a record never refers to an id that is not on disk.
+        if new_names:
+            with open(self.names_path, "a", encoding="utf-8") as f:
+                f.write("".join(n + "\n" for n in new_names))
+        with open(self.path, "ab") as f:
+            f.write(buf)
+
+        return len(buf) // RECORD_SIZE
+
+    # ---------------- Reading ----------------
+
+    def __len__(self):
+        if not os.path.exists(self.path):
+            return 0
+        return os.path.getsize(self.path) // RECORD_SIZE
+
+    def records(self):
+        # Zero-copy structured view over the memory-mapped file.
+        _load_numpy()
+        n = len(self)
+        if n == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), n * RECORD_SIZE, access=mmap.ACCESS_READ)
+        return np.frombuffer(mm, dtype=RECORD_DTYPE, count=n)
+
+    def _select(self, account=None, kind=None, since=None, until=None):
+        rec = self.records()
+        mask = np.ones(len(rec), dtype=bool)
+        if account is not None:
+            if account not in self.ids:
+                return rec[:0]
+            mask &= rec["account"] == self.ids[account]
+        if kind is not None:
+            mask &= rec["kind"] == kind
+        if since is not None:
+            mask &= rec["ts"] >= int(since)
+        if until is not None:
+            mask &= rec["ts"] < int(until)
+        return rec[mask]
+
+    def contributions_by_instrument(self, account=None, since=None, until=None):
+        # £ spent per instrument on share purchases, from the exact price
+        rec = self._select(account, KIND_SHARES, since, until)
+        price_u = rec["price_p"] * UNITS_PER_PENNY + rec["price_sub_u"]
+        spend = np.bincount(rec["instrument"], weights=rec["qty"] * price_u, minlength=len(self.names))
+        return {self.names[i]: float(spend[i]) / PRICE_UNITS for i in np.flatnonzero(spend)}
+
+    def average_margin_by_month(self, account=None, since=None, until=None):
+        # Margin of each plan (records sharing account + timestamp), averaged
+        # per calendar month. Returns [("YYYY-MM", avg £), ...] in month order.
+        rec = self._select(account, KIND_SPREADBET, since, until)
+        if len(rec) == 0:
+            return []
+
+        order = np.lexsort((rec["account"], rec["ts"]))
+        ts = rec["ts"][order]
+        acct = rec["account"][order]
+        starts = np.flatnonzero(np.r_[True, (ts[1:] != ts[:-1]) | (acct[1:] != acct[:-1])])
+        plan_margin = np.add.reduceat(rec["margin_p"][order], starts)
+        plan_month = ts[starts].astype("datetime64[s]").astype("datetime64[M]")
+
+        months, month_idx = np.unique(plan_month, return_inverse=True)
+        totals = np.bincount(month_idx, weights=plan_margin)
+        counts = np.bincount(month_idx)
+        return [(str(m), float(t) / int(c) / 100.0) for m, t, c in zip(months, totals, counts)]
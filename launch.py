@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+
+# First interactive frame should appear within this budget
+LAUNCH_BUDGET_MS = 150
+
+# -----------------------------
+# Launch timing
+# -----------------------------
+# Measured from process start where the OS tells us (Linux /proc, 10 ms
+# resolution), else from the first import of this module, to the first
+# idle pass after the window is mapped and drawn. Reported on stderr when
+# REBAL_LAUNCH_TIMING is set or the app is run with --measure-launch
+# (which also exits once the frame is up).
+
+
+def _process_age():
+    try:
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return max(0.0, time.clock_gettime(time.CLOCK_BOOTTIME) - started)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+
+_T0 = time.perf_counter() - _process_age()
+
+
+def after_first_frame(root, callback):
+    # Idle callbacks queued while idle handlers run go to the next pass, so
+    # nesting one runs callback after the first layout and redraw.
+    root.after_idle(lambda: root.after_idle(callback))
+
+
+def measure_launch(root, name):
+    exit_after = "--measure-launch" in sys.argv
+    if not (exit_after or os.environ.get("REBAL_LAUNCH_TIMING")):
+        return
+
+    pending = [True]
+
+    def on_map(event):
+        if event.widget is root and pending:
+            pending.clear()
+            after_first_frame(root, report)
+
+    def report():
+        ms = (time.perf_counter() - _T0) * 1000
+        verdict = "ok" if ms <= LAUNCH_BUDGET_MS else f"over {LAUNCH_BUDGET_MS} ms budget"
+        print(f"{name}: first frame after {ms:.1f} ms ({verdict})", file=sys.stderr)
+        if exit_after:
+            root.destroy()
+
+    root.bind("<Map>", on_map, add="+")
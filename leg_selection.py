@@ -0,0 +1,71 @@
+from bisect import bisect_right
+
+# -----------------------------
+# Best-subset leg selection (0/1 knapsack)
+# -----------------------------
+# Used when the margin cap cannot hold every leg at its minimum stake: pick
+# the legs whose minimum margins fit under the cap and cover the most value
+# (target weight or minimum notional). Exact depth-first branch and bound
+# over legs sorted by value per pence of margin, pruned with the fractional
+# (LP) bound; ties go to the cheaper subset.
+
+def best_subset(costs, values, capacity, max_nodes=200_000):
+    # Returns (indices, total_value, total_cost, optimal). optimal is False
+    # only if max_nodes was exhausted, in which case the best subset found
+    # so far is returned.
+    items = [i for i in range(len(costs)) if 0 < costs[i] <= capacity and values[i] > 0]
+    items.sort(key=lambda i: values[i] / costs[i], reverse=True)
+    c = [costs[i] for i in items]
+    v = [values[i] for i in items]
+    n = len(items)
+
+    # Greedy fill as the starting incumbent
+    best = [0, 0, []]   # value, cost, chosen positions
+    room = capacity
+    for k in range(n):
+        if c[k] <= room:
+            room -= c[k]
+            best[0] += v[k]
+            best[1] += c[k]
+            best[2].append(k)
+
+    # Prefix sums give the Dantzig bound in O(log n): take whole legs in
+    # ratio order until one does not fit, then that leg fractionally.
+    # Values are integers, so the bound is floored.
+    cum_c = [0]
+    cum_v = [0]
+    for k in range(n):
+        cum_c.append(cum_c[-1] + c[k])
+        cum_v.append(cum_v[-1] + v[k])
+
+    def bound(k, room, value):
+        j = bisect_right(cum_c, cum_c[k] + room, k) - 1
+        value += cum_v[j] - cum_v[k]
+        if j < n:
+            value += v[j] * (room - (cum_c[j] - cum_c[k])) // c[j]
+        return value
+
+    # Depth-first, "take" branch first. Chosen sets are linked lists
+    # (position, parent) so nodes are cheap to push.
+    nodes = 0
+    stack = [(0, capacity, 0, 0, None)]
+    while stack and nodes < max_nodes:
+        k, room, value, cost, chosen = stack.pop()
+        nodes += 1
+        if value > best[0] or (value == best[0] and cost < best[1]):
+            best[0], best[1] = value, cost
+            best[2] = []
+            node = chosen
+            while node is not None:
+                best[2].append(node[0])
+                node = node[1]
+        if k == n:
+            continue
+        limit = bound(k, room, value)
+        if limit < best[0] or (limit == best[0] and cost >= best[1]):
+            continue
+        stack.append((k + 1, room, value, cost, chosen))
+        if c[k] <= room:
+            stack.append((k + 1, room - c[k], value + v[k], cost + c[k], (k, chosen)))
+
+    return sorted(items[k] for k in best[2]), best[0], best[1], not stack
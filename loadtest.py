@@ -0,0 +1,110 @@
+"""Load test for service.py over keep-alive connections.
+
+    python service.py &
+    python loadtest.py [--endpoint /spreadbet] [--clients 8] [--seconds 5]
+
+Each client process holds one persistent HTTP/1.1 connection and fires
+requests back to back; the parent prints aggregate throughput and latency
+percentiles.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import time
+
+PAYLOADS = {
+    "/spreadbet": {
+        "balance": 10000, "margin_pct": 30,
+        "instruments": [
+            {"name": "US500", "sector": "equity", "price": 5000, "min_stake": 0.5,
+             "margin_min": 120, "notional_min": 2500, "weight_pct": 55},
+            {"name": "Bonds", "sector": "bond", "price": 110, "min_stake": 1,
+             "margin_min": 30, "notional_min": 1100, "weight_pct": 35},
+            {"name": "Gold", "sector": "commodity", "price": 2000, "min_stake": 0.1,
+             "margin_min": 40, "notional_min": 2000, "weight_pct": 10},
+        ],
+    },
+    "/risk": {
+        "balance": 10000, "margin_pct": 30,
+        "instruments": [
+            {"name": "US 500", "sector": "Equity", "price": 5000, "min_stake": 0.5,
+             "margin_min": 120, "notional_min": 2500},
+            {"name": "Gold", "sector": "Commodity", "price": 2000, "min_stake": 0.1,
+             "margin_min": 40, "notional_min": 2000},
+        ],
+    },
+    "/shares": {
+        "cash": 0, "monthly": 200,
+        "holdings": [
+            {"name": "S&P 500 ETF", "price": 85.2, "shares": 10, "weight_pct": 42},
+            {"name": "World ex-US ETF", "price": 31.4, "shares": 12, "weight_pct": 28},
+            {"name": "Bond ETF", "price": 4.9, "shares": 60, "weight_pct": 30},
+        ],
+    },
+}
+
+
+def client(host, port, endpoint, batch, seconds, out):
+    body = json.dumps(PAYLOADS[endpoint] if batch == 1 else [PAYLOADS[endpoint]] * batch)
+    headers = {"Content-Type": "application/json"}
+    conn = http.client.HTTPConnection(host, port)
+
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            break
+        conn.request("POST", endpoint, body, headers)
+        resp = conn.getresponse()
+        resp.read()
+        if resp.status != 200:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+
+    conn.close()
+    out.put((latencies, errors))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load test for the sizing service")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--endpoint", default="/spreadbet", choices=sorted(PAYLOADS))
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--batch", type=int, default=1, help="problems per request (JSON list)")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    args = ap.parse_args()
+
+    out = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(
+            target=client,
+            args=(args.host, args.port, args.endpoint, args.batch, args.seconds, out))
+        for _ in range(args.clients)
+    ]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    latencies = sorted(l for lats, _ in results for l in lats)
+    errors = sum(e for _, e in results)
+    if not latencies:
+        print("No requests completed.")
+        return
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+
+    requests = len(latencies)
+    print(f"{args.endpoint}: {requests} requests, {errors} errors, {args.clients} clients, batch {args.batch}")
+    print(f"  {requests / args.seconds:,.0f} req/s   {requests * args.batch / args.seconds:,.0f} solves/s")
+    print(f"  latency ms  p50 {pct(0.50):.2f}  p90 {pct(0.90):.2f}  p99 {pct(0.99):.2f}  max {latencies[-1] * 1000:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from bisect import bisect_left, bisect_right
+
+from money import BP, mul_div_round, to_scaled, to_ticks
+
+# -----------------------------
+# Tiered (band-based) margin
+# -----------------------------
+# A tier table says: the part of a position above F £/pt is margined at M
+# times the instrument's base rate (margin_min / min_stake). Written in the
+# table as "50:1.5, 200:3" (above 50 £/pt 1.5x, above 200 £/pt 3x); the band
+# from 0 is always 1x. Internally stakes are ticks and multipliers are bp,
+# so margin is an exact integer function of stake, piecewise linear with a
+# kink at every band start.
+
+
+def parse_tiers(cell):
+    # "50:1.5, 200:3" or [[50, 1.5], [200, 3]] -> ((from_ticks, mult_bp), ...)
+    if isinstance(cell, (list, tuple)):
+        try:
+            pairs = [tuple(p) for p in cell]
+        except TypeError:
+            raise ValueError("tiers must be [stake, multiplier] pairs") from None
+        if any(len(p) != 2 for p in pairs):
+            raise ValueError("tiers must be [stake, multiplier] pairs")
+    else:
+        pairs = []
+        for part in str(cell).replace(";", ",").split(","):
+            if not part.strip():
+                continue
+            stake, sep, mult = part.partition(":")
+            if not sep:
+                raise ValueError(f"tier {part.strip()!r} is not 'stake:multiplier'")
+            pairs.append((stake, mult))
+
+    tiers = []
+    for stake, mult in pairs:
+        try:
+            from_ticks = to_ticks(stake)
+            mult_bp = to_scaled(mult, BP)
+        except (TypeError, ValueError):
+            raise ValueError(f"bad tier {stake}:{mult}") from None
+        if from_ticks <= 0 or mult_bp <= 0:
+            raise ValueError(f"bad tier {stake}:{mult}")
+        tiers.append((from_ticks, mult_bp))
+
+    tiers.sort()
+    if len({t for t, _ in tiers}) != len(tiers):
+        raise ValueError("duplicate tier start")
+    return tuple(tiers)
+
+
+def format_tiers(tiers):
+    return ", ".join(f"{t / 10_000:g}:{m / BP:g}" for t, m in tiers)
+
+
+class MarginSchedule:
+    # Margin of one instrument as a function of stake ticks.
+
+    def __init__(self, min_stake_ticks, margin_min_p, tiers=()):
+        self.min_stake_ticks = min_stake_ticks
+        self.margin_min_p = margin_min_p
+        self.starts = [0]
+        self.mults = [BP]
+        self.cum = [0]          # units (ticks * mult_bp) accumulated at each start
+        for from_ticks, mult_bp in tiers:
+            self.cum.append(self.cum[-1] + (from_ticks - self.starts[-1]) * self.mults[-1])
+            self.starts.append(from_ticks)
+            self.mults.append(mult_bp)
+        self.linear = len(self.starts) == 1
+        # margin_p = units * margin_min_p / (min_stake_ticks * BP)
+        self.denom = min_stake_ticks * BP
+
+    def units(self, ticks):
+        j = bisect_left(self.starts, ticks) - 1 if ticks > 0 else 0
+        return self.cum[j] + (ticks - self.starts[j]) * self.mults[j]
+
+    def margin(self, ticks):
+        return mul_div_round(self.units(ticks), self.margin_min_p, self.denom)
+
+    def max_ticks(self, margin_p):
+        # Largest stake whose margin does not exceed margin_p. margin()
+        # rounds half up, so margin <= M exactly when
+        #     2 * units * margin_min_p < denom * (2M + 1)
+        if margin_p < 0:
+            return 0
+        units = (self.denom * (2 * margin_p + 1) - 1) // (2 * self.margin_min_p)
+        j = bisect_right(self.cum, units) - 1
+        return self.starts[j] + (units - self.cum[j]) // self.mults[j]
+
+    def band_starts(self):
+        return self.starts[1:]
+
+    def band_mults(self):
+        return self.mults
@@ -0,0 +1,140 @@
+import os
+import threading
+from bisect import bisect_left
+
+METRICS_PATH = os.environ.get("REBAL_METRICS")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096)
+
+
+# -----------------------------
+# Prometheus text-format metrics (stdlib only)
+# -----------------------------
+# Updating a metric is a dict lookup, a bisect over a dozen bounds and a
+# few integer adds under a lock; rendering happens only when scraped
+# (service GET /metrics) or when a textfile is written after Calculate
+# (REBAL_METRICS=path, e.g. for the node_exporter textfile collector).
+
+_REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def observe(self, value, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            v = self.values.get(label_values)
+            if v is None:
+                v = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0]
+            v[i] += 1
+            v[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, v in sorted(self.values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), v[:-1]):
+                cumulative += n
+                labels = _labels(self.labels + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {v[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+CALCULATE_RUNS = Counter("rebal_calculate_runs_total", "Calculate runs.", ("app",))
+CALCULATE_SECONDS = Histogram(
+    "rebal_calculate_seconds", "Calculate wall time incl. validation and output.", ("app",)
+)
+SOLVER_SECONDS = Histogram("rebal_solver_seconds", "Engine call latency.", ("solver",))
+SOLVER_ITERATIONS = Histogram(
+    "rebal_solver_iterations", "Iterations per engine call, where reported.", ("solver",), COUNT_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    "rebal_cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result")
+)
+SERVICE_REQUESTS = Counter("rebal_service_requests_total", "Sizing service requests.", ("endpoint", "status"))
+SERVICE_BATCH_SIZE = Histogram(
+    "rebal_service_batch_size", "Problems per JSON list request body.", (), COUNT_BUCKETS
+)
+
+
+def observe_solver(solver, seconds, result):
+    SOLVER_SECONDS.observe(seconds, solver)
+    if isinstance(result, dict) and "iterations" in result:
+        SOLVER_ITERATIONS.observe(result["iterations"], solver)
+
+
+def solver_iterations(solver, n):
+    # For engines whose result has no room for a count (tuples, arrays)
+    SOLVER_ITERATIONS.observe(n, solver)
+
+
+def cache_lookups(cache, hits, misses):
+    if hits:
+        CACHE_LOOKUPS.inc(cache, "hit", amount=hits)
+    if misses:
+        CACHE_LOOKUPS.inc(cache, "miss", amount=misses)
+
+
+def render():
+    lines = []
+    for metric in _REGISTRY:
+        if metric.values:
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path=None):
+    # Atomic replace so a collector never reads a half-written file.
+    path = path or METRICS_PATH
+    if not path:
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp, path)
@@ -0,0 +1,61 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+
+# -----------------------------
+# Fixed-point scales
+# -----------------------------
+# All solver arithmetic runs on plain Python ints in these units, so
+# floors, sums and comparisons are exact and never drift over long loops.
+PENCE = 100             # £1      = 100 pence
+BP = 10_000             # 100%    = 10,000 basis points
+STAKE_TICKS = 10_000    # 1 £/pt  = 10,000 ticks (0.0001 £/pt resolution)
+PRICE_UNITS = 1_000_000 # £1      = 1,000,000 units (share prices below a penny)
+
+
+def to_scaled(value, scale: int) -> int:
+    # Strings (what the Entry widgets hold) are parsed exactly via Decimal;
+    # floats are rounded to the nearest unit, which absorbs representation
+    # error such as 0.3 * 100 == 30.000000000000004.
+    if isinstance(value, int):
+        return value * scale
+    if isinstance(value, float):
+        if value != value or value in (float("inf"), float("-inf")):
+            raise ValueError(f"not a finite number: {value!r}")
+        return round(value * scale)
+
+    try:
+        d = Decimal(str(value).strip().replace(",", ""))
+    except InvalidOperation:
+        raise ValueError(f"not a number: {value!r}") from None
+    if not d.is_finite():
+        raise ValueError(f"not a finite number: {value!r}")
+    return int((d * scale).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def to_pence(value) -> int:
+    return to_scaled(value, PENCE)
+
+
+def to_ticks(value) -> int:
+    return to_scaled(value, STAKE_TICKS)
+
+
+def to_price_units(value) -> int:
+    return to_scaled(value, PRICE_UNITS)
+
+
+def pct_to_bp(value) -> int:
+    # "42.5" (%) -> 4250 bp
+    return to_scaled(value, BP // 100)
+
+
+def from_pence(pence: int) -> float:
+    return pence / PENCE
+
+
+def from_ticks(ticks: int) -> float:
+    return ticks / STAKE_TICKS
+
+
+def mul_div_round(a: int, b: int, c: int) -> int:
+    # round-half-up(a * b / c) for c > 0
+    return (2 * a * b + c) // (2 * c)
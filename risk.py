@@ -1,21 +1,138 @@
+import csv
+import os
 import tkinter as tk
 from tkinter import messagebox, font
 
+from fx import FxTable
+from journal import KIND_SPREADBET, TradeJournal
+from launch import measure_launch
+from money import BP, from_pence, from_ticks, mul_div_round, pct_to_bp, to_pence, to_price_units, to_scaled
+from risk_engine import LEG_CURRENCY_COL, LEG_MONEY_COLS, LEG_PARSERS, PRICE_COL, make_leg, size_risk_dial
+from sessions import record, recorded_session
+from universe import InstrumentSearch
+from validation import ERROR_BG, format_errors, mark_cells, validate_table
+
+HEADERS = [
+    "Instrument", "Sector", "Live Price", "Min Stake",
+    "Margin @ Min", "Notional @ Min", "Weight (%)", "Margin Tiers", "Currency"
+]
+
+
+# -----------------------------
+# Live margin headroom monitor
+# -----------------------------
+# Once stakes are placed they are held fixed while prices move. At a fixed
+# stake margin and notional are linear in price, so each leg keeps its
+# margin and notional at the sizing price and a price tick rescales that
+# one leg and adjusts the running totals: constant time per tick, no
+# re-size. Prices are held as integers at PRICE_SCALE; P&L (long legs)
+# moves the account equity, and with it the margin target.
+
+PRICE_SCALE = 10 ** 6
+
+
+class MarginMonitor:
+
+    def __init__(self, instruments, stake_ticks, balance_p, margin_bp, equity_idx=None):
+        self.instruments = instruments
+        self.stake_ticks = list(stake_ticks)
+        self.balance_p = balance_p          # cash balance incl. realised P&L
+        self.margin_bp = margin_bp
+        self.equity_idx = equity_idx
+        # Margin/notional inputs were entered at this price
+        self.base_price = [to_scaled(inst['price'], PRICE_SCALE) for inst in instruments]
+        self.price = list(self.base_price)
+        self.entry_price = list(self.base_price)
+        self.base_margin_p = [0] * len(instruments)
+        self.base_notional_p = [0] * len(instruments)
+        self.margin_p = [0] * len(instruments)
+        self.pnl_p = [0] * len(instruments)
+        self.total_margin_p = 0
+        self.total_pnl_p = 0
+        self.updates = 0
+        for i, ticks in enumerate(self.stake_ticks):
+            self._rebase(i, ticks)
+
+    def _rebase(self, i, ticks):
+        inst = self.instruments[i]
+        self.stake_ticks[i] = ticks
+        self.base_margin_p[i] = inst['schedule'].margin(ticks)
+        self.base_notional_p[i] = mul_div_round(ticks, inst['notional_min_p'], inst['min_stake_ticks'])
+        margin_p = mul_div_round(self.base_margin_p[i], self.price[i], self.base_price[i])
+        self.total_margin_p += margin_p - self.margin_p[i]
+        self.margin_p[i] = margin_p
+
+    def update_price(self, i, price):
+        p = to_scaled(price, PRICE_SCALE)
+        if p <= 0:
+            raise ValueError("price must be greater than 0")
+        base = self.base_price[i]
+        margin_p = mul_div_round(self.base_margin_p[i], p, base)
+        pnl_p = mul_div_round(self.base_notional_p[i], p - self.entry_price[i], base)
+        self.total_margin_p += margin_p - self.margin_p[i]
+        self.total_pnl_p += pnl_p - self.pnl_p[i]
+        self.margin_p[i] = margin_p
+        self.pnl_p[i] = pnl_p
+        self.price[i] = p
+        self.updates += 1
+
+    def set_stake(self, i, ticks):
+        # An adjustment was placed at the current price: realise the leg's
+        # P&L on the old stake and carry on from here with the new one.
+        self.balance_p += self.pnl_p[i]
+        self.total_pnl_p -= self.pnl_p[i]
+        self.pnl_p[i] = 0
+        self.entry_price[i] = self.price[i]
+        self._rebase(i, ticks)
+
+    @property
+    def equity_p(self):
+        return self.balance_p + self.total_pnl_p
+
+    @property
+    def target_margin_p(self):
+        return self.equity_p * self.margin_bp // BP
+
+    @property
+    def headroom_p(self):
+        return self.target_margin_p - self.total_margin_p
+
+    def suggestion(self):
+        # Equity-leg stake that brings total margin back to the target, sized
+        # as the risk dial does (largest stake at or under it, at least the
+        # min stake). Returns (new_ticks, change_ticks), or None.
+        i = self.equity_idx
+        if i is None:
+            return None
+        inst = self.instruments[i]
+        budget_p = self.target_margin_p - (self.total_margin_p - self.margin_p[i])
+        # The schedule is in margin at the base price; scale the budget back.
+        ticks = max(
+            inst['min_stake_ticks'],
+            inst['schedule'].max_ticks(budget_p * self.base_price[i] // self.price[i]),
+        )
+        return ticks, ticks - self.stake_ticks[i]
+
+
+JOURNAL_ACCOUNT = 'Spread Bet'
+
+MODES = ['Risk Dial', 'Risk Parity']
+
+MONITOR_POLL_MS = 1000
+
+
 class PortfolioPositionSizerDynamic:
     def __init__(self, root):
         self.root = root
         root.title('25Ten Delta Capital')
-        root.geometry('1300x670')
+        root.geometry('1600x710')
 
         default_font = font.nametofont('TkDefaultFont')
         default_font.configure(size=12)
         root.option_add('*Font', default_font)
 
         self.rows = []
-        self.headers = [
-            "Instrument", "Sector", "Live Price", "Min Stake",
-            "Margin @ Min", "Notional @ Min", "Weight (%)"
-        ]
+        self.headers = HEADERS
 
         self.dynamic_frame = tk.Frame(root)
         self.dynamic_frame.pack(fill='both', expand=True, padx=10, pady=10)
@@ -34,6 +151,57 @@ class PortfolioPositionSizerDynamic:
 
         tk.Button(control_frame, text="Add Instrument", command=self.add_row).pack(side='left')
         tk.Button(control_frame, text="Calculate Stakes", command=self.calculate).pack(side='left')
+        tk.Button(control_frame, text="Save to Journal", command=self.save_to_journal).pack(side='left')
+
+        self.last_plan = None
+
+        # Risk parity controls (covariance from a local price history CSV)
+        parity_frame = tk.Frame(self.dynamic_frame)
+        parity_frame.pack(anchor='w', pady=(6,0))
+
+        tk.Label(parity_frame, text="Mode:").pack(side='left')
+        self.mode = tk.StringVar(value=MODES[0])
+        tk.OptionMenu(parity_frame, self.mode, *MODES).pack(side='left', padx=(0,10))
+
+        tk.Label(parity_frame, text="Price History CSV:").pack(side='left')
+        self.entry_history = tk.Entry(parity_frame, width=30)
+        self.entry_history.pack(side='left', padx=(0,10))
+
+        tk.Label(parity_frame, text="Target Vol (%/yr):").pack(side='left')
+        self.entry_target_vol = tk.Entry(parity_frame, width=6)
+        self.entry_target_vol.pack(side='left', padx=(0,10))
+
+        self.history = None
+
+        # Margin monitor: holds the placed stakes and tracks margin as prices
+        # move (edit a Live Price cell, or append rows to a price feed CSV
+        # whose header names the instruments).
+        monitor_frame = tk.Frame(self.dynamic_frame)
+        monitor_frame.pack(anchor='w', pady=(6,0))
+
+        tk.Button(monitor_frame, text="Monitor Positions", command=self.start_monitor).pack(side='left')
+        tk.Label(monitor_frame, text="Price Feed CSV:").pack(side='left', padx=(10,0))
+        self.entry_feed = tk.Entry(monitor_frame, width=30)
+        self.entry_feed.pack(side='left', padx=(0,10))
+        tk.Button(monitor_frame, text="Apply Adjustment", command=self.apply_adjustment).pack(side='left')
+        tk.Button(monitor_frame, text="Stop Monitor", command=self.stop_monitor).pack(side='left')
+
+        self.monitor_label = tk.Label(self.dynamic_frame, text='', font=('Courier', 12), justify='left')
+        self.monitor_label.pack(anchor='w')
+
+        self.monitor = None
+        self.placed = None
+        self._poll_id = None
+
+        # Type-ahead search over the instrument master; picking one adds a
+        # filled-in row.
+        search_frame = tk.Frame(self.dynamic_frame)
+        search_frame.pack(anchor='w', pady=(6,0))
+
+        tk.Label(search_frame, text="Find Instrument:").grid(row=0, column=0, sticky='nw')
+        self.search = InstrumentSearch(search_frame, self.headers, self.add_row, width=30)
+        self.search.entry.grid(row=0, column=1, sticky='nw', padx=(0,10))
+        self.search.listbox.grid(row=0, column=2, sticky='w')
 
         # Table
         self.table_frame = tk.Frame(self.dynamic_frame)
@@ -53,6 +221,9 @@ class PortfolioPositionSizerDynamic:
         self.output = tk.Text(self.dynamic_frame, height=16, font=('Courier', 12), bg='#f9f9f9', state='disabled')
         self.output.pack(fill='both', expand=True, pady=(10,0))
 
+        self.entry_bg = self.entry_balance.cget('bg')
+        self.fx = FxTable()
+
     def add_row(self, values=None):
         row_idx = len(self.rows) + 1
         entries = []
@@ -62,6 +233,9 @@ class PortfolioPositionSizerDynamic:
             if values and col < len(values):
                 ent.insert(0, str(values[col]))
             ent.grid(row=row_idx, column=col, padx=1, pady=2)
+            if col == PRICE_COL:
+                ent.bind('<Return>', self._on_price_edit)
+                ent.bind('<FocusOut>', self._on_price_edit)
             entries.append(ent)
 
         btn = tk.Button(self.table_frame, text="Delete", command=lambda idx=row_idx: self.delete_row(idx))
@@ -82,7 +256,11 @@ class PortfolioPositionSizerDynamic:
                     ent.grid(row=i+1, column=col)
                 self.rows[i][1].grid(row=i+1, column=len(self.headers))
 
+    @recorded_session("risk")
     def calculate(self):
+        self.last_plan = None
+        self.placed = None
+        self.stop_monitor()
         self.output.config(state='normal')
         self.output.delete('1.0', tk.END)
 
@@ -98,70 +276,39 @@ class PortfolioPositionSizerDynamic:
 
         target_total_margin = balance * margin_pct
 
-        instruments = []
-        for entries, _ in self.rows:
-            try:
-                inst = {
-                    'name': entries[0].get().strip(),
-                    'sector': entries[1].get().strip().lower(),
-                    'price': float(entries[2].get()),
-                    'min_stake': float(entries[3].get()),
-                    'margin_min': float(entries[4].get()),
-                    'notional_min': float(entries[5].get())
-                }
-                inst['margin_per_unit'] = inst['margin_min'] / inst['min_stake']
-                inst['notional_per_unit'] = inst['notional_min'] / inst['min_stake']
-                instruments.append(inst)
-            except Exception:
-                continue
+        # Instrument rows: every bad cell is reported at once
+        entry_rows = [entries for entries, _ in self.rows]
+        cells = [[e.get() for e in entries] for entries in entry_rows]
+        columns, errors = validate_table(cells, LEG_PARSERS)
+        errors = sorted(errors + self.fx.to_base(columns, LEG_CURRENCY_COL, LEG_MONEY_COLS))
+        mark_cells(entry_rows, errors, self.entry_bg)
 
-        if not instruments:
-            messagebox.showerror('Input Error', 'Enter at least one valid instrument.')
+        if errors:
+            messagebox.showerror('Input Error', format_errors(errors, self.headers))
             return
 
-        equity_idx = None
-        fixed_idxs = []
+        instruments = [make_leg(*row) for row in zip(*columns)]
 
-        for i, inst in enumerate(instruments):
-            if inst['sector'] == 'equity':
-                equity_idx = i
-            else:
-                fixed_idxs.append(i)
-
-        if equity_idx is None:
-            messagebox.showerror('Input Error', 'One Equity instrument (US500) is required.')
+        if not instruments:
+            messagebox.showerror('Input Error', 'Enter at least one valid instrument.')
             return
 
-        stakes = [0.0] * len(instruments)
-        margins = [0.0] * len(instruments)
-        notionals = [0.0] * len(instruments)
-
-        fixed_margin = 0.0
-
-        # Fixed instruments (gold/bonds)
-        for i in fixed_idxs:
-            stakes[i] = instruments[i]['min_stake']
-            margins[i] = stakes[i] * instruments[i]['margin_per_unit']
-            notionals[i] = stakes[i] * instruments[i]['notional_per_unit']
-            fixed_margin += margins[i]
-
-        # Equity instrument (risk dial)
-        eq = instruments[equity_idx]
-        remaining_margin = target_total_margin - fixed_margin
-
-        if remaining_margin <= 0:
-            stakes[equity_idx] = eq['min_stake']
+        if self.mode.get() == 'Risk Parity':
+            result = self._size_risk_parity(instruments, target_total_margin, balance)
+            if result is None:
+                return
         else:
-            stakes[equity_idx] = max(
-                eq['min_stake'],
-                remaining_margin / eq['margin_per_unit']
-            )
+            result = record("risk.size_risk_dial", size_risk_dial, instruments, target_total_margin)
 
-        margins[equity_idx] = stakes[equity_idx] * eq['margin_per_unit']
-        notionals[equity_idx] = stakes[equity_idx] * eq['notional_per_unit']
+            if result is None:
+                messagebox.showerror('Input Error', 'One Equity instrument (US500) is required.')
+                return
 
-        total_margin = sum(margins)
-        total_notional = sum(notionals)
+        stakes = [from_ticks(t) for t in result['stake_ticks']]
+        margins = [from_pence(p) for p in result['margin_p']]
+        notionals = [from_pence(p) for p in result['notional_p']]
+
+        total_margin = from_pence(result['total_margin_p'])
 
         # Output
         self.output.insert(tk.END, f"{'Instrument':25s} {'Sector':10s} {'Stake (£/pt)':>15s} {'Notional £':>13s} {'Margin £':>12s}\n")
@@ -180,10 +327,191 @@ class PortfolioPositionSizerDynamic:
             f"{'TOTAL MARGIN USED:':<55s}{total_margin:12.2f} "
             f"(target {target_total_margin:.2f}, actual {(total_margin/balance)*100:.2f}%)\n"
         )
+        if result.get('over_target_p'):
+            self.output.insert(
+                tk.END,
+                f"WARNING: min stakes alone exceed the target by £{from_pence(result['over_target_p']):.2f}\n"
+            )
+
+        if 'weights' in result:
+            self.output.insert(tk.END, '\n' + f"{'RISK PARITY':25s} {'Weight %':>12s} {'Risk contrib %':>15s}\n")
+            self.output.insert(tk.END, '-' * 85 + '\n')
+            for inst, w, rc in zip(instruments, result['weights'], result['risk_contributions']):
+                self.output.insert(tk.END, f"{inst['name']:25s} {w * 100:12.2f} {rc * 100:15.2f}\n")
+            self.output.insert(
+                tk.END,
+                f"Portfolio vol (EWMA, annualised): {result['portfolio_vol'] * 100:.2f}% "
+                f"over {self.history.model.bars} bars\n"
+            )
 
         self.output.config(state='disabled')
 
+        self.last_plan = [
+            (inst['name'], ticks, to_price_units(inst['price']), margin_p)
+            for inst, ticks, margin_p in zip(instruments, result['stake_ticks'], result['margin_p'])
+        ]
+        equity_idxs = [i for i, inst in enumerate(instruments) if inst['sector'] == 'equity']
+        self.placed = {
+            'instruments': instruments,
+            'stake_ticks': result['stake_ticks'],
+            'balance_p': to_pence(self.entry_balance.get()),
+            'margin_bp': pct_to_bp(self.entry_margin_pct.get()),
+            'equity_idx': equity_idxs[-1] if equity_idxs else None,
+            'entry_rows': entry_rows,
+        }
+
+    def _size_risk_parity(self, instruments, target_total_margin, balance):
+        try:
+            from riskparity import PriceHistory, size_risk_parity
+        except ImportError:
+            messagebox.showerror('Risk Parity', 'Risk parity mode needs NumPy installed.')
+            return None
+
+        path = self.entry_history.get().strip()
+        names = [inst['name'] for inst in instruments]
+        try:
+            target_vol = self.entry_target_vol.get().strip()
+            target_vol = float(target_vol) / 100 if target_vol else None
+
+            # Keep the model between runs: a re-size reuses the cached
+            # weights, and an appended file only feeds in its new bars.
+            if self.history is None or self.history.path != path or self.history.names != names:
+                self.history = PriceHistory(path, names)
+            self.history.refresh()
+        except (OSError, ValueError, IndexError) as e:
+            self.history = None
+            messagebox.showerror('Risk Parity', f'Cannot use price history: {e}')
+            return None
+
+        if self.history.model.bars < 2:
+            messagebox.showerror('Risk Parity', 'Price history needs at least three rows.')
+            return None
+
+        return record(
+            "riskparity.size_risk_parity", size_risk_parity,
+            instruments, target_total_margin, self.history.model, balance, target_vol,
+        )
+
+    # ---------------- Margin monitor ----------------
+
+    def start_monitor(self):
+        if not self.placed:
+            messagebox.showinfo('Monitor', 'Calculate stakes first.')
+            return
+        p = self.placed
+        self.monitor = MarginMonitor(
+            p['instruments'], p['stake_ticks'], p['balance_p'], p['margin_bp'], p['equity_idx']
+        )
+        self._price_cells = {entries[PRICE_COL]: i for i, entries in enumerate(p['entry_rows'])}
+        self._feed_path = None
+        self._show_monitor()
+        if self._poll_id is None:
+            self._poll_id = self.root.after(MONITOR_POLL_MS, self._poll_feed)
+
+    def stop_monitor(self):
+        self.monitor = None
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        self.monitor_label.config(text='')
+
+    def apply_adjustment(self):
+        # The suggested equity stake has been placed: hold it from now on.
+        if self.monitor is None:
+            messagebox.showinfo('Monitor', 'Start the monitor first.')
+            return
+        suggestion = self.monitor.suggestion()
+        if suggestion and suggestion[1]:
+            self.monitor.set_stake(self.monitor.equity_idx, suggestion[0])
+            self._show_monitor()
+
+    def _on_price_edit(self, event):
+        if self.monitor is None:
+            return
+        i = self._price_cells.get(event.widget)
+        if i is None:
+            return
+        try:
+            self.monitor.update_price(i, event.widget.get())
+        except ValueError:
+            event.widget.config(bg=ERROR_BG)
+            return
+        event.widget.config(bg=self.entry_bg)
+        self._show_monitor()
+
+    def _poll_feed(self):
+        self._poll_id = None
+        if self.monitor is None:
+            return
+        path = self.entry_feed.get().strip()
+        if path:
+            try:
+                if self._read_feed(path):
+                    self._show_monitor()
+            except (OSError, ValueError, csv.Error) as e:
+                # Report and keep polling: the bad bytes are already
+                # behind the feed offset, so the next poll reads on.
+                self.monitor_label.config(text=f'Price feed: {e}')
+        self._poll_id = self.root.after(MONITOR_POLL_MS, self._poll_feed)
+
+    def _read_feed(self, path):
+        # Reads only what was appended since the last poll; a half-written
+        # last line is left for the next one. Blank cells mean no change.
+        if path != self._feed_path or os.path.getsize(path) < self._feed_offset:
+            self._feed_path, self._feed_offset, self._feed_cols = path, 0, None
+        with open(path, 'rb') as f:
+            f.seek(self._feed_offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        self._feed_offset += end
+
+        ticks = 0
+        for row in csv.reader(data[:end].decode('utf-8').splitlines()):
+            if not row:
+                continue
+            if self._feed_cols is None:
+                index = {inst['name']: i for i, inst in enumerate(self.monitor.instruments)}
+                self._feed_cols = [(c, index[h.strip()]) for c, h in enumerate(row) if h.strip() in index]
+                continue
+            for c, i in self._feed_cols:
+                if c < len(row) and row[c].strip():
+                    self.monitor.update_price(i, row[c])
+                    ticks += 1
+        return ticks
+
+    def _show_monitor(self):
+        m = self.monitor
+        equity = from_pence(m.equity_p)
+        used = from_pence(m.total_margin_p)
+        text = (
+            f"Equity £{equity:,.2f} (P&L {from_pence(m.total_pnl_p):+,.2f})   "
+            f"Margin used £{used:,.2f} ({used / equity * 100 if equity > 0 else 0:.2f}%)   "
+            f"Target £{from_pence(m.target_margin_p):,.2f}   Headroom £{from_pence(m.headroom_p):,.2f}\n"
+        )
+        suggestion = m.suggestion()
+        if suggestion is None:
+            text += "No equity leg to adjust."
+        else:
+            name = m.instruments[m.equity_idx]['name']
+            ticks, change = suggestion
+            if change:
+                text += (f"Adjust {name}: {from_ticks(m.stake_ticks[m.equity_idx]):.4f} -> "
+                         f"{from_ticks(ticks):.4f} £/pt ({from_ticks(change):+.4f})")
+            else:
+                text += f"{name} stake is on target."
+        self.monitor_label.config(text=text)
+
+    def save_to_journal(self):
+        if not self.last_plan:
+            messagebox.showinfo('Journal', 'Calculate stakes first.')
+            return
+        journal = TradeJournal()
+        n = journal.append(JOURNAL_ACCOUNT, KIND_SPREADBET, self.last_plan)
+        self.last_plan = None
+        messagebox.showinfo('Journal', f'Saved {n} legs to {journal.path}.')
+
 if __name__ == '__main__':
     root = tk.Tk()
+    measure_launch(root, 'risk')
     app = PortfolioPositionSizerDynamic(root)
     root.mainloop()
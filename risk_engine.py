@@ -0,0 +1,98 @@
+from fx import BASE
+from margin_tiers import MarginSchedule, parse_tiers
+from money import from_ticks, mul_div_round, to_pence
+from validation import currency, number, optional, pence, positive, sector, text, ticks, validate_row
+
+# -----------------------------
+# Risk-dial legs and sizing engine
+# -----------------------------
+# No Tk here: the risk window (risk.py) and the sizing service both size
+# through these functions.
+
+# Weight is informational in the risk dial, so it may be left blank. The
+# price must be positive: the margin monitor rescales by it.
+LEG_PARSERS = [
+    text, sector, positive(number), positive(ticks),
+    positive(pence), positive(pence), optional(number),
+    optional(parse_tiers, default=()), optional(currency, default=BASE),
+]
+
+# Margin and notional are in the leg's currency until FxTable.to_base.
+LEG_MONEY_COLS = (4, 5)
+LEG_CURRENCY_COL = 8
+PRICE_COL = 2
+
+
+def make_leg(name, sector, price, min_stake_ticks, margin_min_p, notional_min_p, weight_pct=None,
+             margin_tiers=(), currency=BASE):
+    return {
+        'name': name,
+        'sector': sector,
+        'price': price,
+        'min_stake': from_ticks(min_stake_ticks),
+        'min_stake_ticks': min_stake_ticks,
+        'margin_min_p': margin_min_p,
+        'notional_min_p': notional_min_p,
+        'margin_tiers': margin_tiers,
+        'currency': currency,
+        'schedule': MarginSchedule(min_stake_ticks, margin_min_p, margin_tiers),
+    }
+
+
+def build_leg(*cells):
+    return make_leg(*validate_row(cells, LEG_PARSERS[:len(cells)]))
+
+
+# Risk dial engine (integer pence / stake ticks). Non-equity legs sit at
+# their min stake; the single equity leg takes whatever margin is left
+# under the target, floored to a stake tick. Margin comes from each leg's
+# tier schedule, so the equity stake is found by inverting it band by band.
+def size_risk_dial(instruments, target_total_margin):
+    cap_p = to_pence(target_total_margin)
+
+    equity_idx = None
+    fixed_idxs = []
+    for i, inst in enumerate(instruments):
+        if inst['sector'] == 'equity':
+            equity_idx = i
+        else:
+            fixed_idxs.append(i)
+
+    if equity_idx is None:
+        return None
+
+    stake_ticks = [0] * len(instruments)
+    margin_p = [0] * len(instruments)
+    notional_p = [0] * len(instruments)
+
+    # Fixed instruments (gold/bonds)
+    for i in fixed_idxs:
+        stake_ticks[i] = instruments[i]['min_stake_ticks']
+        margin_p[i] = instruments[i]['schedule'].margin(stake_ticks[i])
+        notional_p[i] = instruments[i]['notional_min_p']
+
+    # Equity instrument (risk dial)
+    eq = instruments[equity_idx]
+    remaining_p = cap_p - sum(margin_p)
+
+    if remaining_p <= 0:
+        stake_ticks[equity_idx] = eq['min_stake_ticks']
+    else:
+        stake_ticks[equity_idx] = max(
+            eq['min_stake_ticks'],
+            eq['schedule'].max_ticks(remaining_p)
+        )
+
+    margin_p[equity_idx] = eq['schedule'].margin(stake_ticks[equity_idx])
+    notional_p[equity_idx] = mul_div_round(stake_ticks[equity_idx], eq['notional_min_p'], eq['min_stake_ticks'])
+
+    return {
+        'equity_idx': equity_idx,
+        'iterations': 1,        # closed form: one inversion of the equity leg's schedule
+        'target_margin_p': cap_p,
+        'stake_ticks': stake_ticks,
+        'margin_p': margin_p,
+        'notional_p': notional_p,
+        'total_margin_p': sum(margin_p),
+        'total_notional_p': sum(notional_p),
+    }
@@ -0,0 +1,236 @@
+import csv
+import os
+
+import numpy as np
+
+import metrics
+from money import mul_div_round, to_pence
+
+TRADING_DAYS = 252
+
+
+# -----------------------------
+# EWMA covariance (RiskMetrics, zero mean)
+# -----------------------------
+#     S_t = lam * S_{t-1} + (1 - lam) * r_t r_t'
+# Each new bar is an O(n^2) rank-1 update; the Cholesky factor and the
+# risk-parity weights are cached per covariance version, so re-sizing with
+# an unchanged covariance costs nothing and a new bar only re-solves from a
+# warm start.
+
+class EwmaCovariance:
+
+    def __init__(self, names, lam=0.94):
+        self.names = list(names)
+        self.lam = lam
+        n = len(self.names)
+        self.cov = np.zeros((n, n))
+        self.last_prices = None
+        self.bars = 0
+        self.version = 0
+        self._factor = None
+        self._weights = None
+        self._prev_weights = None
+
+    def _changed(self):
+        self.version += 1
+        self._factor = None
+        if self._weights is not None:
+            self._prev_weights = self._weights
+        self._weights = None
+
+    def seed(self, prices):
+        # Batch start from a (bars x n) price matrix: one weighted outer product.
+        prices = np.asarray(prices, dtype=float)
+        if len(prices) >= 2:
+            r = np.diff(np.log(prices), axis=0)
+            decay = self.lam ** np.arange(len(r) - 1, -1, -1)
+            self.cov = (1 - self.lam) * (r * decay[:, None]).T @ r + decay[0] * self.lam * self.cov
+            self.bars += len(r)
+        if len(prices):
+            self.last_prices = prices[-1].copy()
+        self._changed()
+
+    def update(self, prices):
+        prices = np.asarray(prices, dtype=float)
+        if self.last_prices is not None:
+            r = np.log(prices / self.last_prices)
+            self.cov *= self.lam
+            self.cov += (1 - self.lam) * np.outer(r, r)
+            self.bars += 1
+            self._changed()
+        self.last_prices = prices.copy()
+
+    def factor(self):
+        if self._factor is None:
+            cov = self.cov
+            jitter = 0.0
+            scale = max(float(np.trace(cov)) / max(len(cov), 1), 1e-12)
+            while True:
+                try:
+                    self._factor = np.linalg.cholesky(cov + jitter * np.eye(len(cov)))
+                    break
+                except np.linalg.LinAlgError:
+                    jitter = max(jitter * 10, scale * 1e-10)
+        return self._factor
+
+    def portfolio_vol(self, w, annualize=TRADING_DAYS):
+        # sqrt(w' S w) via the cached factor: ||L' w||
+        return float(np.linalg.norm(self.factor().T @ np.asarray(w)) * np.sqrt(annualize))
+
+    def risk_contributions(self, w):
+        w = np.asarray(w)
+        sw = self.cov @ w
+        return w * sw / float(w @ sw)
+
+    def weights(self, tol=1e-10, max_iter=50):
+        if self._weights is None:
+            metrics.cache_lookups("risk_parity", 0, 1)
+            self._weights = risk_parity_weights(self.cov, self._prev_weights, tol, max_iter)
+        else:
+            metrics.cache_lookups("risk_parity", 1, 0)
+        return self._weights
+
+
+def risk_parity_weights(cov, start=None, tol=1e-10, max_iter=50):
+    # Equal risk contribution via Newton on the convex problem
+    #     min 0.5 y' S y - (1/n) sum log y     (weights = y / sum y)
+    n = len(cov)
+    b = np.full(n, 1.0 / n)
+
+    vols = np.sqrt(np.maximum(np.diag(cov), 1e-18))
+    y = start if start is not None and len(start) == n else 1.0 / vols
+    y = np.asarray(y, dtype=float) / np.sqrt(max(float(y @ cov @ y), 1e-18))
+
+    steps = 0
+    for steps in range(1, max_iter + 1):
+        sy = cov @ y
+        grad = sy - b / y
+        if np.max(np.abs(grad)) < tol:
+            break
+        hess = cov + np.diag(b / (y * y))
+        step = np.linalg.solve(hess, grad)
+        # Damp so y stays strictly positive.
+        t = 1.0
+        while np.any(y - t * step <= 0):
+            t *= 0.5
+        y = y - t * step
+
+    metrics.solver_iterations("riskparity.newton", steps)
+    return y / y.sum()
+
+
+# -----------------------------
+# Local price history (CSV: date column, then one column per instrument)
+# -----------------------------
+
+class PriceHistory:
+    # Tracks how far into the file we have read so a grown file only feeds
+    # its new bars through EwmaCovariance.update.
+
+    def __init__(self, path, names, lam=0.94):
+        self.path = path
+        self.names = list(names)
+        self.lam = lam
+        self._reset()
+
+    def _reset(self):
+        self.model = EwmaCovariance(self.names, self.lam)
+        self.offset = 0
+        self.columns = None
+
+    def refresh(self):
+        if os.path.getsize(self.path) < self.offset:
+            # File was rewritten, start over
+            self._reset()
+
+        with open(self.path, newline="", encoding="utf-8") as f:
+            if self.columns is None:
+                header = next(csv.reader([f.readline()]))
+                index = {h.strip(): i for i, h in enumerate(header)}
+                missing = [n for n in self.names if n not in index]
+                if missing:
+                    raise ValueError(f"No price history for: {', '.join(missing)}")
+                self.columns = [index[n] for n in self.names]
+                self.offset = f.tell()
+            f.seek(self.offset)
+            new_lines = f.read()
+            self.offset = f.tell()
+
+        rows = [row for row in csv.reader(new_lines.splitlines()) if row]
+        if not rows:
+            return 0
+
+        prices = np.array([[float(row[c]) for c in self.columns] for row in rows])
+        if self.model.last_prices is None:
+            self.model.seed(prices)
+        else:
+            for bar in prices:
+                self.model.update(bar)
+        return len(rows)
+
+
+# -----------------------------
+# Sizing
+# -----------------------------
+
+def size_risk_parity(instruments, target_total_margin, model, balance=None, target_vol=None):
+    # Notional is split by risk-parity weights, then scaled to fill the margin
+    # target (or less, if an annual volatility target of balance is given).
+    # Stakes are floored to ticks with each leg kept at its min stake. The
+    # scale starts from base margin rates; if tiered legs then charge more
+    # than the target, it is bisected down until the exact margin fits.
+    # Min stakes can still exceed the target: "over_target_p" says by how much.
+    w = model.weights()
+    cap_p = to_pence(target_total_margin)
+    lot_ratio = np.array([inst["margin_min_p"] / inst["notional_min_p"] for inst in instruments])
+
+    scale_p = target_total_margin * 100.0 / float(w @ lot_ratio)
+    if target_vol and balance:
+        vol = model.portfolio_vol(w)
+        if vol > 0:
+            scale_p = min(scale_p, target_vol * balance * 100.0 / vol)
+
+    def stakes(scale):
+        return [
+            max(int(scale * wi * inst["min_stake_ticks"] // inst["notional_min_p"]), inst["min_stake_ticks"])
+            for inst, wi in zip(instruments, w)
+        ]
+
+    def margins(ticks):
+        return [inst["schedule"].margin(t) for inst, t in zip(instruments, ticks)]
+
+    scale = int(scale_p)
+    stake_ticks = stakes(scale)
+    margin_p = margins(stake_ticks)
+    iterations = 1
+    if sum(margin_p) > cap_p:
+        lo, hi = 0, scale
+        while lo < hi:
+            iterations += 1
+            mid = (lo + hi + 1) // 2
+            if sum(margins(stakes(mid))) <= cap_p:
+                lo = mid
+            else:
+                hi = mid - 1
+        stake_ticks = stakes(lo)
+        margin_p = margins(stake_ticks)
+
+    notional_p = [
+        mul_div_round(ticks, inst["notional_min_p"], inst["min_stake_ticks"])
+        for inst, ticks in zip(instruments, stake_ticks)
+    ]
+
+    return {
+        "weights": [float(x) for x in w],
+        "risk_contributions": [float(x) for x in model.risk_contributions(w)],
+        "portfolio_vol": model.portfolio_vol(w),
+        "target_margin_p": cap_p,
+        "stake_ticks": stake_ticks,
+        "margin_p": margin_p,
+        "notional_p": notional_p,
+        "total_margin_p": sum(margin_p),
+        "total_notional_p": sum(notional_p),
+        "over_target_p": max(0, sum(margin_p) - cap_p),
+        "iterations": iterations,
+    }
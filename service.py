@@ -0,0 +1,355 @@
+"""Local HTTP/JSON sizing service.
+
+    python service.py [--host 127.0.0.1] [--port 8765]
+
+POST a JSON object (or a JSON list of them, answered in order) to:
+
+    /spreadbet   deposit allocator   {"balance", "margin_pct", "instruments": [...]}
+    /risk        risk dial           {"balance", "margin_pct", "instruments": [...]}
+    /shares      ISA buy plan        {"cash", "monthly", "holdings": [...]}
+
+Instrument / holding fields use the same names as the table columns, e.g.
+{"name", "sector", "price", "min_stake", "margin_min", "notional_min",
+"weight_pct", "margin_tiers"} and {"name", "price", "shares", "weight_pct"}.
+/shares also takes "plan": "fewest_trades" with "drift_tolerance_pct" and
+"fee_per_trade" for the fewest-orders plan instead of closing every gap.
+/spreadbet also takes "subset_objective" ("weight", "notional" or null): if
+the cap cannot hold every leg at min stake, the best subset is sized
+instead, and the response lists the "dropped" legs.
+"margin_tiers" is optional: "50:1.5, 200:3" or [[50, 1.5], [200, 3]].
+"currency" is optional (default GBP); amounts in other currencies are
+converted with the rates in fx_rates.csv (or REBAL_FX), re-read whenever
+the file changes.
+
+GET /metrics returns request counts, list-body sizes, per-engine latency
+and iteration histograms and FX cache hits in the Prometheus text format.
+"""
+import argparse
+import json
+import math
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+from fx import FxTable
+from money import BP, from_pence, from_ticks, pct_to_bp, to_pence
+from risk_engine import LEG_CURRENCY_COL, LEG_MONEY_COLS, LEG_PARSERS, make_leg, size_risk_dial
+from shares_engine import (
+    HOLDING_CURRENCY_COL, HOLDING_FIELDS, HOLDING_MONEY_COLS, HOLDING_PARSERS, WEIGHT_TOLERANCE_BP,
+    cost_p, make_holding, plan_dca_buys, plan_fewest_trades, plan_initial_build,
+)
+from spreadbet_engine import (
+    INSTRUMENT_CURRENCY_COL, INSTRUMENT_MONEY_COLS, INSTRUMENT_PARSERS, SUBSET_OBJECTIVES,
+    make_instrument, select_affordable_legs, size_deposit_allocation,
+)
+from sessions import record
+from validation import validate_table
+
+FX = FxTable()
+
+
+class RequestError(ValueError):
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors
+
+
+def _account(payload):
+    try:
+        balance = float(payload["balance"])
+        margin_pct = float(payload["margin_pct"]) / 100.0
+    except (KeyError, TypeError, ValueError):
+        raise RequestError("Enter a valid balance and margin %.") from None
+    if not math.isfinite(balance) or balance <= 0 or not (0 < margin_pct < 1):
+        raise RequestError("Enter a valid balance and margin %.")
+    return balance, balance * margin_pct
+
+
+def _rows(payload, key, fields, parsers, make, currency_col, money_cols):
+    rows = payload.get(key)
+    if not isinstance(rows, list) or not rows:
+        raise RequestError(f"'{key}' must be a non-empty list.")
+    if not all(isinstance(row, dict) for row in rows):
+        raise RequestError(f"Every entry in '{key}' must be an object.")
+
+    cells = [[row.get(f) for f in fields] for row in rows]
+    columns, errors = validate_table(cells, parsers)
+    errors = sorted(errors + FX.to_base(columns, currency_col, money_cols))
+    if errors:
+        raise RequestError(
+            f"{len(errors)} invalid value(s) in '{key}'.",
+            [{"row": e.row, "field": fields[e.col], "message": e.message} for e in errors],
+        )
+    return [make(*row) for row in zip(*columns)]
+
+
+# ---------------- Solvers (payload dict -> response dict) ----------------
+
+SPREADBET_FIELDS = (
+    "name", "sector", "price", "min_stake", "margin_min", "notional_min", "weight_pct", "margin_tiers",
+    "currency",
+)
+RISK_FIELDS = SPREADBET_FIELDS
+
+
+def solve_spreadbet(payload):
+    balance, target = _account(payload)
+    instruments = _rows(
+        payload, "instruments", SPREADBET_FIELDS, INSTRUMENT_PARSERS, make_instrument,
+        INSTRUMENT_CURRENCY_COL, INSTRUMENT_MONEY_COLS,
+    )
+    result = record("spreadbet.size_deposit_allocation", size_deposit_allocation, instruments, target)
+
+    response = {
+        "feasible": result["feasible"],
+        "target_margin": from_pence(result["target_margin_p"]),
+        "min_margin": from_pence(result["min_margin_p"]),
+    }
+    if not result["feasible"]:
+        # Fall back to the best subset of legs that fits, unless disabled
+        objective = payload.get("subset_objective", "weight")
+        if objective is None:
+            return response
+        if objective not in SUBSET_OBJECTIVES:
+            raise RequestError(f"subset_objective must be one of {SUBSET_OBJECTIVES} or null.")
+
+        selection = record(
+            "spreadbet.select_affordable_legs", select_affordable_legs, instruments, target, objective
+        )
+        if not selection["indices"]:
+            return response
+        response["dropped"] = [instruments[i]["name"] for i in selection["dropped"]]
+        response["coverage_pct"] = selection["coverage_pct"]
+
+        instruments = [instruments[i] for i in selection["indices"]]
+        result = record("spreadbet.size_deposit_allocation", size_deposit_allocation, instruments, target)
+
+    total_notional_p = result["total_notional_p"]
+    response.update({
+        "legs": [
+            {
+                "name": inst["name"],
+                "stake": from_ticks(ticks),
+                "notional": from_pence(notional_p),
+                "margin": from_pence(margin_p),
+                "weight_pct_target": inst["weight_pct"],
+                "weight_pct_actual": notional_p * 100.0 / total_notional_p if total_notional_p else 0.0,
+            }
+            for inst, ticks, notional_p, margin_p in zip(
+                instruments, result["stake_ticks"], result["notional_p"], result["margin_p"])
+        ],
+        "total_margin": from_pence(result["total_margin_p"]),
+        "total_notional": from_pence(total_notional_p),
+        "margin_used_pct": from_pence(result["total_margin_p"]) / balance * 100.0,
+    })
+    return response
+
+
+def solve_risk(payload):
+    balance, target = _account(payload)
+    instruments = _rows(
+        payload, "instruments", RISK_FIELDS, LEG_PARSERS, make_leg, LEG_CURRENCY_COL, LEG_MONEY_COLS,
+    )
+    result = record("risk.size_risk_dial", size_risk_dial, instruments, target)
+    if result is None:
+        raise RequestError("One Equity instrument (US500) is required.")
+
+    return {
+        "legs": [
+            {
+                "name": inst["name"],
+                "sector": inst["sector"],
+                "stake": from_ticks(ticks),
+                "notional": from_pence(notional_p),
+                "margin": from_pence(margin_p),
+            }
+            for inst, ticks, notional_p, margin_p in zip(
+                instruments, result["stake_ticks"], result["notional_p"], result["margin_p"])
+        ],
+        "target_margin": from_pence(result["target_margin_p"]),
+        "total_margin": from_pence(result["total_margin_p"]),
+        "total_notional": from_pence(result["total_notional_p"]),
+        "margin_used_pct": from_pence(result["total_margin_p"]) / balance * 100.0,
+    }
+
+
+def solve_shares(payload):
+    try:
+        cash_p = to_pence(payload.get("cash", 0))
+        monthly_p = to_pence(payload.get("monthly", 0))
+    except (TypeError, ValueError):
+        raise RequestError("Invalid cash or monthly contribution.") from None
+    if cash_p < 0 or monthly_p < 0:
+        raise RequestError("Invalid cash or monthly contribution.")
+
+    fewest_trades = payload.get("plan") == "fewest_trades"
+    try:
+        tolerance_bp = pct_to_bp(payload.get("drift_tolerance_pct", 2))
+        fee_p = to_pence(payload.get("fee_per_trade", 0))
+    except (TypeError, ValueError):
+        raise RequestError("Invalid drift tolerance or fee per trade.") from None
+    if tolerance_bp < 0 or fee_p < 0:
+        raise RequestError("Invalid drift tolerance or fee per trade.")
+
+    holdings = _rows(
+        payload, "holdings", HOLDING_FIELDS, HOLDING_PARSERS, make_holding,
+        HOLDING_CURRENCY_COL, HOLDING_MONEY_COLS,
+    )
+    total_weight_bp = sum(h["weight_bp"] for h in holdings)
+    if abs(total_weight_bp - BP) > WEIGHT_TOLERANCE_BP:
+        raise RequestError(f"Target weights must sum to 100% (currently {total_weight_bp / 100:.1f}%).")
+
+    cycle_p = cash_p + monthly_p
+    invested_p = sum(h["value_p"] for h in holdings)
+
+    if all(h["shares"] == 0 for h in holdings):
+        mode = "initial"
+        planned, remaining_p = record("shares.plan_initial_build", plan_initial_build, holdings, cycle_p)
+        buys = [(h, qty) for h, qty, _ in planned]
+    else:
+        mode = "dca"
+        buy_plan = None
+        if fewest_trades:
+            buy_plan, remaining_p, out_of_band = record(
+                "shares.plan_fewest_trades", plan_fewest_trades,
+                holdings, invested_p, cycle_p, tolerance_bp, fee_p,
+            )
+        if buy_plan is None:
+            buy_plan, remaining_p = record(
+                "shares.plan_dca_buys", plan_dca_buys, holdings, invested_p, cycle_p
+            )
+        else:
+            mode = "fewest_trades"
+        buys = [(h, buy_plan[h["name"]]) for h in holdings if buy_plan[h["name"]] > 0]
+
+    spend_p = cost_p(sum(qty * h["price_u"] for h, qty in buys), 1)
+    out = {
+        "mode": mode,
+        "cash_this_cycle": from_pence(cycle_p),
+        "buys": [
+            {
+                "name": h["name"], "qty": qty, "price": h["price"],
+                "cost": from_pence(cost_p(h["price_u"], qty)),
+            }
+            for h, qty in buys
+        ],
+        "total_spend": from_pence(spend_p),
+        "cash_remaining": from_pence(remaining_p),
+    }
+    if mode == "fewest_trades":
+        out["fees"] = from_pence(len(buys) * fee_p)
+        out["out_of_band"] = out_of_band
+    return out
+
+
+SOLVERS = {
+    "/spreadbet": solve_spreadbet,
+    "/risk": solve_risk,
+    "/shares": solve_shares,
+}
+
+
+def solve_one(solver, payload):
+    try:
+        if not isinstance(payload, dict):
+            raise RequestError("Request body must be a JSON object.")
+        return 200, solver(payload)
+    except RequestError as e:
+        body = {"error": str(e)}
+        if e.errors:
+            body["errors"] = e.errors
+        return 400, body
+    except (TypeError, ValueError) as e:
+        # Input the validators let through but an engine rejected
+        return 400, {"error": f"Invalid request: {e}"}
+    except Exception as e:
+        return 500, {"error": f"Internal error: {type(e).__name__}: {e}"}
+
+
+class SizingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+    disable_nagle_algorithm = True
+    wbufsize = -1                   # headers + body leave in one write
+    max_body = 16 * 1024 * 1024
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "endpoints": sorted(SOLVERS)})
+        elif self.path == "/metrics":
+            self._send(200, metrics.render().encode("utf-8"), metrics.CONTENT_TYPE)
+        else:
+            self._send(404, {"error": "Not found."})
+
+    def do_POST(self):
+        # A bad length cannot be skipped past, so the connection is closed.
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= self.max_body:
+            self.close_connection = True
+            metrics.SERVICE_REQUESTS.inc(self.path, 400)
+            self._send(400, {"error": "Bad or missing Content-Length."})
+            return
+        raw = self.rfile.read(length)
+
+        solver = SOLVERS.get(self.path)
+        if solver is None:
+            self._send(404, {"error": "Not found."})
+            return
+
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            metrics.SERVICE_REQUESTS.inc(self.path, 400)
+            self._send(400, {"error": "Body is not valid JSON."})
+            return
+
+        # Solved in this handler thread: the engines are pure Python, so a
+        # queue to a single worker only added a hand-off per request.
+        if isinstance(payload, list):
+            metrics.SERVICE_BATCH_SIZE.observe(len(payload))
+            results = [solve_one(solver, p) for p in payload]
+            self._send(200, [body for _, body in results])
+        else:
+            results = [solve_one(solver, payload)]
+            (status, body), = results
+            self._send(status, body)
+        for status, _ in results:
+            metrics.SERVICE_REQUESTS.inc(self.path, status)
+
+
+def make_server(host="127.0.0.1", port=8765):
+    server = ThreadingHTTPServer((host, port), SizingHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local sizing service")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+
+    server = make_server(args.host, args.port)
+    print(f"Sizing service on http://{args.host}:{args.port} ({', '.join(sorted(SOLVERS))})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import argparse
+import functools
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+
+import metrics
+
+RECORD_PATH = os.environ.get("REBAL_RECORD")
+RECORD_LABEL = os.environ.get("REBAL_RECORD_LABEL", "")
+
+_session_ids = itertools.count(1)
+_session = None
+
+
+# -----------------------------
+# Record and replay of Calculate sessions
+# -----------------------------
+# Set REBAL_RECORD=path (".gz" for gzip) and every Calculate in the three
+# apps appends to a JSON-lines log: one "session" line per Calculate with
+# its wall time, and one "call" line per engine call with the engine's
+# inputs, its time and a hash of its result.
+#
+#   python sessions.py replay session.jsonl [--repeat 3] [--slowest 10] [--engine NAME]
+#
+# re-runs every recorded engine call headlessly, checks the result hash and
+# prints recorded vs replayed timings, so a slow or wrong case from a
+# trader's machine can be reproduced and compared across versions. Exits
+# with status 1 if any result differs. Engine calls and Calculate runs are
+# also counted in metrics.py whether or not a log is being recorded.
+
+
+def _default(obj):
+    # Instrument dicts carry a MarginSchedule; it is rebuilt on replay. A
+    # covariance model is not recorded, so risk-parity calls are timed only.
+    if type(obj).__name__ in ("MarginSchedule", "EwmaCovariance"):
+        return None
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"cannot record {type(obj).__name__}")
+
+
+def _dumps(obj):
+    return json.dumps(obj, default=_default, sort_keys=True, separators=(",", ":"))
+
+
+def result_hash(result):
+    return hashlib.sha256(_dumps(result).encode("utf-8")).hexdigest()[:16]
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _write(entry):
+    with _open(RECORD_PATH, "a") as f:
+        f.write(_dumps(entry) + "\n")
+
+
+def record(engine, fn, *args):
+    # Call fn(*args) and feed its latency to the metrics; when recording,
+    # also log the inputs, time and result hash.
+    encoded = json.loads(_dumps(args)) if RECORD_PATH else None     # before fn can mutate them
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    metrics.observe_solver(engine, seconds, result)
+    if RECORD_PATH:
+        _write({
+            "kind": "call", "session": _session, "engine": engine, "args": encoded,
+            "ms": round(seconds * 1000, 3), "hash": result_hash(result),
+        })
+    return result
+
+
+def recorded_session(app):
+    # Decorator for an app's calculate(): counts the run and its wall time
+    # (including validation and output) in the metrics and, when recording,
+    # groups its engine calls under one session line.
+    def wrap(method):
+        @functools.wraps(method)
+        def run(*args, **kwargs):
+            global _session
+            if RECORD_PATH:
+                _session = f"{os.getpid()}-{next(_session_ids)}"
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                metrics.CALCULATE_RUNS.inc(app)
+                metrics.CALCULATE_SECONDS.observe(seconds, app)
+                metrics.write_textfile()
+                if RECORD_PATH:
+                    _write({
+                        "kind": "session", "session": _session, "app": app, "label": RECORD_LABEL,
+                        "ts": int(time.time()), "ms": round(seconds * 1000, 3),
+                    })
+                    _session = None
+        return run
+    return wrap
+
+
+# -----------------------------
+# Replay
+# -----------------------------
+
+def _with_schedules(instruments):
+    from margin_tiers import MarginSchedule
+    for inst in instruments:
+        if "min_stake_ticks" in inst:
+            inst["margin_tiers"] = tuple(tuple(t) for t in inst.get("margin_tiers") or ())
+            inst["schedule"] = MarginSchedule(inst["min_stake_ticks"], inst["margin_min_p"], inst["margin_tiers"])
+    return instruments
+
+
+def engines():
+    # Engine name -> function, imported only when replaying.
+    from risk_engine import size_risk_dial
+    from shares_engine import plan_dca_buys, plan_fewest_trades, plan_initial_build
+    from spreadbet_engine import select_affordable_legs, size_deposit_allocation
+    return {
+        "spreadbet.size_deposit_allocation": size_deposit_allocation,
+        "spreadbet.select_affordable_legs": select_affordable_legs,
+        "risk.size_risk_dial": size_risk_dial,
+        "shares.plan_initial_build": plan_initial_build,
+        "shares.plan_dca_buys": plan_dca_buys,
+        "shares.plan_fewest_trades": plan_fewest_trades,
+    }
+
+
+def read_log(path):
+    with _open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def replay(path, repeat=3, engine=None):
+    # Returns one dict per replayed call: engine, session, recorded and
+    # best replayed ms, and whether the result hash matched.
+    fns = engines()
+    out = []
+    for entry in read_log(path):
+        if entry.get("kind") != "call" or (engine and entry["engine"] != engine):
+            continue
+        fn = fns.get(entry["engine"])
+        if fn is None:
+            out.append({**entry, "replay_ms": None, "match": None})
+            continue
+        best = None
+        for _ in range(repeat):
+            args = json.loads(json.dumps(entry["args"]))
+            if args and isinstance(args[0], list):
+                _with_schedules(args[0])
+            start = time.perf_counter()
+            result = fn(*args)
+            ms = (time.perf_counter() - start) * 1000
+            best = ms if best is None else min(best, ms)
+        out.append({
+            "engine": entry["engine"], "session": entry["session"], "ms": entry["ms"],
+            "replay_ms": best, "match": result_hash(result) == entry["hash"],
+        })
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded calculate sessions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rp = sub.add_parser("replay")
+    rp.add_argument("log")
+    rp.add_argument("--repeat", type=int, default=3, help="runs per call; the fastest is kept")
+    rp.add_argument("--slowest", type=int, default=10, help="list this many slowest recorded calls")
+    rp.add_argument("--engine", default=None)
+    args = parser.parse_args()
+
+    calls = replay(args.log, max(1, args.repeat), args.engine)
+    sessions = [e for e in read_log(args.log) if e.get("kind") == "session"]
+    ran = [c for c in calls if c["match"] is not None]
+    mismatched = [c for c in ran if not c["match"]]
+
+    print(f"{len(sessions)} sessions, {len(calls)} engine calls, {len(ran)} replayed, "
+          f"{len(mismatched)} results differ\n")
+
+    by_engine = {}
+    for c in ran:
+        by_engine.setdefault(c["engine"], []).append(c)
+    print(f"{'Engine':38s} {'Calls':>6s} {'Recorded ms':>12s} {'Replay ms':>10s} {'Ratio':>7s}")
+    print("-" * 77)
+    for name, cs in sorted(by_engine.items()):
+        rec = sum(c["ms"] for c in cs)
+        rep = sum(c["replay_ms"] for c in cs)
+        print(f"{name:38s} {len(cs):6d} {rec:12.3f} {rep:10.3f} {rep / rec if rec else 0:7.2f}")
+
+    if ran:
+        print("\nSlowest recorded calls")
+        print("-" * 77)
+        for c in sorted(ran, key=lambda c: c["ms"], reverse=True)[:args.slowest]:
+            flag = "" if c["match"] else "  RESULT DIFFERS"
+            print(f"{c['engine']:38s} session {str(c['session']):>12s} {c['ms']:10.3f} -> {c['replay_ms']:.3f} ms{flag}")
+
+    if sessions:
+        slow = max(sessions, key=lambda s: s["ms"])
+        print(f"\nSlowest Calculate: {slow['app']} session {slow['session']} took {slow['ms']:.1f} ms")
+
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
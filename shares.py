@@ -1,12 +1,39 @@
+import os
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
+
+from accounts import ACCOUNT_SUFFIX, load_account, save_account
+from fx import FxTable
+from importer import read_holdings, read_latest_prices
+from journal import KIND_SHARES, TradeJournal
+from launch import after_first_frame, measure_launch
+from money import BP, from_pence, to_pence
+from sessions import record, recorded_session
+from shares_engine import (
+    HOLDING_CURRENCY_COL, HOLDING_FIELDS, HOLDING_HEADERS, HOLDING_MONEY_COLS, HOLDING_PARSERS,
+    WEIGHT_TOLERANCE_BP, cost_p, make_holding, plan_dca_buys, plan_fewest_trades, plan_initial_build,
+    price_text,
+)
+from universe import InstrumentSearch
+from validation import bp, format_errors, mark_cells, non_negative, pence, validate_table
+
+JOURNAL_ACCOUNT = "ISA"
+
+# Holdings grid shows this many rows at a time; the full table lives in
+# ShareAllocator.cells so an imported book needs no widget per line.
+PAGE_ROWS = 15
+
+PLAN_MODES = ["Close gaps", "Fewest trades"]
+
+IMPORT_FILETYPES = [("CSV / Parquet", "*.csv *.parquet"), ("All files", "*")]
+ACCOUNT_FILETYPES = [("Saved account", "*" + ACCOUNT_SUFFIX), ("All files", "*")]
 
 
 class ShareAllocator:
     def __init__(self, root):
         self.root = root
         self.root.title("25Ten Delta – ISA Shares Allocator")
-        self.root.geometry("1400x860")
+        self.root.geometry("1550x860")
         self.root.configure(bg="#111827")
 
         self.colors = {
@@ -37,8 +64,14 @@ class ShareAllocator:
             "card_value": ("Liberation Sans", 14, "bold"),
         }
 
-        self.rows = []
+        self.cells = []         # every holding row as cell strings
+        self.rows = []          # Entry widgets for the visible page
+        self.page_start = 0
+        self.visible_rows = 0
         self.result_labels = {}
+        self.output = None
+        self.last_plan = None
+        self.fx = FxTable()
 
         self._build_ui()
 
@@ -72,14 +105,20 @@ class ShareAllocator:
         left = tk.Frame(body, bg=self.colors["bg"])
         left.pack(side="left", fill="y", padx=(0, 5), pady=0)
 
-        right = tk.Frame(body, bg=self.colors["bg"])
-        right.pack(side="left", fill="both", expand=True, padx=(5, 0), pady=0)
+        self.right = tk.Frame(body, bg=self.colors["bg"])
+        self.right.pack(side="left", fill="both", expand=True, padx=(5, 0), pady=0)
 
+        # Inputs first; the results side is only needed after Calculate, so
+        # it is built once the first frame is on screen.
         self._build_inputs(left)
         self._build_holdings(left)
         self._build_buttons(left)
-        self._build_summary_cards(right)
-        self._build_output(right)
+        after_first_frame(self.root, self._build_results)
+
+    def _build_results(self):
+        if self.output is None:
+            self._build_summary_cards(self.right)
+            self._build_output(self.right)
 
     def _build_inputs(self, parent):
         panel = tk.Frame(parent, bg=self.colors["panel"], bd=1, relief="solid")
@@ -133,6 +172,51 @@ class ShareAllocator:
         self.entry_monthly.insert(0, "200")
         self.entry_monthly.grid(row=2, column=1, sticky="w", padx=(0, 12), pady=6)
 
+        tk.Label(
+            panel,
+            text="Buy Plan Mode",
+            bg=self.colors["panel"],
+            fg=self.colors["fg"],
+            font=self.fonts["body"]
+        ).grid(row=3, column=0, sticky="w", padx=12, pady=6)
+
+        self.plan_mode = tk.StringVar(value=PLAN_MODES[0])
+        mode_menu = tk.OptionMenu(panel, self.plan_mode, *PLAN_MODES)
+        mode_menu.config(
+            bg=self.colors["entry_bg"],
+            fg=self.colors["fg"],
+            relief="flat",
+            highlightthickness=0,
+            font=self.fonts["body"]
+        )
+        mode_menu.grid(row=3, column=1, sticky="w", padx=(0, 12), pady=6)
+
+        # Used by "Fewest trades" only
+        for row, label, attr, default in (
+            (4, "Drift Tolerance (%)", "entry_tolerance", "2.0"),
+            (5, "Fee per Trade (£)", "entry_fee", "0"),
+        ):
+            tk.Label(
+                panel,
+                text=label,
+                bg=self.colors["panel"],
+                fg=self.colors["fg"],
+                font=self.fonts["body"]
+            ).grid(row=row, column=0, sticky="w", padx=12, pady=6)
+
+            entry = tk.Entry(
+                panel,
+                width=18,
+                bg=self.colors["entry_bg"],
+                fg=self.colors["fg"],
+                insertbackground=self.colors["fg"],
+                relief="flat",
+                font=self.fonts["body"]
+            )
+            entry.insert(0, default)
+            entry.grid(row=row, column=1, sticky="w", padx=(0, 12), pady=6)
+            setattr(self, attr, entry)
+
     def _build_holdings(self, parent):
         panel = tk.Frame(parent, bg=self.colors["panel"], bd=1, relief="solid")
         panel.pack(fill="x", pady=(0, 10))
@@ -145,14 +229,7 @@ class ShareAllocator:
             font=self.fonts["section"]
         ).grid(row=0, column=0, columnspan=5, sticky="w", padx=12, pady=(10, 12))
 
-        headers = [
-            "Instrument",
-            "Live Price (£)",
-            "Shares Held",
-            "Target Weight (%)"
-        ]
-
-        for c, h in enumerate(headers):
+        for c, h in enumerate(HOLDING_HEADERS):
             tk.Label(
                 panel,
                 text=h,
@@ -164,6 +241,70 @@ class ShareAllocator:
                 font=self.fonts["body_bold"]
             ).grid(row=1, column=c, padx=1, pady=1)
 
+        nav = tk.Frame(parent, bg=self.colors["bg"])
+        nav.pack(fill="x", pady=(0, 10))
+
+        for text, command in (
+            ("◀ Prev", lambda: self._show_page(self.page_start - PAGE_ROWS)),
+            ("Next ▶", lambda: self._show_page(self.page_start + PAGE_ROWS)),
+            ("Import Holdings…", self.import_holdings),
+            ("Import Prices…", self.import_prices),
+            ("Open Account…", self.open_account),
+            ("Save Account…", self.save_account_as),
+        ):
+            tk.Button(
+                nav,
+                text=text,
+                command=command,
+                bg=self.colors["panel"],
+                fg="white",
+                relief="flat",
+                padx=10,
+                pady=4,
+                font=self.fonts["button"]
+            ).pack(side="left", padx=(0, 6))
+
+        self.page_label = tk.Label(
+            nav,
+            text="",
+            bg=self.colors["bg"],
+            fg=self.colors["muted"],
+            font=self.fonts["body"]
+        )
+        self.page_label.pack(side="left", padx=(6, 0))
+
+        # Type-ahead search over the instrument master, under the table
+        search = tk.Frame(parent, bg=self.colors["panel"], bd=1, relief="solid")
+        search.pack(fill="x", pady=(0, 10))
+
+        tk.Label(
+            search,
+            text="Find Instrument",
+            bg=self.colors["panel"],
+            fg=self.colors["fg"],
+            font=self.fonts["body"]
+        ).grid(row=0, column=0, sticky="nw", padx=12, pady=8)
+
+        self.search = InstrumentSearch(
+            search,
+            HOLDING_HEADERS,
+            self._add_from_universe,
+            width=18,
+            bg=self.colors["entry_bg"],
+            fg=self.colors["fg"],
+            insertbackground=self.colors["fg"],
+            relief="flat",
+            font=self.fonts["body"]
+        )
+        self.search.entry.grid(row=0, column=1, sticky="nw", padx=(0, 12), pady=8)
+        self.search.listbox.config(
+            bg=self.colors["entry_bg"],
+            fg=self.colors["fg"],
+            relief="flat",
+            font=self.fonts["body"]
+        )
+        self.search.listbox.grid(row=0, column=2, sticky="w", padx=(0, 12), pady=8)
+
         self.table = panel
 
         self.add_row(["S&P 500 ETF", "0", "0", "42.0"])
@@ -196,6 +337,18 @@ class ShareAllocator:
             padx=14,
             pady=8,
             font=self.fonts["button"]
+        ).pack(side="left", padx=(0, 8))
+
+        tk.Button(
+            btn_frame,
+            text="Save to Journal",
+            command=self.save_to_journal,
+            bg=self.colors["panel"],
+            fg="white",
+            relief="flat",
+            padx=14,
+            pady=8,
+            font=self.fonts["button"]
         ).pack(side="left")
 
     def _build_summary_cards(self, parent):
@@ -257,10 +410,12 @@ class ShareAllocator:
         self.output.pack(fill="both", expand=True, padx=12, pady=(0, 12))
 
     def add_row(self, values=None):
-        row = len(self.rows) + 2
-        entries = []
+        self.cells.append([str(v) for v in values] if values else [""] * len(HOLDING_HEADERS))
+        self._show_page((len(self.cells) - 1) // PAGE_ROWS * PAGE_ROWS)
 
-        for col in range(4):
+    def _entry_row(self, row):
+        entries = []
+        for col in range(len(HOLDING_HEADERS)):
             e = tk.Entry(
                 self.table,
                 width=18,
@@ -270,15 +425,163 @@ class ShareAllocator:
                 relief="flat",
                 font=self.fonts["body"]
             )
-            e.insert(0, values[col] if values else "")
             e.grid(row=row, column=col, padx=1, pady=1)
             entries.append(e)
+        return entries
+
+    def _sync_page(self):
+        # Copy edits in the visible entries back into self.cells
+        for i, entries in enumerate(self.rows[:self.visible_rows]):
+            self.cells[self.page_start + i] = [e.get() for e in entries]
+
+    def _show_page(self, start):
+        self._sync_page()
+        start = max(0, min(start, (max(len(self.cells), 1) - 1) // PAGE_ROWS * PAGE_ROWS))
+        self.page_start = start
+        visible = self.cells[start:start + PAGE_ROWS]
+        self.visible_rows = len(visible)
+
+        # Entry widgets are pooled: created once up to a page, then reused.
+        while len(self.rows) < len(visible):
+            self.rows.append(self._entry_row(len(self.rows) + 2))
+
+        for i, entries in enumerate(self.rows):
+            for col, e in enumerate(entries):
+                e.config(bg=self.colors["entry_bg"])
+                e.delete(0, tk.END)
+                if i < len(visible):
+                    e.insert(0, visible[i][col] if col < len(visible[i]) else "")
+                    e.grid()
+                else:
+                    e.grid_remove()
+
+        end = start + len(visible)
+        self.page_label.config(text=f"Rows {start + 1 if visible else 0}–{end} of {len(self.cells)}")
+
+    def _merge_rows(self, updates, new_row):
+        # Apply {instrument: {col: value}} to existing rows; unknown
+        # instruments are appended via new_row(name, fields).
+        self._sync_page()
+        index = {row[0].strip(): r for r, row in enumerate(self.cells)}
+        updated = added = 0
+        for name, fields in updates.items():
+            r = index.get(name)
+            if r is None:
+                row = new_row(name, fields)
+                if row is None:
+                    continue
+                index[name] = len(self.cells)
+                self.cells.append(row)
+                added += 1
+            else:
+                for col, value in fields.items():
+                    self.cells[r][col] = value
+                updated += 1
+        self._show_page(self.page_start)
+        return updated, added
+
+    def import_holdings(self):
+        path = filedialog.askopenfilename(title="Broker export", filetypes=IMPORT_FILETYPES)
+        if not path:
+            return
+        try:
+            holdings = read_holdings(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Import error", f"Cannot import {path}:\n\n{e}")
+            return
+
+        updates = {
+            name: {
+                col: h[key] for col, key in ((1, "price"), (2, "shares"), (3, "weight"), (4, "currency"))
+                if key in h
+            }
+            for name, h in holdings.items()
+        }
+        updated, added = self._merge_rows(
+            updates,
+            lambda name, f: [name, f.get(1, ""), f.get(2, "0"), f.get(3, "0"), f.get(4, "")]
+        )
+        messagebox.showinfo("Import", f"Updated {updated} and added {added} holdings.")
+
+    def import_prices(self):
+        path = filedialog.askopenfilename(title="Price file", filetypes=IMPORT_FILETYPES)
+        if not path:
+            return
+        self._sync_page()
+        names = [row[0].strip() for row in self.cells]
+        try:
+            prices = read_latest_prices(path, names)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Import error", f"Cannot import {path}:\n\n{e}")
+            return
+
+        updated, _ = self._merge_rows({name: {1: p} for name, p in prices.items()}, lambda name, f: None)
+        messagebox.showinfo("Import", f"Updated prices for {updated} of {len(names)} holdings.")
+
+    def save_account_as(self):
+        # Same shape as a /shares request; dca.py runs the monthly plan on it.
+        path = filedialog.asksaveasfilename(
+            title="Save account", defaultextension=ACCOUNT_SUFFIX, filetypes=ACCOUNT_FILETYPES
+        )
+        if not path:
+            return
+        self._sync_page()
+        account = {
+            "account": os.path.splitext(os.path.basename(path))[0],
+            "cash": self.entry_cash.get().strip(),
+            "monthly": self.entry_monthly.get().strip(),
+            "plan": "fewest_trades" if self.plan_mode.get() == PLAN_MODES[1] else "close_gaps",
+            "drift_tolerance_pct": self.entry_tolerance.get().strip(),
+            "fee_per_trade": self.entry_fee.get().strip(),
+            "holdings": [
+                {f: v.strip() for f, v in zip(HOLDING_FIELDS, row) if v.strip()}
+                for row in self.cells if row[0].strip()
+            ],
+        }
+        try:
+            save_account(path, account)
+        except OSError as e:
+            messagebox.showerror("Save error", f"Cannot save {path}:\n\n{e}")
+            return
+        messagebox.showinfo("Account", f"Saved {len(account['holdings'])} holdings to {path}.")
+
+    def open_account(self):
+        path = filedialog.askopenfilename(title="Open account", filetypes=ACCOUNT_FILETYPES)
+        if not path:
+            return
+        try:
+            account = load_account(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Open error", f"Cannot open {path}:\n\n{e}")
+            return
+
+        for entry, key in (
+            (self.entry_cash, "cash"),
+            (self.entry_monthly, "monthly"),
+            (self.entry_tolerance, "drift_tolerance_pct"),
+            (self.entry_fee, "fee_per_trade"),
+        ):
+            if account.get(key) is not None:
+                entry.delete(0, tk.END)
+                entry.insert(0, str(account[key]))
+        self.plan_mode.set(PLAN_MODES[1] if account.get("plan") == "fewest_trades" else PLAN_MODES[0])
+
+        self.cells = [
+            ["" if h.get(f) is None else str(h[f]) for f in HOLDING_FIELDS]
+            for h in account["holdings"] if isinstance(h, dict)
+        ]
+        self.visible_rows = 0       # the page on screen belongs to the old table
+        self._show_page(0)
 
-        self.rows.append(entries)
+    def _add_from_universe(self, values):
+        # A new holding starts with no shares; the weight is left to fill in.
+        values[2] = values[2] or "0"
+        self.add_row(values)
 
     # ---------------- Helpers ----------------
 
     def _set_output_text(self, text):
+        self._build_results()
         self.output.config(state="normal")
         self.output.delete("1.0", tk.END)
         self.output.insert(tk.END, text)
@@ -303,9 +606,21 @@ class ShareAllocator:
             fg=gap_color
         )
 
+    def save_to_journal(self):
+        if not self.last_plan:
+            messagebox.showinfo("Journal", "Calculate a buy plan first.")
+            return
+        journal = TradeJournal()
+        n = journal.append(JOURNAL_ACCOUNT, KIND_SHARES, self.last_plan)
+        self.last_plan = None
+        messagebox.showinfo("Journal", f"Saved {n} purchases to {journal.path}.")
+
     # ---------------- Calculation ----------------
 
+    @recorded_session("shares")
     def calculate(self):
+        self.last_plan = None
+        self._build_results()
         self.output.config(state="normal")
         self.output.delete("1.0", tk.END)
 
@@ -319,51 +634,54 @@ class ShareAllocator:
             self.output.config(state="disabled")
             return
 
-        instruments = []
-        invested_value = 0.0
-        total_weight = 0.0
-
-        for r in self.rows:
-            try:
-                name = r[0].get().strip()
-                price = float(r[1].get())
-                shares = int(r[2].get())
-                weight = float(r[3].get()) / 100.0
-
-                if not name:
-                    raise ValueError
-                if price < 0 or shares < 0 or weight < 0:
-                    raise ValueError
-
-                value = price * shares
-                invested_value += value
-                total_weight += weight
-
-                instruments.append({
-                    "name": name,
-                    "price": price,
-                    "shares": shares,
-                    "weight": weight,
-                    "value": value
-                })
-            except ValueError:
-                messagebox.showerror("Input error", "Invalid table input.")
+        fewest_trades = self.plan_mode.get() == PLAN_MODES[1]
+        try:
+            tolerance_bp = bp(self.entry_tolerance.get())
+            fee_p = non_negative(pence)(self.entry_fee.get())
+            if tolerance_bp < 0:
+                raise ValueError
+        except ValueError:
+            if fewest_trades:
+                messagebox.showerror("Input error", "Invalid drift tolerance or fee per trade.")
                 self.output.config(state="disabled")
                 return
+            tolerance_bp = fee_p = 0
+
+        self._sync_page()
+        columns, errors = validate_table(self.cells, HOLDING_PARSERS)
+        errors = sorted(errors + self.fx.to_base(columns, HOLDING_CURRENCY_COL, HOLDING_MONEY_COLS))
+        if errors:
+            self._show_page(errors[0].row // PAGE_ROWS * PAGE_ROWS)
+        page_errors = [
+            e._replace(row=e.row - self.page_start) for e in errors
+            if self.page_start <= e.row < self.page_start + PAGE_ROWS
+        ]
+        mark_cells(self.rows, page_errors, self.colors["entry_bg"])
+
+        if errors:
+            messagebox.showerror("Input error", "Invalid table input:\n\n" + format_errors(errors, HOLDING_HEADERS))
+            self.output.config(state="disabled")
+            return
 
-        if abs(total_weight - 1.0) > 0.001:
+        instruments = [make_holding(*row) for row in zip(*columns)]
+
+        invested_p = sum(inst["value_p"] for inst in instruments)
+        total_weight_bp = sum(inst["weight_bp"] for inst in instruments)
+        invested_value = from_pence(invested_p)
+
+        if abs(total_weight_bp - BP) > WEIGHT_TOLERANCE_BP:
             messagebox.showerror(
                 "Weight error",
-                f"Target weights must sum to 100% (currently {total_weight * 100:.1f}%)."
+                f"Target weights must sum to 100% (currently {total_weight_bp / 100:.1f}%)."
             )
             self.output.config(state="disabled")
             return
 
         all_zero = all(inst["shares"] == 0 for inst in instruments)
 
-        total_cash_for_cycle = cash + monthly
+        cycle_p = to_pence(cash) + to_pence(monthly)
+        total_cash_for_cycle = from_pence(cycle_p)
         current_portfolio_value = invested_value + cash
-        target_portfolio_value_after_cash = invested_value + total_cash_for_cycle
 
         largest_gap_inst = None
         largest_gap_value = 0.0
@@ -432,70 +750,24 @@ class ShareAllocator:
         self._append("\n")
 
         if all_zero:
-            remaining_cash = total_cash_for_cycle
+            planned_buys, remaining_p = record(
+                "shares.plan_initial_build", plan_initial_build, instruments, cycle_p
+            )
 
             self._append("INITIAL BUILD PLAN\n")
             self._append("-" * 86 + "\n")
 
-            planned_buys = []
-
-            for inst in sorted(instruments, key=lambda x: x["weight"], reverse=True):
-                if inst["price"] <= 0:
-                    continue
-
-                target_cash = total_cash_for_cycle * inst["weight"]
-                qty = int(target_cash // inst["price"])
-
-                if qty > 0:
-                    cost = qty * inst["price"]
-                    if cost > remaining_cash:
-                        qty = int(remaining_cash // inst["price"])
-                        cost = qty * inst["price"]
-
-                    if qty > 0:
-                        planned_buys.append((inst, qty, cost))
-                        remaining_cash -= cost
-
-            while True:
-                affordable = [inst for inst in instruments if 0 < inst["price"] <= remaining_cash]
-                if not affordable:
-                    break
-
-                best = max(
-                    affordable,
-                    key=lambda x: (total_cash_for_cycle * x["weight"]) - sum(
-                        c for i, q, c in planned_buys if i["name"] == x["name"]
-                    )
-                )
-
-                best_gap = (total_cash_for_cycle * best["weight"]) - sum(
-                    c for i, q, c in planned_buys if i["name"] == best["name"]
-                )
-
-                if best_gap <= 0:
-                    break
-
-                found = False
-                for idx, (i, q, c) in enumerate(planned_buys):
-                    if i["name"] == best["name"]:
-                        planned_buys[idx] = (i, q + 1, c + i["price"])
-                        found = True
-                        break
-
-                if not found:
-                    planned_buys.append((best, 1, best["price"]))
-
-                remaining_cash -= best["price"]
-
-            for inst, qty, cost in planned_buys:
+            for inst, qty, line_p in planned_buys:
                 self._append(
-                    f"Buy {qty:>4d} × {inst['name']} @ £{inst['price']:.2f}   Cost £{cost:.2f}\n"
+                    f"Buy {qty:>4d} × {inst['name']} @ £{price_text(inst['price_u'])}   "
+                    f"Cost £{from_pence(line_p):.2f}\n"
                 )
 
             self._append("-" * 86 + "\n")
-            self._append(f"Cash remaining: £{remaining_cash:.2f}\n")
+            self._append(f"Cash remaining: £{from_pence(remaining_p):.2f}\n")
 
             self.output.config(state="disabled")
+            self.last_plan = [(inst["name"], qty, inst["price_u"], 0) for inst, qty, _ in planned_buys]
             return
 
         self._append("DCA MODE\n")
@@ -503,85 +775,94 @@ class ShareAllocator:
         self._append(f"Monthly contribution added:        £{monthly:.2f}\n")
         self._append(f"Cash available for this cycle:     £{total_cash_for_cycle:.2f}\n\n")
 
-        for inst in instruments:
-            inst["target_after_cash"] = target_portfolio_value_after_cash * inst["weight"]
-            inst["gap_after_cash"] = inst["target_after_cash"] - inst["value"]
+        out_of_band = []
+        fees_p = 0
+        if fewest_trades:
+            buy_plan, remaining_p, out_of_band = record(
+                "shares.plan_fewest_trades", plan_fewest_trades,
+                instruments, invested_p, cycle_p, tolerance_bp, fee_p
+            )
+            if buy_plan is None:
+                self._append(
+                    f"Fewest trades: the must-buy orders to stay within ±{tolerance_bp / 100:.2f}% "
+                    f"cost more than the cash; closing gaps instead.\n\n"
+                )
+                buy_plan, remaining_p = record(
+                    "shares.plan_dca_buys", plan_dca_buys, instruments, invested_p, cycle_p
+                )
+            else:
+                fees_p = sum(fee_p for qty in buy_plan.values() if qty > 0)
+        else:
+            buy_plan, remaining_p = record(
+                "shares.plan_dca_buys", plan_dca_buys, instruments, invested_p, cycle_p
+            )
 
+        for inst in instruments:
             self._append(
                 f"{inst['name']:20s} "
                 f"Current £ {inst['value']:9.2f}   "
-                f"Target(after cash) £ {inst['target_after_cash']:9.2f}   "
-                f"Gap £ {inst['gap_after_cash']:+9.2f}\n"
+                f"Target(after cash) £ {from_pence(inst['target_after_cash_p']):9.2f}   "
+                f"Gap £ {from_pence(inst['gap_after_cash_p']):+9.2f}\n"
             )
 
         self._append("\n")
 
-        underweight = [
-            inst for inst in instruments
-            if inst["gap_after_cash"] > 0 and inst["price"] > 0
-        ]
-
-        if not underweight:
+        if not fewest_trades and not any(
+            inst["gap_after_cash_p"] > 0 and inst["price_u"] > 0 for inst in instruments
+        ):
             self._append("RECOMMENDED BUY PLAN\n")
             self._append("-" * 86 + "\n")
             self._append("No underweight assets to buy.\n")
             self.output.config(state="disabled")
             return
 
-        remaining_cash = total_cash_for_cycle
-        buy_plan = {inst["name"]: 0 for inst in instruments}
-
-        while True:
-            affordable = [inst for inst in underweight if inst["price"] <= remaining_cash]
-            if not affordable:
-                break
-
-            best = max(
-                affordable,
-                key=lambda x: x["gap_after_cash"] - (buy_plan[x["name"]] * x["price"])
-            )
-
-            remaining_gap = best["gap_after_cash"] - (buy_plan[best["name"]] * best["price"])
-
-            if remaining_gap <= 0:
-                break
-
-            buy_plan[best["name"]] += 1
-            remaining_cash -= best["price"]
-
         self._append("RECOMMENDED BUY PLAN\n")
         self._append("-" * 86 + "\n")
 
-        total_spend = 0.0
+        spend_u = 0
         any_buys = False
 
         for inst in instruments:
             qty = buy_plan[inst["name"]]
             if qty > 0:
-                cost = qty * inst["price"]
-                total_spend += cost
+                spend_u += qty * inst["price_u"]
                 any_buys = True
                 self._append(
-                    f"Buy {qty:>4d} × {inst['name']} @ £{inst['price']:.2f}   Cost £{cost:.2f}\n"
+                    f"Buy {qty:>4d} × {inst['name']} @ £{price_text(inst['price_u'])}   "
+                    f"Cost £{from_pence(cost_p(inst['price_u'], qty)):.2f}\n"
                 )
+        total_spend_p = cost_p(spend_u, 1)
 
         if not any_buys:
             self._append("No purchases possible with available cash.\n")
         else:
+            self.last_plan = [
+                (inst["name"], buy_plan[inst["name"]], inst["price_u"], 0)
+                for inst in instruments if buy_plan[inst["name"]] > 0
+            ]
+
             self._append("-" * 86 + "\n")
-            self._append(f"Total spend:    £{total_spend:.2f}\n")
-            self._append(f"Cash remaining: £{remaining_cash:.2f}\n\n")
+            self._append(f"Total spend:    £{from_pence(total_spend_p):.2f}\n")
+            if fees_p:
+                orders = sum(1 for qty in buy_plan.values() if qty > 0)
+                self._append(f"Fees ({orders} orders): £{from_pence(fees_p):.2f}\n")
+            self._append(f"Cash remaining: £{from_pence(remaining_p):.2f}\n\n")
+            if out_of_band:
+                self._append(
+                    f"Cannot reach ±{tolerance_bp / 100:.2f}% by buying: {', '.join(out_of_band)}\n\n"
+                )
 
             self._append("POST-BUY PROJECTED HOLDINGS\n")
             self._append("-" * 86 + "\n")
 
-            new_invested_value = invested_value + total_spend
+            new_invested_p = invested_p + total_spend_p
 
             for inst in instruments:
                 qty_bought = buy_plan[inst["name"]]
                 new_shares = inst["shares"] + qty_bought
-                new_value = inst["value"] + qty_bought * inst["price"]
-                new_weight = (new_value / new_invested_value * 100.0) if new_invested_value > 0 else 0.0
+                new_value_p = cost_p(inst["price_u"], new_shares)
+                new_value = from_pence(new_value_p)
+                new_weight = (new_value_p * 100.0 / new_invested_p) if new_invested_p > 0 else 0.0
                 target_weight = inst["weight"] * 100.0
 
                 self._append(
@@ -597,5 +878,6 @@ class ShareAllocator:
 
 if __name__ == "__main__":
     root = tk.Tk()
+    measure_launch(root, "shares")
     app = ShareAllocator(root)
     root.mainloop()
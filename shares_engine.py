@@ -0,0 +1,310 @@
+import heapq
+from itertools import combinations
+
+from fx import BASE
+from metrics import solver_iterations
+from money import BP, PENCE, PRICE_UNITS, from_pence, mul_div_round
+from validation import bp, currency, non_negative, optional, price_units, text, validate_row, whole
+
+# -----------------------------
+# ISA holdings and buy-plan engines
+# -----------------------------
+# No Tk here: the allocator window (shares.py), the sizing service, the
+# monthly runner and the backtester all plan through these functions.
+
+# Target weights may be off 100% by at most this much (0.1%)
+WEIGHT_TOLERANCE_BP = 10
+
+# Fill steps the fewest-trades search may spend before it settles for the
+# greedy plan (tens of ms at worst, with hundreds of holdings)
+FEWEST_SEARCH_STEPS = 20_000
+
+
+HOLDING_HEADERS = [
+    "Instrument",
+    "Live Price",
+    "Shares Held",
+    "Target Weight (%)",
+    "Currency",
+]
+
+# Saved accounts and the sizing service name the same columns like this
+HOLDING_FIELDS = ("name", "price", "shares", "weight_pct", "currency")
+
+HOLDING_PARSERS = [
+    text,
+    non_negative(price_units),
+    non_negative(whole),
+    non_negative(bp),
+    optional(currency, default=BASE),
+]
+
+# Prices are in the listing currency until FxTable.to_base.
+HOLDING_MONEY_COLS = (1,)
+HOLDING_CURRENCY_COL = 4
+
+
+# Share prices are held exactly in price units (fund prices are often
+# quoted below a penny); values, gaps and cash are whole pence.
+UNITS_PER_PENNY = PRICE_UNITS // PENCE
+
+
+def make_holding(name, price_u, shares, weight_bp, currency=BASE):
+    value_p = cost_p(price_u, shares)
+    return {
+        "name": name,
+        "currency": currency,
+        "price_u": price_u,
+        "price_p": cost_p(price_u, 1),
+        "shares": shares,
+        "weight_bp": weight_bp,
+        "value_p": value_p,
+        "price": price_u / PRICE_UNITS,
+        "weight": weight_bp / BP,
+        "value": from_pence(value_p),
+    }
+
+
+def cost_p(price_u, qty):
+    # Cost of qty shares to the nearest penny
+    return mul_div_round(qty * price_u, 1, UNITS_PER_PENNY)
+
+
+def price_text(price_u):
+    # Pence always, sub-penny digits only when the price has them: 512.30, 0.8734
+    whole, _, frac = f"{price_u / PRICE_UNITS:.6f}".partition(".")
+    return f"{whole}.{frac.rstrip('0').ljust(2, '0')}"
+
+
+def build_holding(*cells):
+    return make_holding(*validate_row(cells, HOLDING_PARSERS))
+
+
+# ---------------- Buy-plan engines ----------------
+# Cash in and out is integer pence; inside, costs are summed in exact
+# price units so a plan never spends more than the cash it was given.
+
+def plan_initial_build(instruments, cash_p):
+    # First pass: whole shares towards each target, heaviest weight first.
+    # Then spend leftovers one share at a time on the largest cash gap.
+    cash_u = cash_p * UNITS_PER_PENNY
+    remaining_u = cash_u
+    planned = {}
+    spent = {}
+
+    for inst in sorted(instruments, key=lambda x: x["weight_bp"], reverse=True):
+        if inst["price_u"] <= 0:
+            continue
+
+        target_u = cash_u * inst["weight_bp"] // BP
+        qty = target_u // inst["price_u"]
+
+        if qty > 0:
+            cost = qty * inst["price_u"]
+            if cost > remaining_u:
+                qty = remaining_u // inst["price_u"]
+                cost = qty * inst["price_u"]
+
+            if qty > 0:
+                planned[inst["name"]] = [inst, qty]
+                spent[inst["name"]] = cost
+                remaining_u -= cost
+
+    def gap(x):
+        return cash_u * x["weight_bp"] // BP - spent.get(x["name"], 0)
+
+    steps = 0
+    while True:
+        steps += 1
+        affordable = [inst for inst in instruments if 0 < inst["price_u"] <= remaining_u]
+        if not affordable:
+            break
+
+        best = max(affordable, key=gap)
+        if gap(best) <= 0:
+            break
+
+        if best["name"] in planned:
+            planned[best["name"]][1] += 1
+        else:
+            planned[best["name"]] = [best, 1]
+        spent[best["name"]] = spent.get(best["name"], 0) + best["price_u"]
+        remaining_u -= best["price_u"]
+
+    solver_iterations("shares.plan_initial_build", steps)
+    return (
+        [(inst, qty, cost_p(inst["price_u"], qty)) for inst, qty in planned.values()],
+        remaining_u // UNITS_PER_PENNY,
+    )
+
+
+def annotate_gaps(instruments, invested_p, cash_p):
+    for inst in instruments:
+        inst["target_after_cash_p"] = mul_div_round(invested_p + cash_p, inst["weight_bp"], BP)
+        inst["gap_after_cash_p"] = inst["target_after_cash_p"] - inst["value_p"]
+
+
+def plan_dca_buys(instruments, invested_p, cash_p):
+    # Greedy: buy one share at a time of whichever underweight holding has
+    # the largest remaining gap after this cycle's cash is added.
+    annotate_gaps(instruments, invested_p, cash_p)
+
+    underweight = [
+        inst for inst in instruments
+        if inst["gap_after_cash_p"] > 0 and inst["price_u"] > 0
+    ]
+
+    remaining_u = cash_p * UNITS_PER_PENNY
+    buy_plan = {inst["name"]: 0 for inst in instruments}
+
+    def remaining_gap(x):
+        return x["gap_after_cash_p"] * UNITS_PER_PENNY - buy_plan[x["name"]] * x["price_u"]
+
+    steps = 0
+    while underweight:
+        steps += 1
+        affordable = [inst for inst in underweight if inst["price_u"] <= remaining_u]
+        if not affordable:
+            break
+
+        best = max(affordable, key=remaining_gap)
+        if remaining_gap(best) <= 0:
+            break
+
+        buy_plan[best["name"]] += 1
+        remaining_u -= best["price_u"]
+
+    solver_iterations("shares.plan_dca_buys", steps)
+    return buy_plan, remaining_u // UNITS_PER_PENNY
+
+
+def plan_fewest_trades(instruments, invested_p, cash_p, tolerance_bp, fee_p=0):
+    # Fewest orders that leave every holding within tolerance_bp of its
+    # target after this cycle's cash and invest the cash down to less than
+    # one share of anything with room left (plus the fee, for a holding
+    # with no order). Holdings below their band must be bought. The greedy
+    # plan (add the holding with most room until the cash is used) bounds
+    # the order count; then k = 0, 1, ... optional orders are tried, sets
+    # taken in order of room, and the first k whose fill is complete wins.
+    # Returns (buy_plan, remaining_p after fees, out_of_band names), or
+    # buy_plan None if the must-buy orders alone cost more than the cash.
+    annotate_gaps(instruments, invested_p, cash_p)
+    band_u = (invested_p + cash_p) * tolerance_bp // BP * UNITS_PER_PENNY
+    fee_u = fee_p * UNITS_PER_PENNY
+
+    lo, hi = {}, {}
+    out_of_band = []
+    for inst in instruments:
+        name, price, gap = inst["name"], inst["price_u"], inst["gap_after_cash_p"] * UNITS_PER_PENNY
+        if price <= 0:
+            lo[name] = hi[name] = 0
+            if abs(gap) > band_u:
+                out_of_band.append(name)
+            continue
+        lo[name] = max(0, -((band_u - gap) // price))
+        hi[name] = (gap + band_u) // price
+        if hi[name] < lo[name]:
+            # Overweight past the band (selling is not an option) or a band
+            # narrower than one share: take the nearest whole-share position.
+            out_of_band.append(name)
+            lo[name] = hi[name] = max(0, (2 * gap + price) // (2 * price))
+
+    forced = [inst for inst in instruments if lo[inst["name"]] > 0]
+    optional = sorted(
+        (inst for inst in instruments if lo[inst["name"]] == 0 and hi[inst["name"]] > 0),
+        key=lambda x: (hi[x["name"]] * x["price_u"], x["gap_after_cash_p"]),
+        reverse=True,
+    )
+
+    base_plan = {inst["name"]: lo[inst["name"]] for inst in instruments}
+    base_u = cash_p * UNITS_PER_PENNY - sum(
+        (lo[inst["name"]] * inst["price_u"] + fee_u) for inst in forced
+    )
+    if base_u < 0:
+        return None, cash_p, out_of_band
+
+    steps = 0
+
+    def fill(buy_plan, chosen, remaining_u):
+        # Spend on the largest remaining gap, never past a band ceiling. A
+        # holding takes as many shares at once as keep it ahead of the next
+        # in line. Returns the cash left.
+        nonlocal steps
+
+        def gap(inst):
+            return inst["gap_after_cash_p"] * UNITS_PER_PENNY - buy_plan[inst["name"]] * inst["price_u"]
+
+        heap = [(-gap(inst), i, inst) for i, inst in enumerate(chosen) if buy_plan[inst["name"]] < hi[inst["name"]]]
+        heapq.heapify(heap)
+        while heap:
+            steps += 1
+            _, i, inst = heapq.heappop(heap)
+            name, price = inst["name"], inst["price_u"]
+            if price > remaining_u:
+                continue        # never affordable again: cash only shrinks
+            n = min(hi[name] - buy_plan[name], remaining_u // price)
+            if heap:
+                n = min(n, (gap(inst) + heap[0][0]) // price + 1)
+            buy_plan[name] += n
+            remaining_u -= n * price
+            if buy_plan[name] < hi[name]:
+                heapq.heappush(heap, (-gap(inst), i, inst))
+        return remaining_u
+
+    # Greedy: once the chosen holdings are full or too dear for what is
+    # left, open one more order on the holding with most room that can
+    # take a share. Always complete, so it is the plan to beat.
+    buy_plan = dict(base_plan)
+    chosen = list(forced)
+    remaining_u = fill(buy_plan, chosen, base_u)
+    for inst in optional:
+        if inst["price_u"] + fee_u <= remaining_u:
+            remaining_u -= fee_u
+            buy_plan[inst["name"]] = 1
+            remaining_u -= inst["price_u"]
+            chosen.append(inst)
+            remaining_u = fill(buy_plan, chosen, remaining_u)
+
+    # Bounded search for fewer optional orders. Holdings that cannot take
+    # a share with its fee out of the base cash never matter. A plan is
+    # complete when every unopened holding costs more (with its fee) than
+    # the cash left, so a set whose whole band room cannot bring the cash
+    # that low is skipped, and so is every k whose k roomiest holdings
+    # cannot.
+    candidates = [inst for inst in optional if inst["price_u"] + fee_u <= base_u]
+    room_u = [hi[inst["name"]] * inst["price_u"] for inst in candidates]
+    forced_room_u = sum((hi[inst["name"]] - lo[inst["name"]]) * inst["price_u"] for inst in forced)
+    by_cost = sorted((inst["price_u"] + fee_u, i) for i, inst in enumerate(candidates))
+    top_room_u = forced_room_u
+    for k in range(len(chosen) - len(forced)):
+        if k:
+            top_room_u += room_u[k - 1]
+        cash_u = base_u - k * fee_u
+        if k < len(by_cost) and cash_u - top_room_u >= by_cost[k][0]:
+            continue
+        found = None
+        for combo in combinations(range(len(candidates)), k):
+            if steps > FEWEST_SEARCH_STEPS:
+                break
+            steps += 1
+            taken = set(combo)
+            floor_u = next((c for c, i in by_cost if i not in taken), None)
+            if floor_u is not None and cash_u - forced_room_u - sum(room_u[i] for i in combo) >= floor_u:
+                continue
+            picked = [candidates[i] for i in combo]
+            spend_u = sum(inst["price_u"] for inst in picked)
+            if spend_u > cash_u:
+                continue
+            trial = dict(base_plan)
+            for inst in picked:
+                trial[inst["name"]] = 1
+            left_u = fill(trial, forced + picked, cash_u - spend_u)
+            if floor_u is None or left_u < floor_u:
+                found = trial, left_u
+                break
+        if found:
+            buy_plan, remaining_u = found
+            break
+
+    solver_iterations("shares.plan_fewest_trades", steps)
+    return buy_plan, remaining_u // UNITS_PER_PENNY, out_of_band
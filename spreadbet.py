@@ -1,19 +1,21 @@
-import math
 import tkinter as tk
-from tkinter import messagebox, font
+from tkinter import filedialog, messagebox, font
 
+from fx import BASE, FxTable
+from journal import KIND_SPREADBET, TradeJournal
+from launch import measure_launch
+from money import from_pence, from_ticks, to_price_units
+from sessions import record, recorded_session
+from spreadbet_engine import (
+    INSTRUMENT_CURRENCY_COL, INSTRUMENT_HEADERS, INSTRUMENT_MONEY_COLS, INSTRUMENT_PARSERS,
+    SUBSET_OBJECTIVES, make_instrument, select_affordable_legs, size_deposit_allocation,
+)
+from validation import format_errors, mark_cells, validate_table
 
-def round_down_to_step(x: float, step: float) -> float:
-    if step <= 0:
-        return x
-    return math.floor(x / step) * step
+JOURNAL_ACCOUNT = "Spread Bet"
 
-
-def safe_float(s: str):
-    s = s.strip()
-    if s == "":
-        return None
-    return float(s)
+STRESS_SCENARIOS = 100_000
+STRESS_HORIZON_DAYS = 5
 
 
 class PortfolioDepositAllocator:
@@ -21,7 +23,7 @@ class PortfolioDepositAllocator:
     def __init__(self, root):
         self.root = root
         root.title("25Ten Delta – Deposit Allocator")
-        root.geometry("1250x620")
+        root.geometry("1320x620")
 
         default_font = font.nametofont("TkDefaultFont")
         default_font.configure(size=11)
@@ -42,6 +44,16 @@ class PortfolioDepositAllocator:
         self.entry_margin_pct.grid(row=0, column=3, padx=5)
 
         tk.Button(ctrl, text="Calculate", command=self.calculate).grid(row=0, column=4, padx=10)
+        tk.Button(ctrl, text="Save to Journal", command=self.save_to_journal).grid(row=0, column=5)
+
+        tk.Label(ctrl, text="If cap too low, keep legs by:").grid(row=0, column=6, sticky="w", padx=(10, 0))
+        self.subset_objective = tk.StringVar(value=SUBSET_OBJECTIVES[0])
+        tk.OptionMenu(ctrl, self.subset_objective, *SUBSET_OBJECTIVES).grid(row=0, column=7)
+
+        tk.Button(ctrl, text="Stress Test", command=self.stress_test).grid(row=0, column=8, padx=10)
+        self.last_sizing = None
+
+        self.last_plan = None
 
         # -----------------------------
         # Instrument table (FIXED ROWS)
@@ -49,17 +61,7 @@ class PortfolioDepositAllocator:
         table = tk.Frame(root)
         table.pack(fill="x", padx=10, pady=10)
 
-        headers = [
-            "Instrument",
-            "Sector",
-            "Live Price",
-            "Min Stake",
-            "Margin @ Min",
-            "Notional @ Min",
-            "Weight %"
-        ]
-
-        for c, h in enumerate(headers):
+        for c, h in enumerate(INSTRUMENT_HEADERS):
             tk.Label(table, text=h, font=("TkDefaultFont", 10, "bold")).grid(row=0, column=c, padx=5)
 
         self.rows = []
@@ -95,6 +97,15 @@ class PortfolioDepositAllocator:
             e_weight.grid(row=r, column=6, padx=3)
             entries.append(e_weight)
 
+            e_tiers = tk.Entry(table, width=18)
+            e_tiers.grid(row=r, column=7, padx=3)
+            entries.append(e_tiers)
+
+            e_ccy = tk.Entry(table, width=6)
+            e_ccy.insert(0, BASE)
+            e_ccy.grid(row=r, column=8, padx=3)
+            entries.append(e_ccy)
+
             self.rows.append(entries)
 
         # -----------------------------
@@ -103,10 +114,16 @@ class PortfolioDepositAllocator:
         self.output = tk.Text(root, height=18, width=145, state="disabled")
         self.output.pack(padx=10, pady=10)
 
+        self.entry_bg = self.entry_balance.cget("bg")
+        self.fx = FxTable()
+
     # --------------------------------------------------
     # Calculation logic (weights = NOTIONAL, margin = constraint)
     # --------------------------------------------------
+    @recorded_session("spreadbet")
     def calculate(self):
+        self.last_plan = None
+        self.last_sizing = None
         self.output.config(state="normal")
         self.output.delete("1.0", tk.END)
 
@@ -123,136 +140,62 @@ class PortfolioDepositAllocator:
 
         target_total_margin = balance * margin_pct
 
-        # ---- Read instrument rows ----
-        instruments = []
-        for entries in self.rows:
-            try:
-                name = entries[0].get()
-                sector = entries[1].get()
-                price = safe_float(entries[2].get())
-                min_stake = safe_float(entries[3].get())
-                margin_min = safe_float(entries[4].get())
-                notional_min = safe_float(entries[5].get())
-                weight_pct = safe_float(entries[6].get())
-
-                if None in (price, min_stake, margin_min, notional_min, weight_pct):
-                    raise ValueError
-
-                if min_stake <= 0 or margin_min <= 0 or notional_min <= 0 or weight_pct <= 0:
-                    raise ValueError
-
-                inst = {
-                    "name": name,
-                    "sector": sector,
-                    "price": price,
-                    "min_stake": min_stake,
-                    "margin_per_unit": margin_min / min_stake,     # £ margin per £/pt
-                    "notional_per_unit": notional_min / min_stake, # £ notional per £/pt
-                    "weight_pct": weight_pct
-                }
-                instruments.append(inst)
-
-            except Exception:
-                messagebox.showerror("Input Error", f"Incomplete/invalid data for {entries[0].get()}")
-                self.output.config(state="disabled")
-                return
+        # ---- Read instrument rows (all bad cells reported at once) ----
+        cells = [[e.get() for e in entries] for entries in self.rows]
+        columns, errors = validate_table(cells, INSTRUMENT_PARSERS)
+        errors = sorted(errors + self.fx.to_base(columns, INSTRUMENT_CURRENCY_COL, INSTRUMENT_MONEY_COLS))
+        mark_cells(self.rows, errors, self.entry_bg)
 
-        total_weight = sum(i["weight_pct"] for i in instruments)
-        if total_weight <= 0:
-            messagebox.showerror("Input Error", "Weights must sum to > 0.")
+        if errors:
+            messagebox.showerror("Input Error", format_errors(errors, INSTRUMENT_HEADERS))
             self.output.config(state="disabled")
             return
 
-        # ---- Helper: given scale k, compute stakes (rounded down), margins, notionals ----
-        # We define target_notional_i = k * (weight_i / total_weight)
-        # Then stake_i = floor(target_notional_i / notional_per_unit_i) to min_stake increments.
-        def compute_for_scale(k: float):
-            stakes = []
-            margins = []
-            notionals = []
-            for inst in instruments:
-                target_notional_i = k * (inst["weight_pct"] / total_weight)
-
-                raw_stake = target_notional_i / inst["notional_per_unit"]
-                stake = round_down_to_step(raw_stake, inst["min_stake"])
-
-                # IMPORTANT: allow zero during search; we’ll handle min-stake feasibility afterward
-                if stake < 0:
-                    stake = 0.0
-
-                stakes.append(stake)
-                margins.append(stake * inst["margin_per_unit"])
-                notionals.append(stake * inst["notional_per_unit"])
-            return stakes, margins, notionals
-
-        # ---- First: check feasibility of holding ALL 3 at minimum stake under the margin cap ----
-        min_stakes = [inst["min_stake"] for inst in instruments]
-        min_margins = [ms * inst["margin_per_unit"] for ms, inst in zip(min_stakes, instruments)]
-        min_total_margin = sum(min_margins)
-
-        if min_total_margin > target_total_margin:
-            # Not feasible to hold all three legs at min size within cap
-            self.output.insert(tk.END, "ERROR: Margin cap too low to hold all three instruments at minimum stake.\n\n")
-            self.output.insert(tk.END, f"Target margin cap: {target_total_margin:.2f}\n")
-            self.output.insert(tk.END, f"Minimum margin needed (0.01 each): {min_total_margin:.2f}\n\n")
-            self.output.insert(tk.END, "Fix: increase Target Margin %, increase balance, or reduce required legs.\n")
-            self.output.config(state="disabled")
-            return
+        instruments = [make_instrument(*row) for row in zip(*columns)]
 
-        # ---- Binary search k to maximize total notional while staying within margin cap ----
-        # Start with k_hi by growing until we exceed margin cap.
-        k_lo = 0.0
-        k_hi = 1.0
-
-        # ensure k_hi is high enough to exceed the cap
-        for _ in range(60):
-            stakes, margins, notionals = compute_for_scale(k_hi)
-
-            # enforce minimum stakes (since we know it's feasible)
-            stakes2 = []
-            for stake, inst in zip(stakes, instruments):
-                if stake < inst["min_stake"]:
-                    stake = inst["min_stake"]
-                stakes2.append(stake)
-            margins2 = [s * inst["margin_per_unit"] for s, inst in zip(stakes2, instruments)]
-            total_margin2 = sum(margins2)
-
-            if total_margin2 >= target_total_margin:
-                break
-            k_hi *= 2.0
-
-        # binary search between lo/hi
-        best = None
-        for _ in range(80):
-            k_mid = (k_lo + k_hi) / 2.0
-            stakes, margins, notionals = compute_for_scale(k_mid)
-
-            # enforce minimum stakes
-            stakes = [max(s, inst["min_stake"]) for s, inst in zip(stakes, instruments)]
-            margins = [s * inst["margin_per_unit"] for s, inst in zip(stakes, instruments)]
-            notionals = [s * inst["notional_per_unit"] for s, inst in zip(stakes, instruments)]
-
-            total_margin = sum(margins)
-
-            if total_margin <= target_total_margin:
-                best = (k_mid, stakes, margins, notionals)
-                k_lo = k_mid
-            else:
-                k_hi = k_mid
-
-        if best is None:
-            messagebox.showerror("Sizing Error", "Unable to size portfolio under margin cap (unexpected).")
-            self.output.config(state="disabled")
-            return
+        result = record(
+            "spreadbet.size_deposit_allocation", size_deposit_allocation, instruments, target_total_margin
+        )
+
+        if not result["feasible"]:
+            # Not feasible to hold every leg at min size within cap: keep the
+            # best subset that is.
+            selection = record(
+                "spreadbet.select_affordable_legs", select_affordable_legs,
+                instruments, target_total_margin, self.subset_objective.get()
+            )
+
+            if not selection["indices"]:
+                self.output.insert(tk.END, "ERROR: Margin cap too low to hold any instrument at minimum stake.\n\n")
+                self.output.insert(tk.END, f"Target margin cap: {from_pence(result['target_margin_p']):.2f}\n")
+                self.output.insert(tk.END, f"Minimum margin needed for all legs: {from_pence(result['min_margin_p']):.2f}\n\n")
+                self.output.insert(tk.END, "Fix: increase Target Margin %, increase balance, or reduce required legs.\n")
+                self.output.config(state="disabled")
+                return
+
+            dropped = ", ".join(instruments[i]["name"] for i in selection["dropped"])
+            self.output.insert(tk.END, "NOTE: Margin cap too low to hold every instrument at minimum stake.\n")
+            self.output.insert(
+                tk.END,
+                f"Holding the best subset by {self.subset_objective.get()} "
+                f"({selection['coverage_pct']:.2f}% covered). Dropped: {dropped}\n\n"
+            )
+
+            instruments = [instruments[i] for i in selection["indices"]]
+            result = record(
+                "spreadbet.size_deposit_allocation", size_deposit_allocation, instruments, target_total_margin
+            )
 
-        _, stakes, margins, notionals = best
-        total_margin = sum(margins)
-        total_notional = sum(notionals)
+        stakes = [from_ticks(t) for t in result["stake_ticks"]]
+        margins = [from_pence(p) for p in result["margin_p"]]
+        notionals = [from_pence(p) for p in result["notional_p"]]
+        total_margin = from_pence(result["total_margin_p"])
+        total_notional = from_pence(result["total_notional_p"])
 
         # achieved weights (by notional)
         achieved = []
-        for inst, n in zip(instruments, notionals):
-            achieved_w = (n / total_notional * 100.0) if total_notional > 0 else 0.0
+        for n in result["notional_p"]:
+            achieved_w = (n * 100.0 / result["total_notional_p"]) if result["total_notional_p"] > 0 else 0.0
             achieved.append(achieved_w)
 
         # ---- Output ----
@@ -280,8 +223,75 @@ class PortfolioDepositAllocator:
 
         self.output.config(state="disabled")
 
+        self.last_plan = [
+            (inst["name"], ticks, to_price_units(inst["price"]), margin_p)
+            for inst, ticks, margin_p in zip(instruments, result["stake_ticks"], result["margin_p"])
+        ]
+        self.last_sizing = (instruments, result, balance)
+
+    def stress_test(self):
+        if not self.last_sizing:
+            messagebox.showinfo("Stress Test", "Calculate a plan first.")
+            return
+        try:
+            from riskparity import EwmaCovariance
+            from stress import historical_scenarios, read_price_matrix, stress_test, synthetic_scenarios
+        except ImportError:
+            messagebox.showerror("Stress Test", "Stress testing needs NumPy installed.")
+            return
+
+        path = filedialog.askopenfilename(
+            title="Price history CSV", filetypes=[("CSV files", "*.csv"), ("All files", "*")])
+        if not path:
+            return
+
+        instruments, result, balance = self.last_sizing
+        names = [inst["name"] for inst in instruments]
+        try:
+            prices = read_price_matrix(path, names)
+            historical = historical_scenarios(prices, STRESS_HORIZON_DAYS)
+        except (OSError, ValueError, IndexError) as e:
+            messagebox.showerror("Stress Test", f"Cannot use price history: {e}")
+            return
+
+        model = EwmaCovariance(names)
+        model.seed(prices)
+        synthetic = synthetic_scenarios(model.cov, STRESS_SCENARIOS, STRESS_HORIZON_DAYS, dof=5)
+
+        stakes = [from_ticks(t) for t in result["stake_ticks"]]
+        live = [inst["price"] for inst in instruments]
+        margins = [from_pence(p) for p in result["margin_p"]]
+
+        self.output.config(state="normal")
+        self.output.insert(tk.END, f"\nSTRESS TEST ({STRESS_HORIZON_DAYS}-day shocks, margin call at equity < margin)\n")
+        self.output.insert(tk.END, "-" * 92 + "\n")
+        self.output.insert(
+            tk.END,
+            f"{'Scenarios':24s} {'Count':>8s} {'Breach %':>9s} {'VaR95 £':>11s} {'VaR99 £':>11s} "
+            f"{'ES99 £':>11s} {'Worst P&L £':>13s}\n"
+        )
+        for label, scenarios in (("Historical", historical), ("Synthetic (EWMA, t5)", synthetic)):
+            r = stress_test(stakes, live, margins, balance, scenarios)
+            self.output.insert(
+                tk.END,
+                f"{label:24s} {r['scenarios']:8d} {r['breach_probability'] * 100:9.2f} {r['var_95']:11.2f} "
+                f"{r['var_99']:11.2f} {r['es_99']:11.2f} {r['worst_pnl']:13.2f}\n"
+            )
+        self.output.insert(tk.END, f"{'Headroom before margin call:':<55s}{r['headroom']:12.2f}\n")
+        self.output.config(state="disabled")
+
+    def save_to_journal(self):
+        if not self.last_plan:
+            messagebox.showinfo("Journal", "Calculate a plan first.")
+            return
+        journal = TradeJournal()
+        n = journal.append(JOURNAL_ACCOUNT, KIND_SPREADBET, self.last_plan)
+        self.last_plan = None
+        messagebox.showinfo("Journal", f"Saved {n} legs to {journal.path}.")
+
 
 if __name__ == "__main__":
     root = tk.Tk()
+    measure_launch(root, "spreadbet")
     app = PortfolioDepositAllocator(root)
     root.mainloop()
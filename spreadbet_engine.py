@@ -0,0 +1,229 @@
+import heapq
+from bisect import bisect_right
+
+from fx import BASE
+from leg_selection import best_subset
+from margin_tiers import MarginSchedule, parse_tiers
+from money import BP, from_ticks, to_pence
+from validation import bp, currency, number, optional, pence, positive, text, ticks, validate_row
+
+# -----------------------------
+# Spread-bet instruments and deposit sizing engines
+# -----------------------------
+# No Tk here: the allocator window (spreadbet.py) and the sizing service
+# both size through these functions.
+
+INSTRUMENT_HEADERS = [
+    "Instrument",
+    "Sector",
+    "Live Price",
+    "Min Stake",
+    "Margin @ Min",
+    "Notional @ Min",
+    "Weight %",
+    "Margin Tiers",
+    "Currency",
+]
+
+INSTRUMENT_PARSERS = [
+    text,
+    text,
+    number,
+    positive(ticks),
+    positive(pence),
+    positive(pence),
+    positive(bp),
+    optional(parse_tiers, default=()),
+    optional(currency, default=BASE),
+]
+
+# Margin and notional are entered in the instrument's currency and
+# converted to GBP before sizing.
+INSTRUMENT_MONEY_COLS = (4, 5)
+INSTRUMENT_CURRENCY_COL = 8
+
+
+def make_instrument(name, sector, price, min_stake_ticks, margin_min_p, notional_min_p, weight_bp,
+                    margin_tiers=(), currency=BASE):
+    # Takes values already parsed by INSTRUMENT_PARSERS.
+    return {
+        "name": name,
+        "sector": sector,
+        "price": price,
+        "min_stake": from_ticks(min_stake_ticks),
+        "min_stake_ticks": min_stake_ticks,
+        "margin_min_p": margin_min_p,
+        "notional_min_p": notional_min_p,
+        "weight_pct": weight_bp / 100,
+        "weight_bp": weight_bp,
+        "margin_tiers": margin_tiers,
+        "currency": currency,
+        "schedule": MarginSchedule(min_stake_ticks, margin_min_p, margin_tiers),
+    }
+
+
+def build_instrument(*cells):
+    # Accepts strings (from the table) or numbers; raises ValueError on bad
+    # input. Amounts are taken as GBP; tables go through FxTable.to_base.
+    return make_instrument(*validate_row(cells, INSTRUMENT_PARSERS))
+
+
+# --------------------------------------------------
+# Sizing engine (integer pence / stake ticks / basis points)
+# --------------------------------------------------
+# Stakes are whole multiples ("lots") of each instrument's min stake. For a
+# scale k (pence of total notional), leg i holds
+#     lots_i(k) = max(1, floor(k * w_i / W / notional_min_i))
+# and we want the largest k whose total margin fits under the cap. Margin
+# per leg is piecewise linear in lots (one piece per margin tier), so:
+#   1. walk the sorted tier/min-lot breakpoints of the continuous relaxation
+#      to jump straight to the segment where the cap is hit, and solve that
+#      segment linearly for a starting k;
+#   2. from there, step exactly through the next integer k at which any leg
+#      gains a lot (a heap of per-leg next-k events) until the cap binds.
+# Step 2 only ever touches a lot or two per leg, so no bisection is needed.
+
+def _continuous_scale(legs, cap_p):
+    # legs: (a_i lots per pence of k, margin_min_p, schedule)
+    margin = 0.0
+    slope = 0.0
+    events = []
+    for a, margin_min_p, sched in legs:
+        lot = sched.min_stake_ticks
+        per_lot = margin_min_p / BP * a
+        margin += sched.margin(lot)
+        prev = sched.mults[bisect_right(sched.starts, lot) - 1]
+        events.append((1.0 / a, per_lot * prev))
+        for start, mult in zip(sched.starts[1:], sched.mults[1:]):
+            if start > lot:
+                events.append((start / lot / a, per_lot * (mult - prev)))
+                prev = mult
+    events.sort()
+
+    k_prev = 0.0
+    for k, d_slope in events:
+        at_k = margin + slope * (k - k_prev)
+        if at_k > cap_p:
+            break
+        margin, k_prev = at_k, k
+        slope += d_slope
+    return k_prev + (cap_p - margin) / slope if slope > 0 else k_prev
+
+
+def size_deposit_allocation(instruments, target_total_margin):
+    cap_p = to_pence(target_total_margin)
+    weights = [inst["weight_bp"] for inst in instruments]
+    schedules = [inst["schedule"] for inst in instruments]
+    lot_ticks = [inst["min_stake_ticks"] for inst in instruments]
+    lot_notional = [inst["notional_min_p"] for inst in instruments]
+    total_weight = sum(weights)
+
+    result = {
+        "feasible": False,
+        "target_margin_p": cap_p,
+        "min_margin_p": sum(s.margin(t) for s, t in zip(schedules, lot_ticks)),
+        "iterations": 0,
+    }
+    if not instruments or total_weight <= 0:
+        return result
+    if result["min_margin_p"] > cap_p:
+        # Not feasible to hold every leg at min size within cap
+        return result
+
+    n = len(instruments)
+    # lots_i(k) = k * w_i // denom_i
+    denoms = [total_weight * notional for notional in lot_notional]
+
+    def lots_at(k):
+        return [max(1, k * w // d) for w, d in zip(weights, denoms)]
+
+    def margins_for(lots):
+        return [s.margin(q * t) for s, q, t in zip(schedules, lots, lot_ticks)]
+
+    # ---- 1. Jump to the right segment of the relaxation ----
+    legs = [(w / d, inst["margin_min_p"], s) for w, d, inst, s in zip(weights, denoms, instruments, schedules)]
+    k = int(_continuous_scale(legs, cap_p))
+
+    lots = lots_at(k)
+    margins = margins_for(lots)
+    total = sum(margins)
+    iterations = 1
+
+    if total > cap_p:
+        # Float round-off or per-leg pence rounding overshot: bisect back
+        # down (k = 0 is always feasible here).
+        k_lo, k_hi = 0, k
+        while k_hi - k_lo > 1:
+            k_mid = (k_lo + k_hi) // 2
+            if sum(margins_for(lots_at(k_mid))) <= cap_p:
+                k_lo = k_mid
+            else:
+                k_hi = k_mid
+            iterations += 1
+        k = k_lo
+        lots = lots_at(k)
+        margins = margins_for(lots)
+        total = sum(margins)
+
+    # ---- 2. Exact walk over the next lot increments ----
+    def next_k(i):
+        return -(-(lots[i] + 1) * denoms[i] // weights[i])
+
+    heap = [(next_k(i), i) for i in range(n)]
+    heapq.heapify(heap)
+
+    while True:
+        k_next = heap[0][0]
+        group = []
+        while heap and heap[0][0] == k_next:
+            group.append(heapq.heappop(heap)[1])
+
+        new_margins = {i: schedules[i].margin((lots[i] + 1) * lot_ticks[i]) for i in group}
+        new_total = total + sum(m - margins[i] for i, m in new_margins.items())
+        iterations += 1
+        if new_total > cap_p:
+            break
+
+        total = new_total
+        for i, m in new_margins.items():
+            lots[i] += 1
+            margins[i] = m
+            heapq.heappush(heap, (next_k(i), i))
+
+    notionals = [q * notional for q, notional in zip(lots, lot_notional)]
+
+    result.update({
+        "feasible": True,
+        "iterations": iterations,
+        "lots": lots,
+        "stake_ticks": [q * t for q, t in zip(lots, lot_ticks)],
+        "margin_p": margins,
+        "notional_p": notionals,
+        "total_margin_p": total,
+        "total_notional_p": sum(notionals),
+    })
+    return result
+
+
+SUBSET_OBJECTIVES = ["weight", "notional"]
+
+
+def select_affordable_legs(instruments, target_total_margin, objective="weight"):
+    # When the cap cannot hold every leg at min stake, choose the legs that
+    # can be held and cover the most target weight (or min-lot notional).
+    cap_p = to_pence(target_total_margin)
+    costs = [inst["schedule"].margin(inst["min_stake_ticks"]) for inst in instruments]
+    if objective == "notional":
+        values = [inst["notional_min_p"] for inst in instruments]
+    else:
+        values = [inst["weight_bp"] for inst in instruments]
+
+    chosen, value, cost, optimal = best_subset(costs, values, cap_p)
+    total_value = sum(values)
+    return {
+        "indices": chosen,
+        "dropped": [i for i in range(len(instruments)) if i not in set(chosen)],
+        "coverage_pct": value * 100.0 / total_value if total_value else 0.0,
+        "min_margin_p": cost,
+        "optimal": optimal,
+    }
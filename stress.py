@@ -0,0 +1,98 @@
+import csv
+
+import numpy as np
+
+# -----------------------------
+# Price-shock stress testing of spread-bet positions
+# -----------------------------
+# A scenario is one simple return per leg. For a leg with stake s (£/pt)
+# at price p, a return r moves the price by p * r points, so
+#     P&L          = s * p * r
+#     margin after = margin * (1 + r)     (margin is a % of notional, so it
+#                                          scales with price, tiers included)
+# A scenario breaches when equity after the shock falls below
+# call_level * margin after. Everything is one (scenarios x legs) matrix
+# product per chunk.
+
+
+def read_price_matrix(path, names):
+    # CSV with a date column followed by one column per instrument name
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader)]
+        index = {h: i for i, h in enumerate(header)}
+        missing = [n for n in names if n not in index]
+        if missing:
+            raise ValueError(f"No price history for: {', '.join(missing)}")
+        cols = [index[n] for n in names]
+        return np.array([[float(row[c]) for c in cols] for row in reader if row])
+
+
+def historical_scenarios(prices, horizon=1):
+    # Overlapping horizon-day simple returns from a (bars x legs) price matrix
+    prices = np.asarray(prices, dtype=float)
+    if len(prices) <= horizon:
+        raise ValueError("Price history is shorter than the horizon.")
+    return prices[horizon:] / prices[:-horizon] - 1.0
+
+
+def synthetic_scenarios(cov, n_scenarios, horizon=1, dof=None, seed=None):
+    # Correlated shocks from a daily log-return covariance, scaled to the
+    # horizon. dof gives fat-tailed multivariate Student-t shocks.
+    rng = np.random.default_rng(seed)
+    cov = np.asarray(cov, dtype=float) * horizon
+    n = len(cov)
+    try:
+        chol = np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        chol = np.linalg.cholesky(cov + np.eye(n) * max(np.trace(cov) / n, 1e-12) * 1e-8)
+
+    z = rng.standard_normal((n_scenarios, n)) @ chol.T
+    if dof:
+        if dof <= 2:
+            raise ValueError("Student-t shocks need dof > 2.")
+        z *= np.sqrt((dof - 2) / rng.chisquare(dof, size=(n_scenarios, 1)))
+    return np.expm1(z)
+
+
+def stress_test(stakes, prices, margins, balance, scenarios, call_level=1.0, chunk=50_000):
+    # stakes (£/pt, negative = short), prices and margins (£) per leg.
+    # Returns per-scenario P&L and margin-after arrays plus summary stats.
+    exposure = np.asarray(stakes, dtype=float) * np.asarray(prices, dtype=float)
+    margins = np.asarray(margins, dtype=float)
+    margin_now = float(margins.sum())
+    scenarios = np.asarray(scenarios, dtype=float)
+
+    n = len(scenarios)
+    pnl = np.empty(n)
+    margin_after = np.empty(n)
+    for start in range(0, n, chunk):
+        block = scenarios[start:start + chunk]
+        pnl[start:start + chunk] = block @ exposure
+        margin_after[start:start + chunk] = margin_now + block @ margins
+
+    equity_after = balance + pnl
+    breach = equity_after < call_level * margin_after
+    losses = np.sort(-pnl)
+
+    def var(q):
+        return float(losses[min(n - 1, int(q * n))]) if n else 0.0
+
+    tail = losses[int(0.99 * n):] if n else losses
+    headroom = balance - call_level * margin_now
+
+    return {
+        "pnl": pnl,
+        "margin_after": margin_after,
+        "equity_after": equity_after,
+        "breach": breach,
+        "scenarios": n,
+        "breach_probability": float(breach.mean()) if n else 0.0,
+        "expected_pnl": float(pnl.mean()) if n else 0.0,
+        "worst_pnl": float(pnl.min()) if n else 0.0,
+        "var_95": var(0.95),
+        "var_99": var(0.99),
+        "es_99": float(tail.mean()) if len(tail) else 0.0,
+        "headroom": float(headroom),
+        "min_headroom_after": float((equity_after - call_level * margin_after).min()) if n else headroom,
+    }
@@ -0,0 +1,70 @@
+import pytest
+
+import backtest
+from backtest import read_monthly_prices, run_policy
+from money import PRICE_UNITS
+
+
+def write(tmp_path, text):
+    path = tmp_path / "prices.csv"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_read_monthly_prices_keeps_sub_penny_prices_and_carries_blanks(tmp_path):
+    path = write(tmp_path, "date,A,B\n"
+                 "2026-01-02,0.8734,\n"
+                 "2026-01-15,0.9000,5\n"
+                 "2026-02-02,,5.25\n"
+                 "2026-03-02,0.9,\n")
+
+    months, prices = read_monthly_prices(path, ["A", "B"])
+
+    assert months == ["2026-01", "2026-02", "2026-03"]
+    assert prices == [
+        [873_400, 0],                           # B has no price yet
+        [873_400, 5_250_000],                   # A carried forward
+        [900_000, 5_250_000],
+    ]
+
+
+@pytest.mark.parametrize("text", ["", "date,A\n"])
+def test_read_monthly_prices_needs_data_rows(tmp_path, text):
+    with pytest.raises(ValueError):
+        read_monthly_prices(write(tmp_path, text), ["A"])
+
+
+def test_main_reports_a_price_file_without_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr("sys.argv", ["backtest.py", write(tmp_path, "date,A\n"), "--weights", "A=100"])
+    with pytest.raises(SystemExit) as exit_info:
+        backtest.main()
+    assert exit_info.value.code == 2
+
+
+def test_run_policy_books_fees_and_costs():
+    prices = [[10 * PRICE_UNITS, 20 * PRICE_UNITS]] * 3
+    result = run_policy(prices, ["A", "B"], [5_000, 5_000], 10_000, 0, "cashflow", fee_p=150, cost_bp=10)
+
+    # £100 a month into £10 / £20 funds at unchanged prices: nothing is
+    # lost but the fees and the 10 bp cost on what was traded.
+    invested = 3 * 100
+    assert result["orders"] > 0
+    assert result["cost"] > result["orders"] * 1.5
+    assert result["final_value"] == pytest.approx(invested - result["cost"], abs=0.01)
+
+
+def test_run_policy_fund_without_history_is_not_bought():
+    prices = [[10 * PRICE_UNITS, 0], [10 * PRICE_UNITS, 0]]
+    result = run_policy(prices, ["A", "B"], [5_000, 5_000], 10_000, 0, "cashflow")
+
+    assert result["final_value"] == pytest.approx(200)
+
+
+def test_full_rebalance_skips_when_fees_exceed_the_portfolio():
+    # The first month buys ~£21 of funds with £40 fees; rebalancing after
+    # that would cost more in fees than the whole portfolio is worth.
+    prices = [[PRICE_UNITS // 2, PRICE_UNITS // 2]] * 3
+    result = run_policy(prices, ["A", "B"], [5_000, 5_000], 100, 10_000, "calendar", 1, fee_p=4_000)
+
+    assert result["orders"] == 2
+    assert result["final_value"] == pytest.approx(100 + 3 - result["cost"], abs=0.01)
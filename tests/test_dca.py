@@ -0,0 +1,77 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import dca
+
+
+def write_account(directory, name, holdings, cash="0", monthly="200"):
+    path = directory / f"{name}.json"
+    path.write_text(json.dumps({"cash": cash, "monthly": monthly, "holdings": holdings}), encoding="utf-8")
+    return path
+
+
+def run(monkeypatch, *args):
+    monkeypatch.setattr("sys.argv", ["dca.py", *map(str, args)])
+    with pytest.raises(SystemExit) as exit_info:
+        dca.main()
+    return exit_info.value.code
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+@pytest.fixture
+def book(tmp_path):
+    accounts = tmp_path / "accounts"
+    accounts.mkdir()
+    prices = tmp_path / "prices.csv"
+    prices.write_text("instrument,price\nA,10\nB,20\n", encoding="utf-8")
+    return accounts, prices, tmp_path / "out"
+
+
+def test_same_month_rerun_keeps_earlier_orders(monkeypatch, book):
+    accounts, prices, out = book
+    write_account(accounts, "jane", [{"name": "A", "price": "1", "shares": 0, "weight_pct": "100"}])
+    bad = write_account(accounts, "joe", [{"name": "B", "price": "1", "shares": 0, "weight_pct": "x"}])
+
+    assert run(monkeypatch, accounts, "--prices", prices, "--out", out, "--month", "2026-10",
+               "--update", "--workers", "1") == 1
+    first = read_csv(out / "orders-2026-10.csv")
+    assert first == [dca.ORDER_HEADER, ["jane", "A", "20", "10.0", "200.00"]]
+    assert json.loads((accounts / "jane.json").read_text())["last_run"] == "2026-10"
+
+    # Fix the bad account and re-run: jane is skipped, joe's orders are added.
+    write_account(accounts, "joe", [{"name": "B", "price": "1", "shares": 0, "weight_pct": "100"}])
+    assert bad.exists()
+    assert run(monkeypatch, accounts, "--prices", prices, "--out", out, "--month", "2026-10",
+               "--update", "--workers", "1") == 0
+
+    assert read_csv(out / "orders-2026-10.csv") == first + [["joe", "B", "10", "20.0", "200.00"]]
+    statuses = [(r[0], r[1]) for r in read_csv(out / "report-2026-10.csv")[1:]]
+    assert statuses == [("jane", "ok"), ("joe", "error"), ("jane", "skipped"), ("joe", "ok")]
+
+
+def test_run_account_reports_unexpected_errors(monkeypatch, book):
+    accounts, prices, _ = book
+    path = write_account(accounts, "jane", [{"name": "A", "price": "1", "shares": 0, "weight_pct": "100"}])
+
+    def fail(account):
+        raise KeyError("boom")
+
+    monkeypatch.setattr(dca, "solve_shares", fail)
+    report, orders, update = dca.run_account(str(path), {"A": "10"}, "2026-10", update=True)
+
+    assert report["status"] == "error" and "KeyError" in report["message"]
+    assert orders == [] and update is None
+
+
+def test_headless_tools_import_without_tk():
+    code = "import sys; sys.modules['tkinter'] = None; import backtest, dca, service"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(dca.__file__))
@@ -0,0 +1,64 @@
+import os
+
+from fx import FxTable
+
+
+def table(tmp_path, text):
+    path = tmp_path / "fx_rates.csv"
+    path.write_text(text, encoding="utf-8")
+    return FxTable(str(path)), path
+
+
+def test_to_base_converts_money_columns_to_pence(tmp_path):
+    fx, _ = table(tmp_path, "currency,rate\nUSD,0.79\nEUR,0.8512\n")
+    columns = [["A", "B", "C", "D"], [10_000, 10_000, 333, None], ["USD", "GBP", "EUR", "USD"]]
+
+    assert fx.to_base(columns, 2, [1]) == []
+    assert columns[1] == [7_900, 10_000, 283, None]
+
+
+def test_to_base_memoises_until_the_file_changes(tmp_path):
+    fx, path = table(tmp_path, "USD,0.5\n")
+    columns = [[100, 100], ["USD", "USD"]]
+    fx.to_base(columns, 1, [0])
+    assert (fx.hits, fx.misses) == (1, 1)
+
+    path.write_text("USD,0.25\n", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    columns = [[100], ["USD"]]
+    fx.to_base(columns, 1, [0])
+    assert columns[0] == [25]
+    assert fx.version == 2
+
+
+def test_to_base_flags_currencies_without_a_rate(tmp_path):
+    fx, _ = table(tmp_path, "USD,0.79\n")
+    columns = [[100, 100], ["JPY", "USD"]]
+
+    errors = fx.to_base(columns, 1, [0])
+
+    assert [(e.row, e.col) for e in errors] == [(0, 1)]
+    assert "JPY" in errors[0].message
+    assert columns[0] == [100, 79]
+
+
+def test_missing_file_means_gbp_only(tmp_path):
+    fx = FxTable(str(tmp_path / "absent.csv"))
+    columns = [[100, 100], ["GBP", "USD"]]
+
+    errors = fx.to_base(columns, 1, [0])
+
+    assert [e.row for e in errors] == [1]
+    assert columns[0] == [100, 100]
+
+
+def test_invalid_file_is_reported_on_foreign_rows_only(tmp_path):
+    fx, _ = table(tmp_path, "USD,abc\n")
+    columns = [[100, 100], ["GBP", "USD"]]
+
+    errors = fx.to_base(columns, 1, [0])
+
+    assert [e.row for e in errors] == [1]
+    assert errors[0].message.startswith("FX rates file invalid:")
+    assert columns[0] == [100, 100]
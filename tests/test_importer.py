@@ -0,0 +1,70 @@
+import pytest
+
+from importer import read_holdings, read_latest_prices
+
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_read_holdings_maps_headers_and_sums_lots(tmp_path):
+    path = write(tmp_path / "export.csv", "\ufeffSymbol,Qty,Last Price,Target Weight (%),CCY\n"
+                 "VUSA,10,\"£1,020.50\",42%,usd\n"
+                 "VUSA,2.5,1021,,\n"
+                 "ISF,100,7.9,58,\n"
+                 ",5,1,1,\n")
+
+    assert read_holdings(path) == {
+        "VUSA": {"shares": "12.5", "price": "1021", "weight": "42", "currency": "USD"},
+        "ISF": {"shares": "100", "price": "7.9", "weight": "58"},
+    }
+
+
+def test_read_holdings_reports_the_bad_line(tmp_path):
+    path = write(tmp_path / "export.csv", "Name,Shares,Price\nA,1,2\nB,one,2\n")
+
+    with pytest.raises(ValueError, match="line 3"):
+        read_holdings(path)
+
+
+@pytest.mark.parametrize("text", ["", "Shares,Price\n1,2\n"])
+def test_read_holdings_needs_an_instrument_column(tmp_path, text):
+    with pytest.raises(ValueError):
+        read_holdings(write(tmp_path / "export.csv", text))
+
+
+def test_read_latest_prices_long_keeps_last_price(tmp_path):
+    path = write(tmp_path / "prices.csv", "date,instrument,close\n"
+                 "2026-09-30,A,10\n2026-09-30,B,20\n2026-10-01,A,11\n2026-10-01,B,\n")
+
+    assert read_latest_prices(path) == {"A": "11", "B": "20"}
+    assert read_latest_prices(path, names=["B"]) == {"B": "20"}
+
+
+def test_read_latest_prices_wide_keeps_last_filled_cell(tmp_path):
+    path = write(tmp_path / "prices.csv", "date,A,B\n2026-09-30,10,20\n2026-10-01,11,\n")
+
+    assert read_latest_prices(path) == {"A": "11", "B": "20"}
+    with pytest.raises(ValueError):
+        read_latest_prices(path, names=["C"])
+
+
+def test_read_latest_prices_long_uses_the_latest_date_not_the_last_line(tmp_path):
+    path = write(tmp_path / "prices.csv", "instrument,price,date\n"
+                 "A,11,2026-10-02\nA,9,2026-10-01\nB,5,01/10/2026\nB,6,02/10/2026\nB,7,2026-10-02\nC,3,2026-10\nC,2,2026-09\n")
+
+    assert read_latest_prices(path) == {"A": "11", "B": "7", "C": "3"}
+
+
+def test_read_latest_prices_wide_uses_the_latest_date(tmp_path):
+    path = write(tmp_path / "prices.csv", "Date,A,B\n2026-10-02,11,\n2026-10-01,9,20\n")
+
+    assert read_latest_prices(path) == {"A": "11", "B": "20"}
+
+
+def test_read_latest_prices_reports_a_bad_date(tmp_path):
+    path = write(tmp_path / "prices.csv", "instrument,price,date\nA,11,2026-10-02\nA,9,yesterday\n")
+
+    with pytest.raises(ValueError, match="line 3"):
+        read_latest_prices(path)
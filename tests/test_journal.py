@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from journal import KIND_SHARES, KIND_SPREADBET, RECORD_SIZE, TradeJournal
+
+pytest.importorskip("numpy")
+
+JAN = 1_704_067_200  # 2024-01-01 00:00 UTC
+FEB = 1_706_745_600  # 2024-02-01 00:00 UTC
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return TradeJournal(str(tmp_path / "journal.bin"))
+
+
+def test_append_writes_fixed_records_and_names(journal):
+    assert journal.append("ISA", KIND_SHARES, [("Fund A", 3, 1_500_000, 0), ("Fund B", 1, 250_000, 0)], ts=JAN) == 2
+    assert len(journal) == 2
+    assert len(open(journal.path, "rb").read()) == 2 * RECORD_SIZE
+
+    reopened = TradeJournal(journal.path)
+    assert reopened.names == ["ISA", "Fund A", "Fund B"]
+    assert reopened.contributions_by_instrument() == {"Fund A": 4.5, "Fund B": 0.25}
+
+
+def test_contributions_keep_sub_penny_prices(journal):
+    journal.append("ISA", KIND_SHARES, [("Cheap Fund", 1144, 873_400, 0)], ts=JAN)
+    assert journal.contributions_by_instrument() == {"Cheap Fund": pytest.approx(999.1696)}
+
+
+def test_contributions_filter_by_account_and_time(journal):
+    journal.append("ISA", KIND_SHARES, [("Fund A", 2, 1_000_000, 0)], ts=JAN)
+    journal.append("ISA", KIND_SHARES, [("Fund A", 5, 1_000_000, 0)], ts=FEB)
+    journal.append("SIPP", KIND_SHARES, [("Fund A", 7, 1_000_000, 0)], ts=FEB)
+    journal.append("ISA", KIND_SPREADBET, [("FTSE", 10_000, 8_000_000_000, 40_000)], ts=FEB)
+
+    assert journal.contributions_by_instrument() == {"Fund A": 14.0}
+    assert journal.contributions_by_instrument(account="ISA") == {"Fund A": 7.0}
+    assert journal.contributions_by_instrument(account="ISA", since=FEB) == {"Fund A": 5.0}
+    assert journal.contributions_by_instrument(account="ISA", until=FEB) == {"Fund A": 2.0}
+    assert journal.contributions_by_instrument(account="Unknown") == {}
+
+
+def test_average_margin_sums_legs_per_plan_then_averages_per_month(journal):
+    journal.append("SB", KIND_SPREADBET, [("FTSE", 1, 8_000_000_000, 10_000), ("DAX", 1, 17_000_000_000, 5_000)], ts=JAN)
+    journal.append("SB", KIND_SPREADBET, [("FTSE", 1, 8_000_000_000, 25_000)], ts=JAN + 60)
+    journal.append("SB", KIND_SPREADBET, [("FTSE", 1, 8_000_000_000, 12_345)], ts=FEB)
+    journal.append("ISA", KIND_SHARES, [("Fund A", 2, 1_000_000, 0)], ts=FEB)
+
+    months = journal.average_margin_by_month()
+    assert months == [("2024-01", 200.0), ("2024-02", 123.45)]
+    assert all(type(avg) is float for _, avg in months)
+    json.dumps(months)
+
+
+def test_queries_on_a_missing_journal_are_empty(journal):
+    assert len(journal) == 0
+    assert journal.contributions_by_instrument() == {}
+    assert journal.average_margin_by_month() == []
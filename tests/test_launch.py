@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import launch
+
+
+class Event:
+    def __init__(self, widget):
+        self.widget = widget
+
+
+class Root:
+    # Runs idle callbacks in passes, as Tk does: ones queued during a pass
+    # wait for the next.
+    def __init__(self):
+        self.idle = []
+        self.bindings = {}
+        self.destroyed = False
+
+    def after_idle(self, fn):
+        self.idle.append(fn)
+
+    def run_idle_pass(self):
+        pending, self.idle = self.idle, []
+        for fn in pending:
+            fn()
+
+    def bind(self, sequence, fn, add=None):
+        self.bindings.setdefault(sequence, []).append(fn)
+
+    def map(self, widget=None):
+        for fn in self.bindings.get("<Map>", []):
+            fn(Event(widget or self))
+
+    def destroy(self):
+        self.destroyed = True
+
+
+def test_after_first_frame_waits_for_the_second_idle_pass():
+    root = Root()
+    calls = []
+    launch.after_first_frame(root, lambda: calls.append(1))
+    root.run_idle_pass()
+    assert calls == []
+    root.run_idle_pass()
+    assert calls == [1]
+
+
+def test_measure_launch_is_off_by_default(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["shares.py"])
+    monkeypatch.delenv("REBAL_LAUNCH_TIMING", raising=False)
+    root = Root()
+    launch.measure_launch(root, "shares")
+    assert root.bindings == {}
+
+
+@pytest.mark.parametrize("flag, env, exits", [
+    ("--measure-launch", None, True),
+    (None, "1", False),
+])
+def test_measure_launch_reports_the_first_frame_once(monkeypatch, capsys, flag, env, exits):
+    monkeypatch.setattr(sys, "argv", ["risk.py"] + ([flag] if flag else []))
+    if env:
+        monkeypatch.setenv("REBAL_LAUNCH_TIMING", env)
+    else:
+        monkeypatch.delenv("REBAL_LAUNCH_TIMING", raising=False)
+    root = Root()
+    launch.measure_launch(root, "risk")
+
+    root.map(widget=object())   # a child window mapping does not count
+    root.run_idle_pass()
+    assert root.idle == []
+
+    root.map()
+    root.map()
+    root.run_idle_pass()
+    root.run_idle_pass()
+    err = capsys.readouterr().err
+    assert err.count("risk: first frame after") == 1
+    assert root.destroyed is exits
+
+
+def test_process_age_is_never_negative():
+    assert launch._process_age() >= 0.0
+
+
+@pytest.mark.parametrize("module", ["shares", "spreadbet", "risk"])
+def test_apps_start_without_numpy(module):
+    # NumPy is imported on first use (journal queries, risk parity, stress)
+    code = f"import sys, {module}; sys.exit('numpy' in sys.modules)"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(launch.__file__))
@@ -0,0 +1,80 @@
+import random
+from itertools import combinations
+
+import pytest
+
+from leg_selection import best_subset
+from spreadbet_engine import build_instrument, select_affordable_legs
+
+
+def brute_force_subset(costs, values, capacity):
+    best = (0, 0, ())
+    for r in range(len(costs) + 1):
+        for combo in combinations(range(len(costs)), r):
+            cost = sum(costs[i] for i in combo)
+            value = sum(values[i] for i in combo)
+            if cost <= capacity and (value > best[0] or (value == best[0] and cost < best[1])):
+                best = (value, cost, combo)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_best_subset_matches_brute_force(seed):
+    rng = random.Random(seed)
+    n = rng.randint(0, 12)
+    costs = [rng.randint(1, 500) for _ in range(n)]
+    values = [rng.randint(0, 300) for _ in range(n)]
+    capacity = rng.randint(0, sum(costs) + 1)
+
+    chosen, value, cost, optimal = best_subset(costs, values, capacity)
+    best_value, best_cost, _ = brute_force_subset(costs, values, capacity)
+
+    assert optimal
+    assert (value, cost) == (best_value, best_cost)
+    assert sum(values[i] for i in chosen) == value
+    assert sum(costs[i] for i in chosen) == cost <= capacity
+    assert chosen == sorted(set(chosen))
+
+
+def test_best_subset_node_budget_returns_feasible_incumbent():
+    rng = random.Random(7)
+    costs = [rng.randint(100, 200) for _ in range(60)]
+    values = [c + rng.randint(-5, 5) for c in costs]
+
+    chosen, value, cost, optimal = best_subset(costs, values, sum(costs) // 2, max_nodes=10)
+
+    assert not optimal
+    assert cost == sum(costs[i] for i in chosen) <= sum(costs) // 2
+    assert value == sum(values[i] for i in chosen)
+
+
+def legs():
+    # Margin at min stake: £300, £200, £150, £100; weights 40/30/20/10
+    return [
+        build_instrument("US 500", "Index", "5000", "1", "300", "5000", "40"),
+        build_instrument("Gold", "Commodity", "2000", "1", "200", "2000", "30"),
+        build_instrument("Gilts", "Bond", "100", "1", "150", "9000", "20"),
+        build_instrument("Oil", "Commodity", "80", "1", "100", "800", "10"),
+    ]
+
+
+def test_affordable_legs_cover_the_most_weight():
+    # £400 holds US 500 + Oil (50%) or Gold + Oil (40%) or Gold + Gilts (50%, £350)
+    result = select_affordable_legs(legs(), 400)
+    assert result["optimal"]
+    assert result["coverage_pct"] == 50.0
+    assert result["indices"] == [1, 2]
+    assert result["dropped"] == [0, 3]
+    assert result["min_margin_p"] == 35_000
+
+
+def test_affordable_legs_by_notional():
+    result = select_affordable_legs(legs(), 400, objective="notional")
+    assert result["indices"] == [1, 2]
+    assert result["coverage_pct"] == pytest.approx(11_000 * 100 / 16_800)
+
+
+def test_no_leg_fits():
+    result = select_affordable_legs(legs(), 50)
+    assert result["indices"] == []
+    assert result["coverage_pct"] == 0.0
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from margin_tiers import MarginSchedule, format_tiers, parse_tiers
+
+
+def random_schedule(rng):
+    tiers = []
+    start = 0
+    for _ in range(rng.randint(0, 4)):
+        start += rng.randint(1, 500_000)
+        tiers.append((start, rng.randint(1, 60_000)))
+    return MarginSchedule(rng.randint(1, 50_000), rng.randint(1, 100_000), tiers)
+
+
+def test_parse_tiers_text_and_pairs_agree():
+    assert parse_tiers("200:3, 50:1.5") == parse_tiers([[50, 1.5], [200, 3]]) == (
+        (500_000, 15_000), (2_000_000, 30_000),
+    )
+    assert format_tiers(parse_tiers("50:1.5; 200:3")) == "50:1.5, 200:3"
+    assert parse_tiers("") == ()
+
+
+@pytest.mark.parametrize("cell", ["50", "0:2", "50:0", "x:2", "50:1.5, 50:2", [5], [[1, 2, 3]], [["a", 2]]])
+def test_parse_tiers_rejects_bad_cells(cell):
+    with pytest.raises(ValueError):
+        parse_tiers(cell)
+
+
+def test_untiered_margin_is_linear_in_stake():
+    sched = MarginSchedule(5_000, 1_250)        # 0.5 £/pt costs £12.50
+    assert sched.margin(5_000) == 1_250
+    assert sched.margin(20_000) == 5_000
+    assert sched.margin(0) == 0
+
+
+def test_bands_apply_above_their_start():
+    # 1 £/pt costs £10; above 2 £/pt 2x, above 3 £/pt 3x
+    sched = MarginSchedule(10_000, 1_000, parse_tiers("2:2, 3:3"))
+    assert sched.margin(20_000) == 2_000
+    assert sched.margin(30_000) == 2_000 + 2_000
+    assert sched.margin(40_000) == 2_000 + 2_000 + 3_000
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_margin_is_monotone_and_max_ticks_is_exact(seed):
+    rng = random.Random(seed)
+    sched = random_schedule(rng)
+    ticks = sorted(rng.randint(0, 3_000_000) for _ in range(20))
+    margins = [sched.margin(t) for t in ticks]
+    assert margins == sorted(margins)
+
+    for _ in range(20):
+        budget = rng.randint(0, max(margins[-1], 1))
+        t = sched.max_ticks(budget)
+        assert sched.margin(t) <= budget < sched.margin(t + 1)
+
+
+def test_max_ticks_of_negative_budget_is_zero():
+    assert MarginSchedule(10_000, 1_000).max_ticks(-1) == 0
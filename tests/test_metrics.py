@@ -0,0 +1,110 @@
+import os
+import threading
+
+import pytest
+
+import metrics
+from risk_engine import build_leg, size_risk_dial
+from sessions import record
+from shares_engine import build_holding, plan_dca_buys
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # Metrics created in a test render on their own
+    monkeypatch.setattr(metrics, "_REGISTRY", [])
+
+
+def test_counter_renders_sorted_labelled_samples(registry):
+    c = metrics.Counter("x_total", "Things.", ("path", "status"))
+    c.inc("/risk", 200)
+    c.inc("/risk", 200, amount=2)
+    c.inc('/a"b\\c\n', 400)
+    assert metrics.render() == (
+        "# HELP x_total Things.\n"
+        "# TYPE x_total counter\n"
+        'x_total{path="/a\\"b\\\\c\\n",status="400"} 1\n'
+        'x_total{path="/risk",status="200"} 3\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive(registry):
+    h = metrics.Histogram("y_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        h.observe(value)
+    assert h.render()[2:] == [
+        'y_seconds_bucket{le="0.1"} 2',
+        'y_seconds_bucket{le="1.0"} 3',
+        'y_seconds_bucket{le="+Inf"} 4',
+        "y_seconds_sum 3.65",
+        "y_seconds_count 4",
+    ]
+
+
+def test_unused_metrics_are_not_rendered(registry):
+    metrics.Counter("z_total", "Unused.")
+    assert metrics.render() == "\n"
+
+
+def test_updates_from_many_threads_are_not_lost(registry):
+    c = metrics.Counter("t_total", "Threads.")
+    h = metrics.Histogram("t_seconds", "Threads.")
+
+    def work():
+        for _ in range(2_000):
+            c.inc()
+            h.observe(0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert c.values[()] == 16_000
+    assert h.render()[-1] == "t_seconds_count 16000"
+
+
+def iteration_count(solver):
+    v = metrics.SOLVER_ITERATIONS.values.get((solver,))
+    return sum(v[:-1]) if v else 0
+
+
+def test_engine_calls_report_latency_and_iterations():
+    legs = [build_leg("US 500", "equity", "5000", "0.5", "125", "2500")]
+    iterations = iteration_count("risk.size_risk_dial")
+    calls = sum(metrics.SOLVER_SECONDS.values.get(("risk.size_risk_dial",), [0])[:-1])
+    record("risk.size_risk_dial", size_risk_dial, legs, 1_000)
+    assert iteration_count("risk.size_risk_dial") == iterations + 1
+    assert sum(metrics.SOLVER_SECONDS.values[("risk.size_risk_dial",)][:-1]) == calls + 1
+
+
+def test_planners_report_iterations_from_inside_the_engine():
+    holdings = [build_holding("World", "10", "60", "50"), build_holding("Bonds", "5", "60", "50")]
+    before = iteration_count("shares.plan_dca_buys")
+    plan_dca_buys(holdings, 90_000, 50_000)
+    assert iteration_count("shares.plan_dca_buys") == before + 1
+
+
+def test_cache_lookups_count_hits_and_misses():
+    hits = metrics.CACHE_LOOKUPS.values.get(("test", "hit"), 0)
+    metrics.cache_lookups("test", 2, 0)
+    metrics.cache_lookups("test", 0, 1)
+    assert metrics.CACHE_LOOKUPS.values[("test", "hit")] == hits + 2
+    assert metrics.CACHE_LOOKUPS.values[("test", "miss")] >= 1
+    assert 'rebal_cache_lookups_total{cache="test",result="hit"}' in metrics.render()
+
+
+def test_write_textfile_replaces_the_file(registry, tmp_path):
+    path = str(tmp_path / "rebal.prom")
+    metrics.Counter("w_total", "Writes.").inc()
+    metrics.write_textfile(path)
+    metrics.write_textfile(path)
+    assert open(path, encoding="utf-8").read().endswith("w_total 1\n")
+    assert os.listdir(tmp_path) == ["rebal.prom"]
+
+
+def test_write_textfile_without_a_path_does_nothing(monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "METRICS_PATH", None)
+    monkeypatch.chdir(tmp_path)
+    metrics.write_textfile()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,162 @@
+import pytest
+
+from risk import MONITOR_POLL_MS, MarginMonitor, PortfolioPositionSizerDynamic
+from risk_engine import make_leg
+
+
+def legs():
+    # 1 £/pt of US 500 costs £250 margin on £5,000 notional; Gold sits at its min stake
+    return [
+        make_leg("US 500", "equity", 5000, 10_000, 25_000, 500_000),
+        make_leg("Gold", "gold", 2000, 10_000, 10_000, 200_000),
+    ]
+
+
+@pytest.fixture
+def monitor():
+    # 2 £/pt US 500 + 1 £/pt Gold on a £10,000 account targeting 10% margin
+    return MarginMonitor(legs(), [20_000, 10_000], 1_000_000, 1_000, equity_idx=0)
+
+
+def test_monitor_starts_from_the_placed_stakes(monitor):
+    assert monitor.margin_p == [50_000, 10_000]
+    assert monitor.total_margin_p == 60_000
+    assert monitor.equity_p == 1_000_000
+    assert monitor.headroom_p == 40_000
+    # £900 of room for the equity leg at £250 per £/pt
+    assert monitor.suggestion() == (36_000, 16_000)
+
+
+def test_price_ticks_rescale_margin_and_pnl_of_one_leg(monitor):
+    monitor.update_price(0, "5500")
+    assert monitor.margin_p == [55_000, 10_000]
+    assert monitor.pnl_p == [100_000, 0]            # 2 £/pt x 500 points
+    assert monitor.target_margin_p == 110_000
+    assert monitor.headroom_p == 45_000
+    # Budget is rescaled back to the sizing price before inverting the schedule
+    assert monitor.suggestion() == (36_363, 16_363)
+
+    monitor.update_price(1, 2200)
+    assert monitor.total_margin_p == 66_000
+    assert monitor.total_pnl_p == 120_000
+    assert monitor.suggestion() == (36_727, 16_727)
+    assert monitor.updates == 2
+
+
+def test_totals_depend_on_the_last_price_not_the_path(monitor):
+    for price in ["5100", "4800.5", "5000", "6123.25"]:
+        monitor.update_price(0, price)
+    direct = MarginMonitor(legs(), [20_000, 10_000], 1_000_000, 1_000, equity_idx=0)
+    direct.update_price(0, "6123.25")
+    assert monitor.total_margin_p == direct.total_margin_p == 61_233 + 10_000
+    assert monitor.total_pnl_p == direct.total_pnl_p == 224_650
+
+
+def test_placing_the_suggestion_realises_pnl_and_closes_headroom(monitor):
+    monitor.update_price(0, 5500)
+    monitor.update_price(1, 2200)
+    ticks, _ = monitor.suggestion()
+    monitor.set_stake(0, ticks)
+
+    assert monitor.balance_p == 1_100_000
+    assert monitor.pnl_p == [0, 20_000]
+    assert monitor.equity_p == 1_120_000
+    assert monitor.headroom_p == 0
+    assert monitor.suggestion() == (ticks, 0)
+
+    monitor.update_price(0, 5600)
+    assert monitor.pnl_p[0] == ticks                # new stake x 100 points from the 5500 entry
+
+
+def test_no_equity_leg_means_no_suggestion():
+    monitor = MarginMonitor(legs(), [20_000, 10_000], 1_000_000, 1_000)
+    assert monitor.suggestion() is None
+
+
+@pytest.mark.parametrize("price", ["0", "-5", "abc"])
+def test_bad_prices_are_rejected_without_changing_totals(monitor, price):
+    with pytest.raises(ValueError):
+        monitor.update_price(0, price)
+    assert monitor.total_margin_p == 60_000
+    assert monitor.updates == 0
+
+
+class Label:
+    text = ""
+
+    def config(self, text):
+        self.text = text
+
+
+class Root:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, fn):
+        self.scheduled.append((ms, fn))
+        return len(self.scheduled)
+
+
+class Entry:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def polling_app(monitor, feed_path):
+    # The risk window's monitor state without the Tk widgets
+    app = PortfolioPositionSizerDynamic.__new__(PortfolioPositionSizerDynamic)
+    app.root = Root()
+    app.monitor = monitor
+    app.monitor_label = Label()
+    app.entry_feed = Entry(str(feed_path))
+    app._feed_path = None
+    app._poll_id = None
+    return app
+
+
+def test_feed_reads_appended_rows_only(monitor, tmp_path):
+    feed = tmp_path / "prices.csv"
+    feed.write_text("time,US 500,Gold\n1,5100,\n2,5500,22", encoding="utf-8")
+    app = polling_app(monitor, feed)
+
+    app._poll_feed()
+    assert monitor.price[0] == 5100 * 10 ** 6      # the half-written last line waits
+    assert monitor.updates == 1
+    assert app.monitor_label.text.startswith("Equity £")
+
+    with open(feed, "a", encoding="utf-8") as f:
+        f.write("00\n")
+    app._poll_feed()
+    assert monitor.price == [5500 * 10 ** 6, 2200 * 10 ** 6]
+    assert monitor.updates == 3
+    assert app.root.scheduled[-1] == (MONITOR_POLL_MS, app._poll_feed)
+
+
+@pytest.mark.parametrize("bad_row, message", [
+    ("9" * 200_000, "field larger"),        # csv.Error
+    ("abc", "Price feed"),
+])
+def test_bad_feed_is_reported_and_polling_continues(monitor, tmp_path, bad_row, message):
+    feed = tmp_path / "prices.csv"
+    feed.write_text(f"US 500\n{bad_row}\n", encoding="utf-8")
+    app = polling_app(monitor, feed)
+
+    app._poll_feed()
+    assert message in app.monitor_label.text
+    assert app.root.scheduled == [(MONITOR_POLL_MS, app._poll_feed)]
+
+    with open(feed, "a", encoding="utf-8") as f:
+        f.write("5500\n")
+    app._poll_feed()
+    assert monitor.price[0] == 5500 * 10 ** 6
+    assert len(app.root.scheduled) == 2
+
+
+def test_missing_feed_is_reported(monitor, tmp_path):
+    app = polling_app(monitor, tmp_path / "missing.csv")
+    app._poll_feed()
+    assert app.monitor_label.text.startswith("Price feed:")
+    assert len(app.root.scheduled) == 1
@@ -0,0 +1,42 @@
+import pytest
+
+from risk_engine import build_leg, size_risk_dial
+
+
+def book(equity_tiers=""):
+    return [
+        build_leg("US 500", "equity", "5000", "0.5", "125", "2500", "", equity_tiers),
+        build_leg("Gold", "gold", "2000", "1", "100", "2000"),
+        build_leg("Gilts", "bonds", "100", "2", "40", "200"),
+    ]
+
+
+def test_risk_dial_holds_fixed_legs_at_min_stake():
+    result = size_risk_dial(book(), 1_000)
+    assert result["equity_idx"] == 0
+    assert result["stake_ticks"][1:] == [10_000, 20_000]
+    assert result["margin_p"][1:] == [10_000, 4_000]
+    # £860 left at £250 per £/pt
+    assert result["stake_ticks"][0] == 34_400
+    assert result["total_margin_p"] == 100_000
+
+
+@pytest.mark.parametrize("target", ["140", "1000", "2500.37", "40000"])
+def test_risk_dial_inverts_tiered_equity_margin_exactly(target):
+    instruments = book("2:400, 10:1000")
+    result = size_risk_dial(instruments, target)
+    eq = instruments[0]
+    ticks = result["stake_ticks"][0]
+    cap_p = result["target_margin_p"]
+    fixed_p = sum(result["margin_p"][1:])
+
+    assert result["margin_p"][0] == eq["schedule"].margin(ticks)
+    if ticks > eq["min_stake_ticks"]:
+        assert fixed_p + eq["schedule"].margin(ticks) <= cap_p
+        assert fixed_p + eq["schedule"].margin(ticks + 1) > cap_p
+    else:
+        assert fixed_p + eq["schedule"].margin(ticks + 1) > cap_p
+
+
+def test_risk_dial_needs_an_equity_leg():
+    assert size_risk_dial(book()[1:], 1_000) is None
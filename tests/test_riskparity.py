@@ -0,0 +1,131 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from riskparity import EwmaCovariance, PriceHistory, risk_parity_weights, size_risk_parity  # noqa: E402
+from risk_engine import build_leg  # noqa: E402
+
+
+def random_prices(seed, bars=120, n=3):
+    rng = np.random.default_rng(seed)
+    vols = rng.uniform(0.005, 0.03, n)
+    returns = rng.normal(0, 1, (bars, n)) * vols
+    if n > 1:
+        returns[:, 1] += 0.5 * returns[:, 0]
+    return 100 * np.exp(np.cumsum(returns, axis=0))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_weights_equalise_risk_contributions(seed):
+    model = EwmaCovariance(["a", "b", "c"])
+    model.seed(random_prices(seed))
+    w = model.weights()
+    assert w.sum() == pytest.approx(1)
+    assert np.all(w > 0)
+    assert model.risk_contributions(w) == pytest.approx(np.full(3, 1 / 3), abs=1e-8)
+
+
+def test_uncorrelated_weights_are_inverse_vol():
+    cov = np.diag([0.04, 0.01, 0.0025])
+    assert risk_parity_weights(cov) == pytest.approx(np.array([1, 2, 4]) / 7)
+
+
+def test_seed_matches_bar_by_bar_updates():
+    prices = random_prices(1, bars=40)
+    batch = EwmaCovariance(["a", "b", "c"])
+    batch.seed(prices)
+    stepped = EwmaCovariance(["a", "b", "c"])
+    for bar in prices:
+        stepped.update(bar)
+    assert batch.bars == stepped.bars == 39
+    assert batch.cov == pytest.approx(stepped.cov, rel=1e-9)
+
+
+def test_weights_are_cached_until_a_new_bar():
+    prices = random_prices(2)
+    model = EwmaCovariance(["a", "b", "c"])
+    model.seed(prices[:-1])
+    first = model.weights()
+    assert model.weights() is first
+    model.update(prices[-1])
+    assert model.weights() is not first
+
+
+def write_history(path, names, prices):
+    lines = ["date," + ",".join(names)]
+    lines += [f"2024-01-{i + 1:02d}," + ",".join(f"{p:.6f}" for p in row) for i, row in enumerate(prices)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def test_price_history_feeds_only_new_bars(tmp_path):
+    prices = random_prices(3, bars=20)
+    path = tmp_path / "history.csv"
+    write_history(path, ["a", "b", "c"], prices[:15])
+    history = PriceHistory(str(path), ["c", "a"])
+
+    assert history.refresh() == 15
+    assert history.refresh() == 0
+    with open(path, "a", encoding="utf-8") as f:
+        for row in prices[15:]:
+            f.write("x," + ",".join(f"{p:.6f}" for p in row) + "\n")
+    assert history.refresh() == 5
+    assert history.model.bars == 19
+    assert history.model.last_prices == pytest.approx(prices[-1][[2, 0]])
+
+
+def test_price_history_restarts_when_the_file_shrinks(tmp_path):
+    path = tmp_path / "history.csv"
+    write_history(path, ["a", "b"], random_prices(4, bars=30, n=2))
+    history = PriceHistory(str(path), ["a", "b"])
+    history.refresh()
+    write_history(path, ["a", "b"], random_prices(5, bars=5, n=2))
+    assert history.refresh() == 5
+    assert history.model.bars == 4
+
+
+def test_price_history_names_missing_columns(tmp_path):
+    path = tmp_path / "history.csv"
+    write_history(path, ["a"], random_prices(6, bars=3, n=1))
+    with pytest.raises(ValueError, match="b, c"):
+        PriceHistory(str(path), ["a", "b", "c"]).refresh()
+
+
+def legs(tiers=""):
+    return [
+        build_leg("US 500", "equity", "5000", "0.5", "125", "2500", "", tiers),
+        build_leg("Gold", "gold", "2000", "1", "100", "2000", "", tiers),
+        build_leg("Gilts", "bonds", "100", "2", "40", "200", "", tiers),
+    ]
+
+
+def seeded_model():
+    model = EwmaCovariance(["US 500", "Gold", "Gilts"])
+    model.seed(random_prices(7))
+    return model
+
+
+@pytest.mark.parametrize("tiers", ["", "5:2, 20:4"])
+@pytest.mark.parametrize("target", [500, 2_000, 25_000])
+def test_sizing_never_exceeds_the_margin_target(tiers, target):
+    instruments = legs(tiers)
+    result = size_risk_parity(instruments, target, seeded_model())
+    assert result["total_margin_p"] <= result["target_margin_p"] == target * 100
+    assert result["over_target_p"] == 0
+    assert all(t >= inst["min_stake_ticks"] for t, inst in zip(result["stake_ticks"], instruments))
+    assert result["margin_p"] == [inst["schedule"].margin(t) for inst, t in zip(instruments, result["stake_ticks"])]
+    if tiers:
+        assert result["iterations"] > 1
+
+
+def test_min_stakes_above_the_target_are_reported():
+    result = size_risk_parity(legs(), 100, seeded_model())
+    assert result["stake_ticks"] == [5_000, 10_000, 20_000]
+    assert result["over_target_p"] == result["total_margin_p"] - 10_000 == 16_500
+
+
+def test_volatility_target_caps_the_notional():
+    model = seeded_model()
+    full = size_risk_parity(legs(), 25_000, model)
+    capped = size_risk_parity(legs(), 25_000, model, balance=100_000, target_vol=0.05)
+    assert capped["total_notional_p"] < full["total_notional_p"]
+    assert capped["total_notional_p"] * capped["portfolio_vol"] <= 0.05 * 100_000 * 100 * 1.01
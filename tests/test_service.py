@@ -0,0 +1,141 @@
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+import service
+
+SPREADBET = {
+    "balance": 10_000,
+    "margin_pct": 10,
+    "instruments": [
+        {"name": "US 500", "sector": "equity", "price": 5000, "min_stake": 0.5, "margin_min": 125,
+         "notional_min": 2500, "weight_pct": 60},
+        {"name": "Gold", "sector": "gold", "price": 2000, "min_stake": 1, "margin_min": 100,
+         "notional_min": 2000, "weight_pct": 40},
+    ],
+}
+
+SHARES = {
+    "cash": 0,
+    "monthly": 500,
+    "holdings": [
+        {"name": "World", "price": 10, "shares": 60, "weight_pct": 50},
+        {"name": "Bonds", "price": 5, "shares": 60, "weight_pct": 50},
+    ],
+}
+
+
+def test_spreadbet_stays_within_the_margin_target():
+    status, body = service.solve_one(service.solve_spreadbet, SPREADBET)
+    assert status == 200
+    assert body["feasible"]
+    assert body["total_margin"] <= body["target_margin"] == 1_000
+    assert [leg["name"] for leg in body["legs"]] == ["US 500", "Gold"]
+
+
+def test_risk_dial_sizes_the_equity_leg():
+    status, body = service.solve_one(service.solve_risk, SPREADBET)
+    assert status == 200
+    assert body["legs"][1]["stake"] == 1
+    assert body["total_margin"] <= body["target_margin"]
+
+
+def test_shares_dca_closes_the_gaps_to_target():
+    # £1,400 after the contribution: £700 each
+    status, body = service.solve_one(service.solve_shares, SHARES)
+    assert status == 200
+    assert body["mode"] == "dca"
+    assert body["buys"] == [
+        {"name": "World", "qty": 10, "price": 10.0, "cost": 100.0},
+        {"name": "Bonds", "qty": 80, "price": 5.0, "cost": 400.0},
+    ]
+    assert body["total_spend"] + body["cash_remaining"] == body["cash_this_cycle"] == 500
+
+
+@pytest.mark.parametrize("payload, message", [
+    ([], "JSON object"),
+    ({"balance": "x", "margin_pct": 10, "instruments": []}, "balance"),
+    ({"balance": 1000, "margin_pct": 10, "instruments": []}, "non-empty list"),
+])
+def test_bad_requests_are_400(payload, message):
+    status, body = service.solve_one(service.solve_spreadbet, payload)
+    assert status == 400
+    assert message in body["error"]
+
+
+def test_cell_errors_name_the_row_and_field():
+    payload = dict(SPREADBET, instruments=[dict(SPREADBET["instruments"][0], margin_min=-1, min_stake="x")])
+    status, body = service.solve_one(service.solve_spreadbet, payload)
+    assert status == 400
+    assert {(e["row"], e["field"]) for e in body["errors"]} == {(0, "margin_min"), (0, "min_stake")}
+
+
+def test_engine_failures_are_500():
+    def broken(payload):
+        raise KeyError("boom")
+
+    status, body = service.solve_one(broken, {})
+    assert status == 500
+    assert "KeyError" in body["error"]
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = service.make_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def request(address, method, path, body=None):
+    conn = http.client.HTTPConnection(*address, timeout=5)
+    try:
+        conn.request(method, path, body=None if body is None else json.dumps(body))
+        response = conn.getresponse()
+        data = response.read()
+        if response.getheader("Content-Type").startswith("application/json"):
+            data = json.loads(data)
+        return response.status, data
+    finally:
+        conn.close()
+
+
+def test_http_list_body_is_answered_in_order(server):
+    status, body = request(server, "POST", "/shares", [SHARES, {"holdings": []}])
+    assert status == 200
+    assert body[0]["mode"] == "dca"
+    assert "non-empty list" in body[1]["error"]
+
+
+def test_http_health_metrics_and_unknown_paths(server):
+    assert request(server, "GET", "/health") == (200, {"status": "ok", "endpoints": ["/risk", "/shares", "/spreadbet"]})
+    status, text = request(server, "GET", "/metrics")
+    assert status == 200
+    assert b"# TYPE" in text
+    assert request(server, "POST", "/nope", {})[0] == 404
+    assert request(server, "GET", "/nope")[0] == 404
+
+
+def test_http_bad_json_is_400(server):
+    conn = http.client.HTTPConnection(*server, timeout=5)
+    conn.request("POST", "/risk", body=b"{not json")
+    response = conn.getresponse()
+    assert response.status == 400
+    assert json.loads(response.read()) == {"error": "Body is not valid JSON."}
+    conn.close()
+
+
+@pytest.mark.parametrize("length", ["-1", "abc", "1.5", str(service.SizingHandler.max_body + 1)])
+def test_http_bad_content_length_is_400_and_closes(server, length):
+    with socket.create_connection(server, timeout=5) as sock:
+        sock.sendall(f"POST /risk HTTP/1.1\r\nHost: x\r\nContent-Length: {length}\r\n\r\n{{}}".encode())
+        reply = b""
+        while chunk := sock.recv(4096):
+            reply += chunk
+    assert reply.startswith(b"HTTP/1.1 400")
+    assert b"Content-Length" in reply.split(b"\r\n\r\n", 1)[1]
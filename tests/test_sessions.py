@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+import sessions
+from shares_engine import build_holding, plan_dca_buys
+from spreadbet_engine import build_instrument, size_deposit_allocation
+
+
+def book():
+    return [
+        build_instrument("US 500", "Index", "5000", "0.5", "125", "2500", "60", "10:2"),
+        build_instrument("Gold", "Commodity", "2000", "1", "100", "2000", "40"),
+    ]
+
+
+def holdings():
+    return [build_holding("World", "10.2345", "60", "50"), build_holding("Bonds", "5", "60", "50")]
+
+
+@sessions.recorded_session("spreadbet")
+def calculate(target):
+    sized = sessions.record("spreadbet.size_deposit_allocation", size_deposit_allocation, book(), target)
+    planned = sessions.record("shares.plan_dca_buys", plan_dca_buys, holdings(), 90_000, 50_000)
+    return sized, planned
+
+
+@pytest.fixture(params=["session.jsonl", "session.jsonl.gz"])
+def log(tmp_path, monkeypatch, request):
+    path = str(tmp_path / request.param)
+    monkeypatch.setattr(sessions, "RECORD_PATH", path)
+    return path
+
+
+def test_record_without_a_log_only_calls_the_engine(monkeypatch, tmp_path):
+    monkeypatch.setattr(sessions, "RECORD_PATH", None)
+    assert calculate(800) == (size_deposit_allocation(book(), 800), plan_dca_buys(holdings(), 90_000, 50_000))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_calls_are_grouped_under_their_session(log):
+    calculate(800)
+    calculate(1_500)
+    entries = list(sessions.read_log(log))
+
+    assert [e["kind"] for e in entries] == ["call", "call", "session"] * 2
+    assert entries[0]["session"] == entries[1]["session"] == entries[2]["session"]
+    assert entries[0]["session"] != entries[3]["session"]
+    assert entries[2]["app"] == "spreadbet"
+    assert entries[0]["args"][1] == 800
+    assert entries[0]["args"][0][0]["schedule"] is None      # rebuilt on replay
+
+
+def test_replay_reproduces_every_result(log):
+    calculate(800)
+    calculate(1_500)
+    calls = sessions.replay(log, repeat=2)
+    assert len(calls) == 4
+    assert all(c["match"] for c in calls)
+    assert all(c["replay_ms"] >= 0 for c in calls)
+    assert [c["engine"] for c in sessions.replay(log, repeat=1, engine="shares.plan_dca_buys")] == [
+        "shares.plan_dca_buys"] * 2
+
+
+def test_replay_flags_changed_results_and_unknown_engines(log, monkeypatch, capsys):
+    calculate(800)
+    entries = list(sessions.read_log(log))
+    entries[0]["hash"] = "0" * 16
+    entries[1]["engine"] = "shares.retired_planner"
+    with sessions._open(log, "w") as f:
+        f.writelines(json.dumps(e) + "\n" for e in entries)
+
+    calls = sessions.replay(log, repeat=1)
+    assert [c["match"] for c in calls] == [False, None]
+
+    monkeypatch.setattr("sys.argv", ["sessions.py", "replay", log, "--repeat", "1"])
+    with pytest.raises(SystemExit) as exit_info:
+        sessions.main()
+    assert exit_info.value.code == 1
+    out = capsys.readouterr().out
+    assert "1 sessions, 2 engine calls, 1 replayed, 1 results differ" in out
+    assert "RESULT DIFFERS" in out
+
+
+def test_replay_cli_exits_0_when_results_match(log, monkeypatch, capsys):
+    calculate(800)
+    monkeypatch.setattr("sys.argv", ["sessions.py", "replay", log, "--repeat", "1"])
+    with pytest.raises(SystemExit) as exit_info:
+        sessions.main()
+    assert exit_info.value.code == 0
+    assert "Slowest Calculate: spreadbet" in capsys.readouterr().out
+
+
+def test_unrecordable_arguments_are_refused(log):
+    with pytest.raises(TypeError, match="cannot record object"):
+        sessions.record("x", lambda a: a, object())
@@ -0,0 +1,155 @@
+import random
+from itertools import product
+
+import pytest
+
+from shares_engine import UNITS_PER_PENNY, build_holding, plan_fewest_trades
+
+
+def random_holdings(rng, n):
+    # A book near its targets: each holding within about 8% of its weight.
+    weights = [rng.randint(1, 10) for _ in range(n)]
+    total = sum(weights)
+    book_p = rng.randint(100_000, 10_000_000)
+    holdings = []
+    for i, w in enumerate(weights):
+        price_p = rng.randint(50, 50_000)
+        shares = round(book_p * w / total * rng.uniform(0.92, 1.08) / price_p)
+        holdings.append(build_holding(f"Fund {i}", f"{price_p / 100:.2f}", str(shares), f"{100 * w / total:.4f}"))
+    return holdings
+
+
+def cost_u(holdings, plan):
+    return sum(plan[h["name"]] * h["price_u"] for h in holdings)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_fewest_trades_stays_in_band_and_within_cash(seed):
+    rng = random.Random(seed)
+    holdings = random_holdings(rng, rng.randint(1, 8))
+    invested_p = sum(h["value_p"] for h in holdings)
+    cash_p = rng.randint(0, invested_p // 5 + 10_000)
+    tolerance_bp = rng.choice([50, 200, 500])
+    fee_p = rng.choice([0, 150])
+
+    plan, remaining_p, out_of_band = plan_fewest_trades(holdings, invested_p, cash_p, tolerance_bp, fee_p)
+    if plan is None:
+        return          # the must-buy orders alone cost more than the cash
+
+    orders = [h for h in holdings if plan[h["name"]] > 0]
+    spent_u = cost_u(holdings, plan) + len(orders) * fee_p * UNITS_PER_PENNY
+    assert 0 <= remaining_p == (cash_p * UNITS_PER_PENNY - spent_u) // UNITS_PER_PENNY
+
+    band_u = (invested_p + cash_p) * tolerance_bp // 10_000 * UNITS_PER_PENNY
+    for h in holdings:
+        if h["name"] in out_of_band:
+            continue
+        gap_u = h["gap_after_cash_p"] * UNITS_PER_PENNY - plan[h["name"]] * h["price_u"]
+        assert abs(gap_u) <= band_u
+
+    # Cash is invested down to less than one more share (plus a fee for a
+    # new order) of anything that still has room in its band.
+    left_u = cash_p * UNITS_PER_PENNY - spent_u
+    for h in holdings:
+        room = h["gap_after_cash_p"] * UNITS_PER_PENNY + band_u - plan[h["name"]] * h["price_u"]
+        if room >= h["price_u"]:
+            fee_u = 0 if plan[h["name"]] else fee_p * UNITS_PER_PENNY
+            assert h["price_u"] + fee_u > left_u
+
+
+def test_fewest_trades_places_no_orders_when_in_band_without_cash():
+    holdings = [build_holding("A", "10", "60", "60"), build_holding("B", "20", "20", "40")]
+    invested_p = sum(h["value_p"] for h in holdings)
+
+    plan, remaining_p, out_of_band = plan_fewest_trades(holdings, invested_p, 0, 200, 100)
+
+    assert plan == {"A": 0, "B": 0}
+    assert remaining_p == 0
+    assert out_of_band == []
+
+
+def test_fewest_trades_buys_only_the_underweight_holding():
+    # After £100 comes in, B is £140 under target and A £40 over, inside
+    # its 5% band: the whole £100 goes to B in one order.
+    holdings = [build_holding("A", "10", "70", "60"), build_holding("B", "10", "30", "40")]
+    invested_p = sum(h["value_p"] for h in holdings)
+
+    plan, remaining_p, _ = plan_fewest_trades(holdings, invested_p, 10_000, 500, 0)
+
+    assert plan == {"A": 0, "B": 10}
+    assert remaining_p == 0
+
+
+def test_fewest_trades_reports_unaffordable_must_buys():
+    holdings = [build_holding("A", "100", "0", "50"), build_holding("B", "100", "10", "50")]
+
+    plan, remaining_p, _ = plan_fewest_trades(holdings, 100_000, 5_000, 100, 0)
+
+    assert plan is None
+    assert remaining_p == 5_000
+
+
+def test_fewest_trades_spends_sub_penny_prices_exactly():
+    holdings = [build_holding("A", "0.8734", "0", "100")]
+
+    plan, remaining_p, _ = plan_fewest_trades(holdings, 0, 100_000, 200, 0)
+
+    assert plan["A"] == 1144
+    assert remaining_p == 83
+
+
+def test_fewest_trades_prefers_one_order_over_two():
+    # Both in band; £150 buys 3 x B in one order rather than A + B.
+    holdings = [build_holding("A", "99", "100", "50"), build_holding("B", "50", "200", "50")]
+    invested_p = sum(h["value_p"] for h in holdings)
+
+    plan, remaining_p, _ = plan_fewest_trades(holdings, invested_p, 15_000, 500, 0)
+
+    assert plan == {"A": 0, "B": 3}
+    assert remaining_p == 0
+
+
+def fewest_orders_brute_force(holdings, cash_p, band_u, fee_p):
+    # Fewest orders over every in-band whole-share plan that fits the cash
+    # and leaves less than one more share (plus its fee if new) of anything
+    # with room.
+    cash_u, fee_u = cash_p * UNITS_PER_PENNY, fee_p * UNITS_PER_PENNY
+    ranges = []
+    for h in holdings:
+        gap_u = h["gap_after_cash_p"] * UNITS_PER_PENNY
+        ranges.append(range(max(0, -((band_u - gap_u) // h["price_u"])), (gap_u + band_u) // h["price_u"] + 1))
+    best = None
+    for qty in product(*ranges):
+        orders = sum(1 for q in qty if q)
+        left_u = cash_u - sum(q * h["price_u"] for q, h in zip(qty, holdings)) - orders * fee_u
+        complete = all(
+            h["price_u"] + (0 if q else fee_u) > left_u
+            for q, h, r in zip(qty, holdings, ranges) if q < r[-1]
+        )
+        if left_u >= 0 and complete and (best is None or orders < best):
+            best = orders
+    return best
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_fewest_trades_matches_brute_force(seed):
+    rng = random.Random(seed)
+    n = rng.randint(1, 3)
+    weights = [rng.randint(1, 5) for _ in range(n)]
+    book_p = rng.randint(1_000, 20_000)
+    holdings = []
+    for i, w in enumerate(weights):
+        price_p = rng.randint(100, 3_000)
+        shares = round(book_p * w / sum(weights) * rng.uniform(0.9, 1.1) / price_p)
+        holdings.append(build_holding(f"H{i}", f"{price_p / 100:.2f}", str(shares), f"{100 * w / sum(weights):.4f}"))
+    invested_p = sum(h["value_p"] for h in holdings)
+    cash_p = rng.randint(0, book_p // 3 + 500)
+    tolerance_bp = rng.choice([100, 300, 500])
+    fee_p = rng.choice([0, 50])
+
+    plan, _, out_of_band = plan_fewest_trades(holdings, invested_p, cash_p, tolerance_bp, fee_p)
+    if plan is None or out_of_band:
+        return
+
+    band_u = (invested_p + cash_p) * tolerance_bp // 10_000 * UNITS_PER_PENNY
+    assert sum(1 for q in plan.values() if q) == fewest_orders_brute_force(holdings, cash_p, band_u, fee_p)
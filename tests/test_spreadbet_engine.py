@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from spreadbet_engine import build_instrument, size_deposit_allocation
+
+
+def random_book(rng, n, tiered):
+    book = []
+    for i in range(n):
+        min_stake = rng.choice(["0.1", "0.5", "1", "2"])
+        tiers = ""
+        if tiered and rng.random() < 0.6:
+            first = rng.randint(2, 30)
+            tiers = f"{first}:{rng.choice(['1.5', '2'])}, {first + rng.randint(1, 50)}:{rng.choice(['3', '4.25'])}"
+        book.append(build_instrument(
+            f"Leg {i}", "Index", "100",
+            min_stake,
+            str(rng.randint(5, 400)),
+            str(rng.randint(50, 5000)),
+            str(rng.randint(1, 40)),
+            tiers,
+            "GBP",
+        ))
+    return book
+
+
+def bisect_allocation(instruments, cap_p):
+    # Reference: the largest scale k whose margin fits, found by bisection
+    # (margin never falls as k grows).
+    weights = [inst["weight_bp"] for inst in instruments]
+    total_weight = sum(weights)
+    denoms = [total_weight * inst["notional_min_p"] for inst in instruments]
+
+    def lots_at(k):
+        return [max(1, k * w // d) for w, d in zip(weights, denoms)]
+
+    def margin(k):
+        return sum(
+            inst["schedule"].margin(q * inst["min_stake_ticks"])
+            for inst, q in zip(instruments, lots_at(k))
+        )
+
+    lo, hi = 0, 1
+    while margin(hi) <= cap_p:
+        lo, hi = hi, hi * 2
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if margin(mid) <= cap_p:
+            lo = mid
+        else:
+            hi = mid
+    return lots_at(lo), margin(lo)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_deposit_allocation_matches_bisection(seed):
+    rng = random.Random(seed)
+    book = random_book(rng, rng.randint(1, 8), tiered=seed % 2 == 1)
+    min_margin_p = sum(inst["schedule"].margin(inst["min_stake_ticks"]) for inst in book)
+    cap_p = min_margin_p + rng.randint(0, 2_000_000)
+
+    result = size_deposit_allocation(book, cap_p / 100)
+    lots, total_p = bisect_allocation(book, cap_p)
+
+    assert result["feasible"]
+    assert result["lots"] == lots
+    assert result["total_margin_p"] == total_p == sum(result["margin_p"])
+    assert result["total_margin_p"] <= cap_p
+
+
+def test_deposit_allocation_infeasible_below_min_margin():
+    book = random_book(random.Random(1), 4, tiered=True)
+    min_margin_p = sum(inst["schedule"].margin(inst["min_stake_ticks"]) for inst in book)
+
+    result = size_deposit_allocation(book, (min_margin_p - 1) / 100)
+
+    assert not result["feasible"]
+    assert result["min_margin_p"] == min_margin_p
@@ -0,0 +1,68 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from stress import historical_scenarios, read_price_matrix, stress_test, synthetic_scenarios  # noqa: E402
+
+
+def test_pnl_and_margin_follow_each_shock():
+    # 2 £/pt long at 5000 (£10,000 exposure), 1 £/pt short at 2000
+    scenarios = [[-0.10, 0.0], [0.05, 0.05], [0.0, 0.20]]
+    r = stress_test([2, -1], [5000, 2000], [500, 100], 2_000, scenarios)
+
+    assert r["pnl"].tolist() == pytest.approx([-1_000, 400, -400])
+    assert r["margin_after"].tolist() == pytest.approx([550, 630, 620])
+    assert r["equity_after"].tolist() == pytest.approx([1_000, 2_400, 1_600])
+    assert r["breach"].tolist() == [False, False, False]
+    assert r["worst_pnl"] == pytest.approx(-1_000)
+    assert r["headroom"] == 1_400
+
+
+def test_breach_when_equity_falls_below_the_call_level():
+    r = stress_test([2], [5000], [500], 1_000, [[-0.05], [-0.02], [0.01]], call_level=1.0)
+    # -£500 leaves £500 against £475 margin; a call level of 1.1 breaches it
+    assert r["breach"].tolist() == [False, False, False]
+    r = stress_test([2], [5000], [500], 1_000, [[-0.05], [-0.02], [0.01]], call_level=1.1)
+    assert r["breach"].tolist() == [True, False, False]
+    assert r["breach_probability"] == pytest.approx(1 / 3)
+    assert r["min_headroom_after"] == pytest.approx(500 - 1.1 * 475)
+
+
+def test_chunking_does_not_change_the_result():
+    scenarios = synthetic_scenarios(np.diag([1e-4, 4e-4]), 1_001, seed=3)
+    whole = stress_test([1, 3], [100, 50], [10, 20], 500, scenarios)
+    chunked = stress_test([1, 3], [100, 50], [10, 20], 500, scenarios, chunk=64)
+    assert chunked["pnl"] == pytest.approx(whole["pnl"])
+    assert chunked["margin_after"] == pytest.approx(whole["margin_after"])
+
+
+def test_tail_statistics_order():
+    scenarios = synthetic_scenarios(np.diag([4e-4]), 20_000, dof=4, seed=1)
+    r = stress_test([1], [100], [10], 1_000, scenarios)
+    assert r["scenarios"] == 20_000
+    assert 0 < r["var_95"] < r["var_99"] <= r["es_99"] <= -r["worst_pnl"]
+
+
+def test_synthetic_scenarios_match_the_covariance_and_horizon():
+    cov = np.array([[1e-4, 5e-5], [5e-5, 4e-4]])
+    shocks = synthetic_scenarios(cov, 200_000, horizon=5, seed=0)
+    assert np.cov(np.log1p(shocks).T) == pytest.approx(5 * cov, rel=0.02)
+    assert np.all(shocks > -1)
+    with pytest.raises(ValueError, match="dof"):
+        synthetic_scenarios(cov, 10, dof=2)
+
+
+def test_historical_scenarios_are_overlapping_returns():
+    prices = [[100, 10], [110, 10], [99, 12]]
+    assert historical_scenarios(prices) == pytest.approx(np.array([[0.1, 0.0], [-0.1, 0.2]]))
+    assert historical_scenarios(prices, horizon=2) == pytest.approx(np.array([[-0.01, 0.2]]))
+    with pytest.raises(ValueError, match="horizon"):
+        historical_scenarios(prices, horizon=3)
+
+
+def test_read_price_matrix_picks_columns_by_name(tmp_path):
+    path = tmp_path / "history.csv"
+    path.write_text("date,Gold,US 500\n2024-01-01,2000,5000\n\n2024-01-02,2010,4950\n", encoding="utf-8")
+    assert read_price_matrix(str(path), ["US 500", "Gold"]).tolist() == [[5000, 2000], [4950, 2010]]
+    with pytest.raises(ValueError, match="Oil"):
+        read_price_matrix(str(path), ["Oil"])
@@ -0,0 +1,73 @@
+import pytest
+
+from universe import InstrumentSearch, InstrumentUniverse
+
+
+def write_master(path, rows, header="Instrument,Live Price (£),Margin Rate (%)"):
+    path.write_text("\n".join([header, *rows]) + "\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def universe():
+    return InstrumentUniverse([
+        {"instrument": "US 500", "live price": "5000"},
+        {"instrument": "UK 100", "live price": "8000"},
+        {"instrument": "Germany 40", "live price": "17000"},
+        {"instrument": "US Tech 100", "live price": "18000"},
+    ])
+
+
+def test_prefix_matches_whole_names_and_later_words(universe):
+    assert [universe.names[i] for i in universe.prefix("us")] == ["US 500", "US Tech 100"]
+    assert [universe.names[i] for i in universe.prefix("500")] == ["US 500"]
+    assert [universe.names[i] for i in universe.prefix("100")] == ["UK 100", "US Tech 100"]
+    assert universe.prefix("  ") == []
+
+
+def test_search_fills_with_fuzzy_matches_after_prefix_hits(universe):
+    hits = [universe.names[i] for i in universe.search("germny")]
+    assert hits[0] == "Germany 40"
+    assert [universe.names[i] for i in universe.search("us", limit=1)] == ["US 500"]
+
+
+def test_load_matches_headers_ignoring_case_and_units(tmp_path):
+    path = write_master(tmp_path / "instruments.csv", ["US 500, 5000 ,0.05", "", "UK 100,8000,0.05"])
+    universe = InstrumentUniverse.load(path)
+    assert universe.names == ["US 500", "UK 100"]
+    assert universe.row(0, ["Instrument", "Live Price", "Margin Rate (%)", "Notes"]) == ["US 500", "5000", "0.05", ""]
+
+
+def test_load_needs_an_instrument_column(tmp_path):
+    path = write_master(tmp_path / "instruments.csv", ["US 500"], header="Name")
+    with pytest.raises(ValueError, match="Instrument"):
+        InstrumentUniverse.load(path)
+
+
+def loaded(path):
+    # Runs the search box's background load without a Tk window
+    search = InstrumentSearch.__new__(InstrumentSearch)
+    search.path = path
+    search._loaded = None
+    search.load_error = None
+    search._load()
+    return search
+
+
+def test_background_load_falls_back_when_the_master_is_missing(tmp_path):
+    search = loaded(str(tmp_path / "missing.csv"))
+    assert len(search._loaded) == 0
+    assert search.load_error is None
+
+
+@pytest.mark.parametrize("content", [
+    "",
+    "Name\nUS 500\n",
+    "Instrument\n\"" + "x" * 200_000 + "\"\n",
+])
+def test_background_load_reports_an_unreadable_master(tmp_path, content):
+    path = tmp_path / "instruments.csv"
+    path.write_text(content, encoding="utf-8")
+    search = loaded(str(path))
+    assert len(search._loaded) == 0
+    assert search.load_error
@@ -0,0 +1,88 @@
+import pytest
+
+from validation import (
+    CellError, bp, currency, format_errors, mark_cells, non_negative, number, optional, pence, positive,
+    price_units, sector, text, ticks, validate_row, validate_table, whole,
+)
+
+
+@pytest.mark.parametrize("parse, cell, value", [
+    (text, "  US 500 ", "US 500"),
+    (sector, "Equity", "equity"),
+    (currency, " usd", "USD"),
+    (number, "1e3", 1000.0),
+    (whole, "42", 42),
+    (pence, "12.345", 1234),              # half to even
+    (pence, "1,250.5", 125_050),
+    (pence, 0.3, 30),
+    (price_units, "0.8734", 873_400),
+    (ticks, "0.5", 5_000),
+    (bp, "42.5", 4_250),
+    (optional(number), "", None),
+    (optional(currency, default="GBP"), None, "GBP"),
+    (non_negative(whole), "0", 0),
+])
+def test_parsers_read_cells(parse, cell, value):
+    assert parse(cell) == value
+
+
+@pytest.mark.parametrize("parse, cell, message", [
+    (text, "  ", "required"),
+    (currency, "US", "not a currency code"),
+    (currency, "US1", "not a currency code"),
+    (number, "abc", "not a number"),
+    (number, "nan", "not a finite number"),
+    (number, "inf", "not a finite number"),
+    (whole, "1.5", "not a whole number"),
+    (pence, "", "required"),
+    (positive(number), "0", "greater than 0"),
+    (non_negative(pence), "-0.01", "not be negative"),
+])
+def test_parsers_reject_bad_cells(parse, cell, message):
+    with pytest.raises(ValueError, match=message):
+        parse(cell)
+
+
+def test_validate_table_reports_every_bad_cell_in_row_order():
+    rows = [
+        ["A", "1", "x"],
+        ["", "-2", "3"],
+        ["C"],
+    ]
+    columns, errors = validate_table(rows, [text, positive(number), optional(whole)])
+
+    assert columns == [["A", None, "C"], [1.0, None, None], [None, 3, None]]
+    assert errors == [
+        CellError(0, 2, "not a whole number: 'x'"),
+        CellError(1, 0, "required"),
+        CellError(1, 1, "must be greater than 0"),
+        CellError(2, 1, "required"),
+    ]
+
+
+def test_validate_row_lists_every_bad_column():
+    assert validate_row(["Gold", "2.5"], [text, number]) == ["Gold", 2.5]
+    with pytest.raises(ValueError, match=r"column 1: required; column 2: not a number"):
+        validate_row(["", "x"], [text, number])
+
+
+def test_format_errors_names_cells_and_truncates():
+    errors = [CellError(r, 1, "required") for r in range(5)]
+    assert format_errors(errors[:1], ["Name", "Price"]) == "Row 1, Price: required"
+    lines = format_errors(errors, ["Name", "Price"], limit=2).splitlines()
+    assert lines == ["Row 1, Price: required", "Row 2, Price: required", "... and 3 more"]
+
+
+class Cell:
+    bg = None
+
+    def config(self, bg):
+        self.bg = bg
+
+
+def test_mark_cells_highlights_bad_cells_and_clears_the_rest():
+    grid = [[Cell(), Cell()], [Cell(), Cell()]]
+    mark_cells(grid, [CellError(1, 0, "required")], "white")
+    assert [[c.bg for c in row] for row in grid] == [["white", "white"], ["#f8b4b4", "white"]]
+    mark_cells(grid, [], "white")
+    assert grid[1][0].bg == "white"
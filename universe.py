@@ -0,0 +1,219 @@
+import csv
+import os
+import threading
+import tkinter as tk
+from bisect import bisect_left
+from collections import Counter
+from heapq import nlargest
+
+from launch import after_first_frame
+
+DEFAULT_PATH = os.environ.get("REBAL_UNIVERSE", "instruments.csv")
+
+# Fuzzy search counts postings of the query's rarest trigrams only, up to
+# this many ids, so a query of common fragments stays a few ms.
+FUZZY_POSTINGS_BUDGET = 20_000
+
+# How often the search box checks whether its background load finished
+LOAD_POLL_MS = 50
+
+
+# -----------------------------
+# Instrument master (type-ahead search)
+# -----------------------------
+# CSV with one row per instrument. Columns are matched to table headers by
+# name, ignoring case and any unit suffix, so "Live Price" fills both
+# "Live Price" and "Live Price (£)". Search is two-stage:
+#   prefix  - sorted array of (lowercased name and each word of it), found
+#             by bisection, so "500" finds "US 500"
+#   fuzzy   - trigram postings (built with the master in the background
+#             when the search box opens), ranked by rare
+#             trigrams shared with the query, only used when prefixes do
+#             not fill the result list
+
+
+def _key(header):
+    return header.split(" (")[0].strip().lower()
+
+
+def _trigrams(s):
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class InstrumentUniverse:
+
+    def __init__(self, records):
+        # records: list of dicts keyed by _key(column header)
+        self.records = records
+        self.names = [r.get("instrument", "") for r in records]
+
+        entries = set()
+        for i, name in enumerate(self.names):
+            lower = name.lower()
+            entries.add((lower, i))
+            for word in lower.split()[1:]:
+                entries.add((word, i))
+        entries = sorted(entries)
+        self._keys = [k for k, _ in entries]
+        self._ids = [i for _, i in entries]
+        self._postings = None
+
+    def _build_postings(self):
+        self._postings = {}
+        for i, name in enumerate(self.names):
+            for g in _trigrams(name.lower()):
+                self._postings.setdefault(g, []).append(i)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = [_key(h) for h in next(reader)]
+            if "instrument" not in header:
+                raise ValueError("Instrument master needs an 'Instrument' column.")
+            records = [
+                {h: v.strip() for h, v in zip(header, row)}
+                for row in reader if row and any(row)
+            ]
+        return cls(records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def prefix(self, query, limit=20):
+        query = query.strip().lower()
+        if not query:
+            return []
+        out = []
+        seen = set()
+        k = bisect_left(self._keys, query)
+        while k < len(self._keys) and len(out) < limit and self._keys[k].startswith(query):
+            i = self._ids[k]
+            if i not in seen:
+                seen.add(i)
+                out.append(i)
+            k += 1
+        return out
+
+    def fuzzy(self, query, limit=20):
+        if self._postings is None:
+            self._build_postings()
+        postings = [self._postings[g] for g in _trigrams(query.strip().lower()) if g in self._postings]
+        postings.sort(key=len)
+        counts = Counter()
+        used = 0
+        for ids in postings:
+            if counts and used + len(ids) > FUZZY_POSTINGS_BUDGET:
+                break
+            counts.update(ids)
+            used += len(ids)
+        return [i for i, _ in nlargest(limit, counts.items(), key=lambda x: (x[1], -x[0]))]
+
+    def search(self, query, limit=20):
+        # Prefix hits first, then fuzzy matches to fill up to limit.
+        out = self.prefix(query, limit)
+        if len(out) < limit and len(query.strip()) >= 2:
+            seen = set(out)
+            for i in self.fuzzy(query, limit):
+                if i not in seen:
+                    out.append(i)
+                    if len(out) == limit:
+                        break
+        return out
+
+    def row(self, i, headers):
+        # Cell strings for a table with these headers ("" where unknown)
+        rec = self.records[i]
+        return [rec.get(_key(h), "") for h in headers]
+
+
+# -----------------------------
+# Tk search box: type to filter, Enter / double-click adds the row
+# -----------------------------
+
+class InstrumentSearch:
+
+    def __init__(self, parent, headers, on_pick, path=DEFAULT_PATH, limit=20, **entry_options):
+        self.headers = headers
+        self.on_pick = on_pick
+        self.path = path
+        self.limit = limit
+        self.universe = None
+        self._loaded = None     # set once by the loader thread
+        self.load_error = None  # why the master could not be read, if it could not
+        self.matches = []
+
+        self.entry = tk.Entry(parent, **entry_options)
+        self.listbox = tk.Listbox(parent, height=6, width=40)
+        self.entry.bind("<KeyRelease>", self._on_key)
+        self.entry.bind("<Down>", lambda e: self.listbox.focus_set())
+        self.entry.bind("<Return>", self._pick)
+        self.listbox.bind("<Return>", self._pick)
+        self.listbox.bind("<Double-Button-1>", self._pick)
+        after_first_frame(self.entry.winfo_toplevel(), self._start_load)
+
+    def _start_load(self):
+        # Reading and sorting a large master and building its trigram
+        # postings take a second or two, so they run off the Tk thread once
+        # the window is up; the Tk side polls for the result.
+        threading.Thread(target=self._load, daemon=True).start()
+        self.entry.after(LOAD_POLL_MS, self._poll_load)
+
+    def _load(self):
+        # Any failure must still publish a universe, or the box would show
+        # "loading" for good.
+        try:
+            universe = InstrumentUniverse.load(self.path)
+            universe._build_postings()
+        except FileNotFoundError:
+            universe = InstrumentUniverse([])
+        except (OSError, ValueError, csv.Error) as e:
+            self.load_error = str(e)
+            universe = InstrumentUniverse([])
+        except StopIteration:
+            self.load_error = "file is empty"
+            universe = InstrumentUniverse([])
+        self._loaded = universe
+
+    def _poll_load(self):
+        if not self.entry.winfo_exists():
+            return
+        if self._loaded is None:
+            self.entry.after(LOAD_POLL_MS, self._poll_load)
+            return
+        self.universe = self._loaded
+        if self.entry.get().strip():
+            self._refresh()
+
+    def _on_key(self, event):
+        if event.keysym in ("Return", "Down", "Up"):
+            return
+        self._refresh()
+
+    def _refresh(self):
+        self.listbox.delete(0, tk.END)
+        universe = self.universe
+        if universe is None:
+            self.matches = []
+            if self.entry.get().strip():
+                self.listbox.insert(tk.END, "(loading instruments…)")
+            return
+        self.matches = universe.search(self.entry.get(), self.limit)
+        for i in self.matches:
+            self.listbox.insert(tk.END, universe.names[i])
+        if not self.matches and self.entry.get().strip() and not len(universe):
+            if self.load_error:
+                self.listbox.insert(tk.END, f"(could not read {self.path}: {self.load_error})")
+            else:
+                self.listbox.insert(tk.END, f"(no instrument master at {self.path})")
+
+    def _pick(self, event=None):
+        if not self.matches:
+            return
+        sel = self.listbox.curselection()
+        i = self.matches[sel[0] if sel else 0]
+        self.on_pick(self.universe.row(i, self.headers))
+        self.entry.delete(0, tk.END)
+        self.listbox.delete(0, tk.END)
+        self.matches = []
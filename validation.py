@@ -0,0 +1,149 @@
+from collections import namedtuple
+
+from money import pct_to_bp, to_pence, to_price_units, to_ticks
+
+# One bad cell: 0-based row / column plus a short reason.
+CellError = namedtuple("CellError", "row col message")
+
+ERROR_BG = "#f8b4b4"
+
+
+# -----------------------------
+# Cell parsers: cell -> value, raising ValueError with a short reason
+# -----------------------------
+# Cells are normally strings; numbers (e.g. from JSON) are read via str()
+# so 0.3 parses as the decimal 0.3.
+
+def _cell(s):
+    return "" if s is None else str(s).strip()
+
+
+def text(s):
+    s = _cell(s)
+    if not s:
+        raise ValueError("required")
+    return s
+
+
+def sector(s):
+    return text(s).lower()
+
+
+def currency(s):
+    s = text(s).upper()
+    if len(s) != 3 or not s.isalpha():
+        raise ValueError(f"not a currency code: {s!r}")
+    return s
+
+
+def number(s):
+    s = _cell(s)
+    if not s:
+        raise ValueError("required")
+    try:
+        v = float(s)
+    except ValueError:
+        raise ValueError(f"not a number: {s!r}") from None
+    if v != v or v in (float("inf"), float("-inf")):
+        raise ValueError(f"not a finite number: {s!r}")
+    return v
+
+
+def whole(s):
+    s = _cell(s)
+    if not s:
+        raise ValueError("required")
+    try:
+        return int(s)
+    except ValueError:
+        raise ValueError(f"not a whole number: {s!r}") from None
+
+
+def _scaled(convert):
+    def parse(s):
+        s = _cell(s)
+        if not s:
+            raise ValueError("required")
+        return convert(s)
+    return parse
+
+
+pence = _scaled(to_pence)
+price_units = _scaled(to_price_units)
+ticks = _scaled(to_ticks)
+bp = _scaled(pct_to_bp)
+
+
+def positive(parse):
+    def check(s):
+        v = parse(s)
+        if v <= 0:
+            raise ValueError("must be greater than 0")
+        return v
+    return check
+
+
+def non_negative(parse):
+    def check(s):
+        v = parse(s)
+        if v < 0:
+            raise ValueError("must not be negative")
+        return v
+    return check
+
+
+def optional(parse, default=None):
+    def check(s):
+        return default if not _cell(s) else parse(s)
+    return check
+
+
+# -----------------------------
+# Table validation
+# -----------------------------
+
+def validate_table(rows, parsers):
+    # rows: list of lists of cell strings (GUI table or imported file).
+    # Parses column by column in a single pass and never stops early, so
+    # every bad cell is reported at once. Returns (columns, errors) where
+    # columns[c][r] is the parsed value (None if that cell failed).
+    n = len(rows)
+    columns = []
+    errors = []
+
+    for c, parse in enumerate(parsers):
+        cells = [row[c] if c < len(row) else "" for row in rows]
+        out = [None] * n
+        for r, cell in enumerate(cells):
+            try:
+                out[r] = parse(cell)
+            except ValueError as e:
+                errors.append(CellError(r, c, str(e) or "invalid"))
+        columns.append(out)
+
+    errors.sort()
+    return columns, errors
+
+
+def validate_row(cells, parsers):
+    # Single-row convenience: parsed values, or ValueError listing every
+    # bad cell.
+    columns, errors = validate_table([list(cells)], parsers)
+    if errors:
+        raise ValueError("; ".join(f"column {e.col + 1}: {e.message}" for e in errors))
+    return [col[0] for col in columns]
+
+
+def format_errors(errors, headers, limit=12):
+    lines = [f"Row {e.row + 1}, {headers[e.col]}: {e.message}" for e in errors[:limit]]
+    if len(errors) > limit:
+        lines.append(f"... and {len(errors) - limit} more")
+    return "\n".join(lines)
+
+
+def mark_cells(entry_rows, errors, normal_bg, error_bg=ERROR_BG):
+    # Highlight bad cells in a grid of Tk Entry widgets, clearing old marks.
+    bad = {(e.row, e.col) for e in errors}
+    for r, entries in enumerate(entry_rows):
+        for c, ent in enumerate(entries):
+            ent.config(bg=error_bg if (r, c) in bad else normal_bg)